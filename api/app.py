@@ -1,75 +1,713 @@
 from __future__ import annotations
 
 import json
-from pathlib import Path
-from typing import Any
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Annotated, Any
 
-import joblib
+import duckdb
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, HTTPException
+import polars as pl
+from fastapi import Body, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
+from ebay_price.api.batching import MicroBatcher
+from ebay_price.api.cache import PredictionCache, cache_key
+from ebay_price.api.metrics import MetricsRegistry, render_family
+from ebay_price.api.registry import LoadedModel, ModelNotLoadedError, ModelRegistry
 from ebay_price.api.schemas import ListingIn
+from ebay_price.features.aggregates import (
+    AGG_FEATURES,
+    AggregateIndex,
+    AggregateLookup,
+    aggregates_online_path,
+)
 from ebay_price.features.align import align_to_columns
-from ebay_price.features.inference import prepare_features_for_inference
+from ebay_price.features.categorical import label_encode_exprs, target_encode_exprs
+from ebay_price.features.dtypes import to_float32
+from ebay_price.features.inference import build_inference_features
+from ebay_price.features.profiling import PipelineProfiler
+from ebay_price.features.state import FeatureState
+from ebay_price.features.store import FeatureStore
+from ebay_price.utils.settings import load_settings
 
-ART_DIR = Path("data/artifacts/models")
+cfg = load_settings()
+registry = ModelRegistry(
+    cfg.api__models_dir, fast_path=cfg.api__fast_path, backend=cfg.api__inference_backend
+)
+cache = PredictionCache(cfg.api__cache_max_entries, cfg.api__cache_ttl_s)
+feature_store = FeatureStore(cfg.storage__duckdb_path)
+aggregate_lookup = AggregateLookup(aggregates_online_path(cfg.storage__duckdb_path))
+_AGG_FEATURES = frozenset(AGG_FEATURES)
 
-app = FastAPI(title="eBay Price Prediction API", version="0.1.0")
 
+def _on_models_swapped() -> None:
+    # Keys carry the model version, so stale entries could never hit; this frees them
+    cache.clear()
 
-def _load_feature_columns(fname: str) -> list[str]:
-    f = ART_DIR / fname
-    if not f.exists():
-        return []
-    return json.loads(f.read_text())
 
+registry.add_swap_listener(_on_models_swapped)
 
-def _load_model(fname: str):
-    f = ART_DIR / fname
-    if not f.exists():
-        raise FileNotFoundError(f"Model not found: {f}")
-    return joblib.load(f)
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "ebay_price_stage_seconds",
+    "Time spent in each stage of a predict call.",
+    ("stage", "task"),
+)
+REQUEST_SECONDS = metrics.histogram(
+    "ebay_price_request_seconds", "HTTP request latency by route.", ("route", "method")
+)
+REQUESTS = metrics.counter(
+    "ebay_price_requests_total", "HTTP requests by route and status.", ("route", "method", "status")
+)
+IN_FLIGHT = metrics.gauge("ebay_price_requests_in_flight", "HTTP requests being handled.")
+MODEL_REQUESTS = metrics.counter(
+    "ebay_price_model_requests_total",
+    "Predict requests answered, by the model artifact that served them.",
+    ("task", "model"),
+)
+MODEL_ROWS = metrics.counter(
+    "ebay_price_model_rows_total", "Listings passed to model.predict.", ("task", "model")
+)
 
 
-@app.post("/predict/price")
-def predict_price(item: ListingIn) -> dict[str, Any]:
-    # Prefer LightGBM if present; else fall back to linear
-    model_path = (
-        "reg_lightgbm.joblib" if (ART_DIR / "reg_lightgbm.joblib").exists() else "reg_linear.joblib"
-    )
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Fail startup outright when there is nothing to serve
+    registry.load()
+    registry.start_watcher(cfg.api__reload_interval_s)
     try:
-        model = _load_model(model_path)
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=400, detail=str(e)) from None
+        yield
+    finally:
+        registry.stop_watcher()
+
+
+app = FastAPI(title="eBay Price Prediction API", version="0.1.0", lifespan=lifespan)
+
+
+def _get_models(*tasks: str) -> list[LoadedModel]:
+    """Models for `tasks` from one registry snapshot; 503 if any is missing."""
+    with STAGE_SECONDS.time(stage="registry", task=tasks[0] if len(tasks) == 1 else "joint"):
+        try:
+            return registry.get_many(*tasks)
+        except ModelNotLoadedError as e:
+            raise HTTPException(status_code=503, detail=str(e)) from None
+
+
+def _get_model(task: str) -> LoadedModel:
+    return _get_models(task)[0]
+
+
+def _title_block(
+    lm: LoadedModel, rows: list[dict[str, Any]], X: np.ndarray, shared: dict[Any, Any] | None = None
+) -> np.ndarray:
+    """Append the hashed title block a model was trained with (hashed once per hasher)."""
+    hasher = lm.title_hasher
+    if hasher is None:
+        return X
+    block = shared.get(hasher) if shared is not None else None
+    if block is None:
+        with STAGE_SECONDS.time(stage="title_hash", task=lm.task):
+            block = hasher.transform([r.get("title") for r in rows]).toarray()
+        if shared is not None:
+            shared[hasher] = block
+    return np.hstack([X, block.astype(X.dtype, copy=False)])
+
+
+def _aggregate_block(
+    lm: LoadedModel, rows: list[dict[str, Any]], X: np.ndarray, shared: dict[Any, Any] | None = None
+) -> np.ndarray:
+    """
+    Fill the seller / product history columns a model was trained with from point
+    lookups in the published aggregate tables (looked up once per request).
+    """
+    pos = [i for i, c in enumerate(lm.columns) if c in _AGG_FEATURES]
+    if not pos:
+        return X
+    index = shared.get(AggregateIndex) if shared is not None else None
+    if index is None:
+        with STAGE_SECONDS.time(stage="aggregate_lookup", task=lm.task):
+            try:
+                index = aggregate_lookup.lookup(rows)
+            except duckdb.Error:
+                # no history to read; the listing scores as one from an unseen seller
+                index = AggregateIndex()
+        if shared is not None:
+            shared[AggregateIndex] = index
+    if not X.flags.writeable:
+        X = X.copy()
+    X[:, pos] = index.matrix(rows, [lm.columns[i] for i in pos])
+    return X
+
+
+def _stage_profiler(task: str) -> PipelineProfiler | None:
+    """With api.profile_features, records each build_features stage under STAGE_SECONDS."""
+    if not cfg.api__profile_features:
+        return None
+    return PipelineProfiler(
+        track_memory=False,
+        on_stage=lambda name, s: STAGE_SECONDS.observe(s, stage=f"features_{name}", task=task),
+    )
 
-    payload = pd.DataFrame([item.model_dump()])
-    X = prepare_features_for_inference(payload)
+
+def _feature_matrix(lm: LoadedModel, rows: list[dict[str, Any]]) -> np.ndarray:
+    """Feature matrix for all rows at once, in model column order."""
+    profiler = _stage_profiler(lm.task)
+    if lm.plan is not None and profiler is None:
+        # the compiled plan aligns and fills its float32 output in the same pass
+        with STAGE_SECONDS.time(stage="features", task=lm.task):
+            X = lm.plan.transform_many(rows)
+        return _title_block(lm, rows, _aggregate_block(lm, rows, X))
+    with STAGE_SECONDS.time(stage="features", task=lm.task):
+        X = build_inference_features(pd.DataFrame(rows), lm.state, profiler)
     if X.height == 0:
         raise HTTPException(status_code=400, detail="No features produced from payload.")
-    cols = _load_feature_columns("reg_feature_columns.json")
-    if cols:
-        X = align_to_columns(X, cols)
-    yhat = float(model.predict(X.to_pandas().fillna(0).values)[0])
-    return {"model": model_path, "prediction": yhat}
+    if lm.columns:
+        with STAGE_SECONDS.time(stage="align", task=lm.task):
+            X = align_to_columns(X, lm.columns)
+    with STAGE_SECONDS.time(stage="to_numpy", task=lm.task):
+        X_np = to_float32(X)
+    return _title_block(lm, rows, _aggregate_block(lm, rows, X_np))
 
 
-@app.post("/predict/sold")
-def predict_sold(item: ListingIn) -> dict[str, Any]:
-    # Prefer LightGBM if present; else fall back to logistic
-    model_path = (
-        "clf_lightgbm.joblib" if (ART_DIR / "clf_lightgbm.joblib").exists() else "clf_logit.joblib"
+def _predict(lm: LoadedModel, X: np.ndarray, method: str) -> np.ndarray:
+    MODEL_ROWS.inc(len(X), task=lm.task, model=lm.name)
+    with STAGE_SECONDS.time(stage="predict", task=lm.task):
+        return np.asarray(getattr(lm.model, method)(X), dtype=float)
+
+
+def _price_outputs(lm: LoadedModel, X: np.ndarray) -> list[dict[str, Any]]:
+    yhat = _predict(lm, X, "predict")
+    return [{"prediction": float(v)} for v in yhat]
+
+
+def _sold_outputs(lm: LoadedModel, X: np.ndarray) -> list[dict[str, Any]]:
+    proba = _predict(lm, X, "predict_proba")[:, 1]
+    return [{"probability": float(p), "label": int(p >= 0.5)} for p in proba]
+
+
+Scorer = Callable[[LoadedModel, np.ndarray], list[dict[str, Any]]]
+SCORERS: dict[str, Scorer] = {"reg": _price_outputs, "clf": _sold_outputs}
+
+
+def _score_rows(task: str, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Score already-validated rows against one registry snapshot."""
+    lm = _get_model(task)
+    outputs = SCORERS[task](lm, _feature_matrix(lm, rows))
+    return [{"model": lm.name, "version": lm.version, **out} for out in outputs]
+
+
+def _align_pair(feats: pl.DataFrame, *models: LoadedModel) -> list[np.ndarray]:
+    out = []
+    for lm in models:
+        with STAGE_SECONDS.time(stage="align", task=lm.task):
+            X = align_to_columns(feats, lm.columns) if lm.columns else feats
+        with STAGE_SECONDS.time(stage="to_numpy", task=lm.task):
+            out.append(to_float32(X))
+    return out
+
+
+def _score_joint_rows(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Price and sell-through for the same rows from a single feature build."""
+    reg, clf = _get_models("reg", "clf")
+    profiler = _stage_profiler("joint")
+    joint = registry.joint_plan([reg, clf]) if profiler is None else None
+    if joint is not None:
+        with STAGE_SECONDS.time(stage="features", task="joint"):
+            X_reg, X_clf = joint.transform_many(rows)
+    else:
+        with STAGE_SECONDS.time(stage="features", task="joint"):
+            feats = build_inference_features(pd.DataFrame(rows), reg.state, profiler)
+        X_reg, X_clf = _align_pair(feats, reg, clf)
+    return _joint_outputs(reg, clf, rows, X_reg, X_clf)
+
+
+def _joint_outputs(
+    reg: LoadedModel,
+    clf: LoadedModel,
+    rows: list[dict[str, Any]],
+    X_reg: np.ndarray,
+    X_clf: np.ndarray,
+    aggregates: bool = True,
+) -> list[dict[str, Any]]:
+    """
+    Score the aligned matrices of both models. Without `aggregates` the history
+    columns are left as they are (stored rows carry their own as-of values).
+    """
+    shared: dict[Any, Any] = {}
+    if aggregates:
+        X_reg = _aggregate_block(reg, rows, X_reg, shared)
+        X_clf = _aggregate_block(clf, rows, X_clf, shared)
+    X_reg = _title_block(reg, rows, X_reg, shared)
+    X_clf = _title_block(clf, rows, X_clf, shared)
+    prices = _price_outputs(reg, X_reg)
+    solds = _sold_outputs(clf, X_clf)
+    return [
+        {
+            "price": {"model": reg.name, "version": reg.version, **p},
+            "sold": {"model": clf.name, "version": clf.version, **s},
+        }
+        for p, s in zip(prices, solds, strict=True)
+    ]
+
+
+def _reencoded(feats: pl.DataFrame, state: FeatureState) -> pl.DataFrame:
+    """
+    Stored rows with the label codes and target encodings of `state`. The pipeline
+    version pins only the configuration they come from; the store holds those of its
+    latest refresh, which a model trained earlier has not seen.
+    """
+    return feats.with_columns(
+        *label_encode_exprs(feats.columns, state.vocabularies),
+        *target_encode_exprs(feats.columns, state.target_encodings),
+    )
+
+
+def _score_stored_item(item_id: str) -> dict[str, Any]:
+    """Price and sell-through for a listing from its materialized feature-store row."""
+    reg, clf = _get_models("reg", "clf")
+    version = reg.feature_version
+    if reg.state is None or clf.state is None or version is None or clf.feature_version != version:
+        raise HTTPException(
+            status_code=503, detail="No feature state loaded to match stored features against."
+        )
+    with STAGE_SECONDS.time(stage="store_lookup", task="joint"):
+        try:
+            feats = feature_store.lookup([item_id], version)
+        except duckdb.Error as e:
+            raise HTTPException(status_code=503, detail=f"Feature store unavailable: {e}") from None
+    if feats.is_empty():
+        raise HTTPException(
+            status_code=404,
+            detail=f"No stored features for item_id={item_id!r} at pipeline version {version}.",
+        )
+    rows = feats.select("title").to_dicts() if "title" in feats.columns else [{}]
+    (X_reg,) = _align_pair(_reencoded(feats, reg.state), reg)
+    (X_clf,) = _align_pair(_reencoded(feats, clf.state), clf)
+    return {
+        "item_id": item_id,
+        "feature_version": version,
+        **_joint_outputs(reg, clf, rows, X_reg, X_clf, aggregates=False)[0],
+    }
+
+
+# Concurrent single-listing requests are coalesced into one predict call per window
+batchers: dict[str, MicroBatcher[dict[str, Any], dict[str, Any]]] = {
+    task: MicroBatcher(
+        partial(_score_rows, task), cfg.api__batch_window_ms, cfg.api__batch_max_size
     )
+    for task in SCORERS
+}
+batchers["joint"] = MicroBatcher(
+    _score_joint_rows, cfg.api__batch_window_ms, cfg.api__batch_max_size
+)
+
+
+CacheControl = Annotated[str | None, Header()]
+# Cached single-listing results carry these per-model fields; the rest is the output
+_ENVELOPE = ("model", "version")
+
+
+def _cache_policy(cache_control: str | None) -> tuple[bool, bool]:
+    """(read, write) for a request. `no-cache` forces a fresh score, `no-store` skips both."""
+    if cache.max_entries <= 0:
+        return False, False
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    write = "no-store" not in directives
+    return write and "no-cache" not in directives, write
+
+
+def _cached_one(task: str, row: dict[str, Any]) -> dict[str, Any] | None:
+    """Cached result for `row` under the model version(s) being served right now."""
+    models = _get_models("reg", "clf") if task == "joint" else _get_models(task)
+    with STAGE_SECONDS.time(stage="cache", task=task):
+        if task == "joint":
+            return cache.get(cache_key(task, "+".join(m.version for m in models), row))
+        hit = cache.get(cache_key(task, models[0].version, row))
+    return None if hit is None else {"model": models[0].name, "version": models[0].version, **hit}
+
+
+def _store_one(task: str, row: dict[str, Any], result: dict[str, Any]) -> None:
+    # Keyed by the version that actually scored the row, in case a swap happened meanwhile
+    if task == "joint":
+        version = f"{result['price']['version']}+{result['sold']['version']}"
+        cache.put(cache_key(task, version, row), result)
+    else:
+        out = {k: v for k, v in result.items() if k not in _ENVELOPE}
+        cache.put(cache_key(task, result["version"], row), out)
+
+
+def _count_served(task: str, result: dict[str, Any]) -> None:
+    if task == "joint":
+        MODEL_REQUESTS.inc(task="reg", model=result["price"]["model"])
+        MODEL_REQUESTS.inc(task="clf", model=result["sold"]["model"])
+    else:
+        MODEL_REQUESTS.inc(task=task, model=result["model"])
+
+
+async def _predict_one(
+    task: str, item: ListingIn, response: Response, cache_control: str | None = None
+) -> dict[str, Any]:
+    row = item.model_dump()
+    read, write = _cache_policy(cache_control)
+    if read:
+        hit = _cached_one(task, row)
+        if hit is not None:
+            _count_served(task, hit)
+            response.headers["X-Cache"] = "HIT"
+            return hit
+    if cfg.api__batch_window_ms > 0:
+        result = await batchers[task].submit(row)
+    elif task == "joint":
+        result = (await run_in_threadpool(_score_joint_rows, [row]))[0]
+    else:
+        result = (await run_in_threadpool(_score_rows, task, [row]))[0]
+    if write:
+        _store_one(task, row, result)
+    _count_served(task, result)
+    response.headers["X-Cache"] = "MISS" if read else "BYPASS"
+    return result
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'listing'}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def _score_batch(
+    task: str, lm: LoadedModel, items: list[Any], cache_control: str | None = None
+) -> list[dict[str, Any]]:
+    """
+    Validate each listing on its own, then build features and predict for all valid
+    rows not already cached in one pass. Invalid rows are reported in place instead of
+    failing the batch.
+    """
+    score = SCORERS[task]
+    read, write = _cache_policy(cache_control)
+    results: list[dict[str, Any]] = [{} for _ in items]
+    valid: list[tuple[int, ListingIn]] = []
+    for i, raw in enumerate(items):
+        item_id = raw.get("item_id") if isinstance(raw, dict) else None
+        results[i] = {"index": i, "item_id": item_id}
+        if not isinstance(raw, dict):
+            results[i]["error"] = "listing must be a JSON object"
+            continue
+        try:
+            valid.append((i, ListingIn.model_validate(raw)))
+        except ValidationError as e:
+            results[i]["error"] = _format_validation_error(e)
+
+    pending: list[tuple[int, dict[str, Any], str]] = []
+    with STAGE_SECONDS.time(stage="cache", task=task):
+        for i, item in valid:
+            row = item.model_dump()
+            key = cache_key(task, lm.version, row)
+            hit = cache.get(key) if read else None
+            if hit is None:
+                pending.append((i, row, key))
+            else:
+                results[i].update(hit)
+    if not pending:
+        return results
+
+    rows = [row for _, row, _ in pending]
     try:
-        model = _load_model(model_path)
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=400, detail=str(e)) from None
+        outputs = score(lm, _feature_matrix(lm, rows))
+    except Exception:
+        # A row the pipeline cannot handle poisons the whole matrix; isolate it
+        outputs = []
+        for row in rows:
+            try:
+                outputs.extend(score(lm, _feature_matrix(lm, [row])))
+            except Exception as e:
+                outputs.append({"error": str(e) or type(e).__name__})
 
-    payload = pd.DataFrame([item.model_dump()])
-    X = prepare_features_for_inference(payload)
-    if X.height == 0:
-        raise HTTPException(status_code=400, detail="No features produced from payload.")
-    cols = _load_feature_columns("clf_feature_columns.json")
-    if cols:
-        X = align_to_columns(X, cols)
-    proba = float(model.predict_proba(X.to_pandas().fillna(0).values)[0, 1])
-    return {"model": model_path, "probability": proba, "label": int(proba >= 0.5)}
+    for (i, _, key), out in zip(pending, outputs, strict=True):
+        results[i].update(out)
+        if write and "error" not in out:
+            cache.put(key, out)
+    return results
+
+
+def _check_batch_size(items: list[Any]) -> None:
+    if len(items) > cfg.api__max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(items)} exceeds max_batch_size={cfg.api__max_batch_size}.",
+        )
+
+
+def _collect_cache_and_batching() -> list[str]:
+    """Gauges/counters kept by the cache, batchers and registry, read at scrape time."""
+    c = cache.stats()
+    lines = render_family(
+        "ebay_price_cache_lookups_total",
+        "counter",
+        "Prediction cache lookups by result.",
+        [({"result": "hit"}, c["hits"]), ({"result": "miss"}, c["misses"])],
+    )
+    lines += render_family(
+        "ebay_price_cache_evictions_total",
+        "counter",
+        "Prediction cache entries dropped, by reason.",
+        [({"reason": "lru"}, c["evictions"]), ({"reason": "ttl"}, c["expirations"])],
+    )
+    lines += render_family(
+        "ebay_price_cache_entries", "gauge", "Entries in the prediction cache.", [({}, c["size"])]
+    )
+    batch_samples = []
+    for task, b in batchers.items():
+        s = b.stats.to_dict()
+        for le, n in s["size_le"].items():
+            batch_samples.append(({"task": task, "le": le, "__name__": "_bucket"}, n))
+        batch_samples += [
+            ({"task": task, "le": "+Inf", "__name__": "_bucket"}, s["batches"]),
+            ({"task": task, "__name__": "_sum"}, s["items"]),
+            ({"task": task, "__name__": "_count"}, s["batches"]),
+        ]
+    lines += render_family(
+        "ebay_price_microbatch_size",
+        "histogram",
+        "Listings per coalesced model call.",
+        batch_samples,
+    )
+    lines += render_family(
+        "ebay_price_model_info",
+        "gauge",
+        "Models currently being served.",
+        [({"task": t, **v}, 1) for t, v in registry.versions().items()],
+    )
+    return lines
+
+
+metrics.add_collector(_collect_cache_and_batching)
+
+
+# A line longer than this without a newline is treated as a broken stream
+MAX_NDJSON_LINE_BYTES = 1 << 20
+
+
+class _LineTooLongError(ValueError):
+    pass
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Non-blank lines of an NDJSON body, read as it arrives rather than buffered whole."""
+    buf = b""
+    async for part in request.stream():
+        buf += part
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buf) > MAX_NDJSON_LINE_BYTES:
+            raise _LineTooLongError(f"line exceeds {MAX_NDJSON_LINE_BYTES} bytes")
+    if buf.strip():
+        yield buf
+
+
+def _score_ndjson_chunk(
+    task: str, lm: LoadedModel, lines: list[bytes], offset: int, cache_control: str | None
+) -> bytes:
+    items: list[Any] = []
+    bad: dict[int, str] = {}
+    for j, line in enumerate(lines):
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(None)
+            bad[j] = f"invalid JSON: {e}"
+    results = _score_batch(task, lm, items, cache_control)
+    for j, r in enumerate(results):
+        r["index"] = offset + j
+        if j in bad:
+            r["error"] = bad[j]
+    return "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in results).encode()
+
+
+async def _stream_scores(
+    task: str, lm: LoadedModel, request: Request, cache_control: str | None
+) -> AsyncIterator[bytes]:
+    """
+    Score NDJSON listings `api__stream_chunk_size` at a time and emit each chunk's
+    results as soon as it is done, so neither side holds more than one chunk.
+    """
+    size = max(1, cfg.api__stream_chunk_size)
+    chunk: list[bytes] = []
+    offset = 0
+    try:
+        async for line in _ndjson_lines(request):
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield await run_in_threadpool(
+                    _score_ndjson_chunk, task, lm, chunk, offset, cache_control
+                )
+                offset += len(chunk)
+                chunk = []
+    except _LineTooLongError as e:
+        # the 200 is already on the wire; finish what we have and end with the error
+        if chunk:
+            yield await run_in_threadpool(_score_ndjson_chunk, task, lm, chunk, offset, None)
+            offset += len(chunk)
+        yield (json.dumps({"index": offset, "error": str(e)}) + "\n").encode()
+        return
+    if chunk:
+        yield await run_in_threadpool(_score_ndjson_chunk, task, lm, chunk, offset, cache_control)
+
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for generators that keep reading the request body while writing.
+    The stock class watches `receive` for a disconnect in parallel, which swallows the
+    body messages; here a disconnect surfaces through `request.stream()` instead.
+    """
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        await self.stream_response(send)
+
+
+def _streaming_response(
+    task: str, request: Request, cache_control: str | None
+) -> StreamingResponse:
+    # One model snapshot for the whole stream, so every row is scored by the same version
+    lm = _get_model(task)
+    MODEL_REQUESTS.inc(task=task, model=lm.name)
+    return _BodyStreamingResponse(
+        _stream_scores(task, lm, request, cache_control),
+        media_type="application/x-ndjson",
+        headers={"X-Model": lm.name, "X-Model-Version": lm.version},
+    )
+
+
+@app.middleware("http")
+async def observe_requests(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    t0 = time.perf_counter()
+    status = 500
+    with IN_FLIGHT.track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # label by route template, not raw path, to keep cardinality bounded
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, route=route, method=request.method)
+            REQUESTS.inc(route=route, method=request.method, status=str(status))
+
+
+@app.get("/health")
+def health(response: Response) -> dict[str, Any]:
+    models = registry.versions()
+    if not models:
+        response.status_code = 503
+    return {"status": "ok" if models else "no_models", "models": models}
+
+
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/models")
+def models() -> dict[str, Any]:
+    return registry.versions()
+
+
+@app.get("/stats/batching")
+def batching_stats() -> dict[str, Any]:
+    return {
+        "window_ms": cfg.api__batch_window_ms,
+        "max_batch_size": cfg.api__batch_max_size,
+        **{task: b.stats.to_dict() for task, b in batchers.items()},
+    }
+
+
+@app.get("/stats/cache")
+def cache_stats() -> dict[str, Any]:
+    return cache.stats()
+
+
+@app.post("/predict")
+async def predict(
+    item: ListingIn, response: Response, cache_control: CacheControl = None
+) -> dict[str, Any]:
+    """Price and sell-through probability for one listing, building its features once."""
+    return await _predict_one("joint", item, response, cache_control)
+
+
+@app.get("/predict/{item_id}")
+def predict_stored(item_id: str) -> dict[str, Any]:
+    """
+    Price and sell-through probability for a listing already in the warehouse, scored from
+    its feature-store row (no payload, no build_features); 404 if it was never materialized.
+    """
+    result = _score_stored_item(item_id)
+    _count_served("joint", result)
+    return result
+
+
+@app.post("/predict/price")
+async def predict_price(
+    item: ListingIn, response: Response, cache_control: CacheControl = None
+) -> dict[str, Any]:
+    return await _predict_one("reg", item, response, cache_control)
+
+
+@app.post("/predict/sold")
+async def predict_sold(
+    item: ListingIn, response: Response, cache_control: CacheControl = None
+) -> dict[str, Any]:
+    return await _predict_one("clf", item, response, cache_control)
+
+
+@app.post("/predict/price/batch")
+def predict_price_batch(
+    items: list[Any] = Body(...), cache_control: CacheControl = None  # noqa: B008
+) -> dict[str, Any]:
+    _check_batch_size(items)
+    lm = _get_model("reg")
+    MODEL_REQUESTS.inc(task="reg", model=lm.name)
+    return {
+        "model": lm.name,
+        "version": lm.version,
+        "results": _score_batch("reg", lm, items, cache_control),
+    }
+
+
+@app.post("/predict/sold/batch")
+def predict_sold_batch(
+    items: list[Any] = Body(...), cache_control: CacheControl = None  # noqa: B008
+) -> dict[str, Any]:
+    _check_batch_size(items)
+    lm = _get_model("clf")
+    MODEL_REQUESTS.inc(task="clf", model=lm.name)
+    return {
+        "model": lm.name,
+        "version": lm.version,
+        "results": _score_batch("clf", lm, items, cache_control),
+    }
+
+
+@app.post("/predict/price/stream")
+async def predict_price_stream(
+    request: Request, cache_control: CacheControl = None
+) -> StreamingResponse:
+    """NDJSON in (one `ListingIn` per line), NDJSON price predictions out, in input order."""
+    return _streaming_response("reg", request, cache_control)
+
+
+@app.post("/predict/sold/stream")
+async def predict_sold_stream(
+    request: Request, cache_control: CacheControl = None
+) -> StreamingResponse:
+    """NDJSON in (one `ListingIn` per line), NDJSON sell-through predictions out."""
+    return _streaming_response("clf", request, cache_control)
@@ -16,6 +16,13 @@ def get_model():
     return load_reg_model_and_columns()
 
 
+@st.cache_resource(show_spinner=False)
+def get_feature_state():
+    from ebay_price.modeling.loaders import load_feature_state
+
+    return load_feature_state()
+
+
 @st.cache_data(show_spinner=False)
 def read_csv_cached(path_str: str):
     from pathlib import Path as _P
@@ -99,7 +106,7 @@ with tabs[0]:
                 }
 
                 # Build features and predict
-                X_pl = prepare_features_for_inference(pd.DataFrame([payload]))
+                X_pl = prepare_features_for_inference(pd.DataFrame([payload]), get_feature_state())
                 model_obj, cols, mname = get_model()
                 if cols:
                     X_pl = align_to_columns(X_pl, cols)
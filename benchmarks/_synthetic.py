@@ -0,0 +1,52 @@
+"""Synthetic listings shaped like the warehouse `listings` table, for benchmarks."""
+
+from __future__ import annotations
+
+import numpy as np
+import polars as pl
+
+BRANDS = ["Apple", "Samsung", "Google", "OnePlus", "Motorola", "Sony", "Nokia", "Xiaomi"]
+CONDITIONS = ["New", "Used", "Refurbished", "For parts"]
+LISTING_TYPES = ["Auction", "BuyItNow", "FixedPrice"]
+
+
+def synthetic_listings(n: int, seed: int = 0, with_targets: bool = True) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    brand_idx = rng.integers(0, len(BRANDS), n)
+    model_no = rng.integers(1, 200, n)
+    brands = np.array(BRANDS)[brand_idx]
+    models = np.char.add("M", model_no.astype(str))
+    start = np.datetime64("2025-01-01T00:00:00") + rng.integers(0, 300 * 86400, n).astype(
+        "timedelta64[s]"
+    )
+    end = start + rng.integers(3600, 10 * 86400, n).astype("timedelta64[s]")
+    df = pl.DataFrame(
+        {
+            "item_id": np.char.add("id", np.arange(n).astype(str)),
+            "title": np.char.add(np.char.add(brands, " "), np.char.add(models, " 128GB unlocked")),
+            "category_path": np.char.add("Phones > ", rng.integers(0, 40, n).astype(str)),
+            "brand": brands,
+            "model": models,
+            "condition": np.array(CONDITIONS)[rng.integers(0, len(CONDITIONS), n)],
+            "start_time": np.datetime_as_string(start, unit="s"),
+            "end_time": np.datetime_as_string(end, unit="s"),
+            "listing_type": np.array(LISTING_TYPES)[rng.integers(0, len(LISTING_TYPES), n)],
+            "start_price": rng.gamma(2.0, 150.0, n),
+            "shipping_cost": rng.gamma(1.0, 8.0, n),
+            "seller_username": np.char.add("seller", rng.integers(0, n // 20 + 1, n).astype(str)),
+            "seller_feedback_score": rng.integers(0, 50_000, n),
+            "seller_positive_percent": rng.uniform(85.0, 100.0, n),
+            "watchers": rng.integers(0, 60, n),
+            "bids": rng.integers(0, 40, n),
+            "currency": np.full(n, "USD"),
+        }
+    ).with_columns(
+        (pl.col("start_time") + "Z").alias("start_time"),
+        (pl.col("end_time") + "Z").alias("end_time"),
+    )
+    if with_targets:
+        df = df.with_columns(
+            pl.Series("final_price", rng.gamma(2.0, 170.0, n)),
+            pl.Series("sold", rng.integers(0, 2, n)),
+        )
+    return df
@@ -0,0 +1,99 @@
+"""
+Seller / product price history: keeping the aggregate tables current after an upsert by
+rebuilding them vs recomputing only the touched keys, reading one listing's history by
+aggregating the warehouse at request time vs a point lookup in the published index, and
+computing every listing's history as of its start for a feature build.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_aggregates.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.features import aggregates as agg
+from ebay_price.features.build_features import build_features
+from ebay_price.features.state import fit_feature_state
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--upsert-rows", type=int, default=1_000)
+    p.add_argument("--lookups", type=int, default=200)
+    args = p.parse_args()
+
+    df = synthetic_listings(args.rows)
+    db = Path(tempfile.mkdtemp()) / "warehouse.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    t0 = time.perf_counter()
+    agg.rebuild_aggregates(con)
+    t_rebuild = time.perf_counter() - t0
+
+    new = synthetic_listings(args.upsert_rows, seed=1).with_columns(
+        pl.concat_str(pl.lit("new"), pl.col("item_id")).alias("item_id")
+    )
+    con.register("incoming", new)
+    t0 = time.perf_counter()
+    agg.stage_touched_keys(con, "incoming")
+    con.execute("INSERT INTO listings SELECT * FROM incoming")
+    agg.update_aggregates(con)
+    t_update = time.perf_counter() - t0
+    agg.publish_aggregates(con, agg.aggregates_online_path(db))
+    index = agg.AggregateIndex.load(con)
+    t0 = time.perf_counter()
+    asof = agg.AggregateIndex.as_of(con)
+    t_asof = time.perf_counter() - t0
+
+    rows = df.sample(args.lookups, seed=0).to_dicts()
+    t0 = time.perf_counter()
+    for r in rows:
+        con.execute(
+            f"SELECT * FROM ({agg._stats_query(agg.AGG_KEYS[0], df.columns)}) "
+            "WHERE seller_username = ?",
+            [r["seller_username"]],
+        ).fetchall()
+    t_scan = (time.perf_counter() - t0) / len(rows)
+    con.close()
+    lookup = agg.AggregateLookup(agg.aggregates_online_path(db))
+    t0 = time.perf_counter()
+    for r in rows:
+        lookup.lookup([r])
+    t_point = (time.perf_counter() - t0) / len(rows)
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), 64):
+        lookup.lookup(rows[i : i + 64])
+    t_batch = (time.perf_counter() - t0) / len(rows)
+
+    state = fit_feature_state(df)
+    t0 = time.perf_counter()
+    build_features(df, state)
+    t_plain = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    build_features(df, state, aggregates=asof)
+    t_joined = time.perf_counter() - t0
+
+    print(
+        f"{args.rows} listings, {index.frames['seller'].height} sellers, "
+        f"{index.frames['product'].height} products"
+    )
+    print(f"rebuild all aggregates         {t_rebuild:8.2f} s")
+    print(f"update after {args.upsert_rows}-row upsert   {t_update:8.2f} s")
+    print(f"seller history, scan listings  {t_scan * 1e3:8.2f} ms/listing")
+    print(f"both histories, point lookup   {t_point * 1e3:8.2f} ms/listing")
+    print(f"both histories, 64-row batch   {t_batch * 1e3:8.2f} ms/listing")
+    print(f"as-of history, every listing   {t_asof:8.2f} s")
+    print(f"build_features                 {t_plain:8.2f} s")
+    print(f"build_features + aggregates    {t_joined:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
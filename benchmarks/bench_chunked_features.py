@@ -0,0 +1,69 @@
+"""
+Full feature refresh over a DuckDB warehouse: load the whole `listings` table into
+polars (the default) vs streaming it in record batches (`--batch-rows`). Each run is a
+fresh process; the peak is whole-process RSS, since the in-memory path's input is the
+table itself.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_chunked_features.py --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_features import _PeakSampler
+
+
+def _run_one(db: str, batch_rows: int) -> None:
+    from ebay_price.features import build_features as bf
+    from ebay_price.features.incremental import full_refresh
+
+    bf.PROCESSED_DIR = Path(db).parent / "processed"
+    bf.PROCESSED_DIR.mkdir(exist_ok=True)
+    sampler = _PeakSampler()
+    sampler.start()
+    t0 = time.perf_counter()
+    rows = full_refresh(db, Path(db).parent / "state.json", batch_rows=batch_rows or None)
+    secs = time.perf_counter() - t0
+    print(json.dumps({"secs": secs, "peak_mb": sampler.stop(), "rows": rows}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=5_000_000)
+    p.add_argument("--batch-rows", type=int, default=250_000)
+    p.add_argument("--db", help=argparse.SUPPRESS)
+    p.add_argument("--mode-batch", type=int, help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.db:
+        _run_one(args.db, args.mode_batch)
+        return
+
+    import duckdb
+    from _synthetic import synthetic_listings
+
+    db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+    con = duckdb.connect(db)
+    con.register("df", synthetic_listings(args.rows))
+    con.execute("CREATE TABLE listings AS SELECT *, now() AS _ingested_at FROM df")
+    con.close()
+    print(f"{args.rows} listings in the warehouse")
+    for label, batch in (("in memory", 0), (f"batches of {args.batch_rows}", args.batch_rows)):
+        # each run starts from the same warehouse, without the other run's feature store
+        run_db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+        shutil.copy(db, run_db)
+        cmd = [sys.executable, __file__, "--db", run_db, "--mode-batch", str(batch)]
+        res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        r = json.loads(res.stdout.strip().splitlines()[-1])
+        print(f"{label:<22} {r['secs']:7.2f} s   peak RSS {r['peak_mb']:8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
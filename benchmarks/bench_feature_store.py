@@ -0,0 +1,67 @@
+"""
+Features for one known item_id: read the listing from the warehouse and run
+build_features on it (the only option before) vs a point lookup in the feature store.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_feature_store.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+from _synthetic import synthetic_listings
+
+from ebay_price.features.build_features import build_features
+from ebay_price.features.state import fit_feature_state
+from ebay_price.features.store import FeatureStore, pipeline_version
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--lookups", type=int, default=200)
+    args = p.parse_args()
+
+    df = synthetic_listings(args.rows)
+    state = fit_feature_state(df)
+    feat = build_features(df, state)
+    db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+    con = duckdb.connect(db)
+    con.register("df", df)
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    con.execute("CREATE INDEX listings_item_id ON listings (item_id)")
+    con.close()
+    store = FeatureStore(db)
+    version = pipeline_version(state)
+    t0 = time.perf_counter()
+    store.write(feat, version)
+    print(f"{args.rows} rows, materialized in {time.perf_counter() - t0:.2f} s")
+
+    ids = [f"id{i}" for i in np.random.default_rng(0).integers(0, args.rows, args.lookups)]
+    t0 = time.perf_counter()
+    for i in ids:
+        con = duckdb.connect(db, read_only=True)
+        row = con.execute("SELECT * FROM listings WHERE item_id = ?", [i]).pl()
+        con.close()
+        build_features(row, state)
+    t_build = (time.perf_counter() - t0) / len(ids)
+    t0 = time.perf_counter()
+    for i in ids:
+        assert store.lookup([i], version).height == 1
+    t_lookup = (time.perf_counter() - t0) / len(ids)
+    t0 = time.perf_counter()
+    store.read(version)
+    t_bulk = time.perf_counter() - t0
+
+    print(f"listing + build_features  {t_build * 1e3:7.2f} ms/item")
+    print(f"feature store lookup      {t_lookup * 1e3:7.2f} ms/item")
+    print(f"bulk read for training    {t_bulk:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Wall time and peak memory of build_features: the stage-by-stage eager chain vs the
+single lazy query plan. Each run happens in a fresh process so peak RSS is comparable.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_features.py --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * _PAGE_MB
+
+
+class _PeakSampler(threading.Thread):
+    """Polls RSS while the build runs; ru_maxrss would include the input generation."""
+
+    def __init__(self, interval_s: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval_s = interval_s
+        self.peak = _rss_mb()
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval_s):
+            self.peak = max(self.peak, _rss_mb())
+
+    def stop(self) -> float:
+        self._stop_evt.set()
+        self.join()
+        return self.peak
+
+
+def _run_one(impl: str, rows: int) -> None:
+    from _synthetic import synthetic_listings
+
+    from ebay_price.features import build_features as bf
+    from ebay_price.features.state import fit_feature_state
+
+    df = synthetic_listings(rows)
+    state = fit_feature_state(df)
+    fn = bf.build_features_eager if impl == "eager" else bf.build_features
+    base = _rss_mb()
+    sampler = _PeakSampler()
+    sampler.start()
+    t0 = time.perf_counter()
+    out = fn(df, state)
+    secs = time.perf_counter() - t0
+    peak = sampler.stop()
+    print(json.dumps({"secs": secs, "peak_mb": peak - base, "cols": out.width}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--impl", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.impl:
+        _run_one(args.impl, args.rows)
+        return
+
+    print(f"{args.rows} synthetic listings, best of {args.repeat} (fresh process each)")
+    for impl in ("eager", "lazy"):
+        runs = []
+        for _ in range(args.repeat):
+            cmd = [sys.executable, __file__, "--impl", impl, "--rows", str(args.rows)]
+            res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            runs.append(json.loads(res.stdout.strip().splitlines()[-1]))
+        secs = min(r["secs"] for r in runs)
+        peak = min(r["peak_mb"] for r in runs)
+        print(f"{impl:<6} {secs:7.2f} s   peak RSS above input {peak:8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Folding a small batch of new and updated listings into the processed outputs and the
+feature store: an incremental refresh after a full one, and how the store and
+features.parquet changed (rows restamped, bytes written).
+
+    PYTHONPATH=src poetry run python benchmarks/bench_incremental.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.features import build_features as bf
+from ebay_price.features.incremental import full_refresh, incremental_refresh
+
+
+def _bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.glob("*.parquet"))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--delta-rows", type=int, default=1_000)
+    args = p.parse_args()
+
+    root = Path(tempfile.mkdtemp())
+    bf.PROCESSED_DIR = root / "processed"
+    bf.PROCESSED_DIR.mkdir()
+    db, state = str(root / "warehouse.duckdb"), root / "state.json"
+    con = duckdb.connect(db)
+    con.register("df", synthetic_listings(args.rows))
+    con.execute("CREATE TABLE listings AS SELECT *, TIMESTAMP '2025-09-01' AS _ingested_at FROM df")
+    con.close()
+    t0 = time.perf_counter()
+    full_refresh(db, state)
+    t_full = time.perf_counter() - t0
+
+    # half new listings, half price updates of existing ones
+    new = synthetic_listings(args.delta_rows, seed=1)
+    new = new.with_columns(
+        pl.when(pl.int_range(pl.len()) % 2 == 0)
+        .then(pl.concat_str(pl.lit("new"), pl.col("item_id")))
+        .otherwise(pl.col("item_id"))
+        .alias("item_id")
+    )
+    con = duckdb.connect(db)
+    con.register("new", new)
+    con.execute("DELETE FROM listings WHERE item_id IN (SELECT item_id FROM new)")
+    con.execute("INSERT INTO listings SELECT *, TIMESTAMP '2025-09-02' AS _ingested_at FROM new")
+    con.close()
+    features = bf.PROCESSED_DIR / "features.parquet"
+    before = _bytes(features)
+    t0 = time.perf_counter()
+    incremental_refresh(db, state)
+    t_inc = time.perf_counter() - t0
+
+    con = duckdb.connect(db, read_only=True)
+    restamped = con.execute(
+        "SELECT count(*) FROM feature_store WHERE _materialized_at = "
+        "(SELECT max(_materialized_at) FROM feature_store)"
+    ).fetchone()[0]
+    con.close()
+    print(f"{args.rows} listings, {args.delta_rows}-row delta")
+    print(f"full refresh                   {t_full:8.2f} s")
+    print(f"incremental refresh            {t_inc:8.2f} s")
+    print(f"feature-store rows restamped   {restamped:8d}")
+    print(f"features.parquet MB            {before / 1e6:8.1f} -> {_bytes(features) / 1e6:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Single-row inference latency: pandas/polars pipeline vs the compiled InferencePlan.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_inference.py --n 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+import pandas as pd
+from _synthetic import synthetic_listings
+
+from ebay_price.api.schemas import ListingIn
+from ebay_price.features.align import align_to_columns
+from ebay_price.features.build_features import build_features
+from ebay_price.features.fastpath import InferencePlan
+from ebay_price.features.inference import build_inference_features
+from ebay_price.features.state import fit_feature_state
+from ebay_price.modeling.datasets import feature_target_split
+
+
+def _timeit(fn: Callable[[dict], object], payloads: list[dict]) -> list[float]:
+    out: list[float] = []
+    for p in payloads:
+        t0 = time.perf_counter()
+        fn(p)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def _report(name: str, us: list[float]) -> None:
+    us = sorted(us)
+    p99 = us[int(0.99 * (len(us) - 1))]
+    print(f"{name:<10} median {statistics.median(us):9.1f} us   p99 {p99:9.1f} us")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=2000, help="requests to time per path")
+    p.add_argument("--train-rows", type=int, default=50_000)
+    args = p.parse_args()
+
+    train = synthetic_listings(args.train_rows)
+    state = fit_feature_state(train)
+    X, _ = feature_target_split(build_features(train, state), "final_price")
+    cols = X.columns
+    plan = InferencePlan(cols, state)
+
+    payloads = synthetic_listings(args.n, seed=1, with_targets=False).to_dicts()
+
+    def pipeline(raw: dict) -> object:
+        item = ListingIn(**raw)
+        feats = build_inference_features(pd.DataFrame([item.model_dump()]), state)
+        return align_to_columns(feats, cols).to_pandas().fillna(0).values
+
+    def fast(raw: dict) -> object:
+        return plan.transform(ListingIn(**raw).model_dump())
+
+    _timeit(pipeline, payloads[:50])  # warm-up
+    _timeit(fast, payloads[:50])
+    print(f"{len(cols)} feature columns, {args.n} single-row requests")
+    slow_us = _timeit(pipeline, payloads)
+    fast_us = _timeit(fast, payloads)
+    _report("pipeline", slow_us)
+    _report("plan", fast_us)
+    print(f"speedup (median): {statistics.median(slow_us) / statistics.median(fast_us):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
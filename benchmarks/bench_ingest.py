@@ -0,0 +1,66 @@
+"""
+File ingest into a fresh warehouse: the whole file validated into one frame and
+upserted at once (the default) vs streamed through in chunks (`--ingest-batch-rows`),
+each with the per-row and the columnar reader (`--ingest-reader`). Each run is a fresh
+process; the peak is whole-process RSS.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_ingest.py --rows 1500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_features import _PeakSampler
+
+
+def _run_one(path: str, db: str, batch_rows: int, reader: str) -> None:
+    from ebay_price.ingest import load
+    from ebay_price.ingest.cli import ingest_file
+
+    load.WAREHOUSE = Path(db)
+    sampler = _PeakSampler()
+    sampler.start()
+    t0 = time.perf_counter()
+    rows = ingest_file(path, batch_rows or None, reader=reader)
+    secs = time.perf_counter() - t0
+    print(json.dumps({"secs": secs, "peak_mb": sampler.stop(), "rows": rows}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_500_000)
+    p.add_argument("--batch-rows", type=int, default=50_000)
+    p.add_argument("--path", help=argparse.SUPPRESS)
+    p.add_argument("--db", help=argparse.SUPPRESS)
+    p.add_argument("--mode-batch", type=int, help=argparse.SUPPRESS)
+    p.add_argument("--mode-reader", help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.db:
+        _run_one(args.path, args.db, args.mode_batch, args.mode_reader)
+        return
+
+    from _synthetic import synthetic_listings
+
+    path = Path(tempfile.mkdtemp()) / "listings.jsonl"
+    synthetic_listings(args.rows, with_targets=False).write_ndjson(path)
+    print(f"{args.rows} listings, {path.stat().st_size / 2**20:.0f} MB of JSONL")
+    modes = (("whole file", 0), (f"chunks of {args.batch_rows}", args.batch_rows))
+    for reader in ("rows", "columnar"):
+        for label, batch in modes:
+            db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+            cmd = [sys.executable, __file__, "--path", str(path), "--db", db]
+            cmd += ["--mode-batch", str(batch), "--mode-reader", reader]
+            res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            r = json.loads(res.stdout.strip().splitlines()[-1])
+            print(f"{reader:<8} {label:<20} {r['secs']:7.2f} s   peak RSS {r['peak_mb']:8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
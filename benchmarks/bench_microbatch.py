@@ -0,0 +1,74 @@
+"""
+Throughput of concurrent single-listing scoring with and without micro-batching.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_microbatch.py --requests 4000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import warnings
+
+import numpy as np
+from _synthetic import synthetic_listings
+from lightgbm import LGBMRegressor
+
+from ebay_price.api.batching import MicroBatcher
+from ebay_price.features.build_features import build_features
+from ebay_price.features.fastpath import InferencePlan
+from ebay_price.features.state import fit_feature_state
+from ebay_price.modeling.datasets import feature_target_split, to_numpy
+
+
+async def _drive(score_one, rows: list[dict], concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(row: dict) -> None:
+        async with sem:
+            await score_one(row)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(r) for r in rows))
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=4000)
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--window-ms", type=float, default=2.0)
+    p.add_argument("--max-batch", type=int, default=64)
+    args = p.parse_args()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    train = synthetic_listings(20_000)
+    state = fit_feature_state(train)
+    X, y = feature_target_split(build_features(train, state), "final_price")
+    model = LGBMRegressor(n_estimators=400, verbosity=-1).fit(to_numpy(X), y.to_numpy())
+    plan = InferencePlan(X.columns, state)
+    rows = synthetic_listings(args.requests, seed=1, with_targets=False).to_dicts()
+
+    def score(batch: list[dict]) -> list[float]:
+        return np.asarray(model.predict(plan.transform_many(batch)), dtype=float).tolist()
+
+    async def unbatched(row: dict) -> float:
+        return (await asyncio.to_thread(score, [row]))[0]
+
+    batcher = MicroBatcher(score, window_ms=args.window_ms, max_batch=args.max_batch)
+
+    t_plain = asyncio.run(_drive(unbatched, rows, args.concurrency))
+    t_batched = asyncio.run(_drive(batcher.submit, rows, args.concurrency))
+    stats = batcher.stats.to_dict()
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"unbatched     {args.requests / t_plain:10.0f} req/s")
+    print(
+        f"micro-batched {args.requests / t_batched:10.0f} req/s  "
+        f"(mean batch {stats['mean_size']:.1f}, max {stats['max_size']})"
+    )
+    print(f"speedup: {t_plain / t_batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Model call latency: joblib (LightGBM / scikit-learn) vs the ONNX export on onnxruntime CPU,
+for single rows and 1k-row batches.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_onnx.py --n 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+import numpy as np
+from _synthetic import synthetic_listings
+from lightgbm import LGBMClassifier, LGBMRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from ebay_price.api.backends import OnnxModel
+from ebay_price.features.build_features import build_features
+from ebay_price.modeling.datasets import feature_target_split, to_numpy
+from ebay_price.modeling.onnx_export import parity, to_onnx
+
+BATCH = 1000
+
+
+def _timeit(fn: Callable[[np.ndarray], object], inputs: list[np.ndarray]) -> list[float]:
+    out: list[float] = []
+    for X in inputs:
+        t0 = time.perf_counter()
+        fn(X)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def _report(name: str, us: list[float]) -> float:
+    us = sorted(us)
+    p99 = us[int(0.99 * (len(us) - 1))]
+    med = statistics.median(us)
+    print(f"  {name:<8} median {med:9.1f} us   p99 {p99:9.1f} us")
+    return med
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=2000, help="single-row calls to time per backend")
+    p.add_argument("--batches", type=int, default=50, help=f"{BATCH}-row calls per backend")
+    p.add_argument("--train-rows", type=int, default=50_000)
+    args = p.parse_args()
+
+    train = build_features(synthetic_listings(args.train_rows))
+    X, y_reg = feature_target_split(train, "final_price")
+    _, y_clf = feature_target_split(train, "sold")
+    X_np = to_numpy(X)
+    y_reg, y_clf = y_reg.to_numpy(), y_clf.to_numpy()
+    hp = {"n_estimators": 400, "learning_rate": 0.05, "random_state": 42, "verbosity": -1}
+    models = {
+        "reg_lightgbm": LGBMRegressor(**hp).fit(X_np, y_reg),
+        "reg_linear": LinearRegression().fit(X_np, y_reg),
+        "clf_lightgbm": LGBMClassifier(**hp).fit(X_np, y_clf),
+        "clf_logit": LogisticRegression(max_iter=1000).fit(X_np, y_clf),
+    }
+
+    test = to_numpy(
+        feature_target_split(build_features(synthetic_listings(args.n, seed=1)), "final_price")[0]
+    ).astype(np.float32)
+    rows = [test[i : i + 1] for i in range(args.n)]
+    batches = [test[np.arange(BATCH) % args.n] for _ in range(args.batches)]
+    print(f"{X_np.shape[1]} feature columns, {args.n} single rows, {args.batches}x{BATCH} rows")
+
+    for name, model in models.items():
+        onnx_bytes = to_onnx(model, X_np.shape[1])
+        onx = OnnxModel(onnx_bytes)
+        method = "predict_proba" if name.startswith("clf") else "predict"
+        print(f"{name}  parity on {args.n} rows: {parity(model, onnx_bytes, test)}")
+        for label, inputs in (("1 row", rows), (f"{BATCH} rows", batches)):
+            print(f" {label}")
+            for m in (model, onx):
+                _timeit(getattr(m, method), inputs[:20])  # warm-up
+            slow = _report("joblib", _timeit(getattr(model, method), inputs))
+            fast = _report("onnx", _timeit(getattr(onx, method), inputs))
+            print(f"  speedup (median): {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Reading a listings dump into a normalized frame, before the upsert: a dict per row through
+`json.loads` / `csv.DictReader` and ListingRaw vs the columnar DuckDB readers.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_readers.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from _synthetic import synthetic_listings
+
+from ebay_price.ingest.normalize import normalize_frame, to_polars, validate_frame, validate_rows
+from ebay_price.ingest.sources import read_csv, read_jsonl, read_listings
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    args = p.parse_args()
+
+    df = synthetic_listings(args.rows, with_targets=False)
+    tmp = Path(tempfile.mkdtemp())
+    df.write_ndjson(tmp / "listings.jsonl")
+    df.write_csv(tmp / "listings.csv")
+    print(f"{args.rows} listings")
+    for suffix, read_rows in ((".jsonl", read_jsonl), (".csv", read_csv)):
+        path = tmp / f"listings{suffix}"
+        t0 = time.perf_counter()
+        by_rows = to_polars(validate_rows(read_rows(path)))
+        t_rows = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        columnar = normalize_frame(validate_frame(read_listings(path)))
+        t_columnar = time.perf_counter() - t0
+        assert columnar.equals(by_rows)
+        size = path.stat().st_size / 2**20
+        print(
+            f"{suffix[1:]:<5} ({size:4.0f} MB)  rows {t_rows:7.2f} s "
+            f"({args.rows / t_rows:>9,.0f} rows/s)   columnar {t_columnar:6.2f} s "
+            f"({args.rows / t_columnar:>10,.0f} rows/s)   {t_rows / t_columnar:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Ingesting a directory of JSONL shards into a fresh warehouse with one parsing process
+(everything inline) vs `--workers` processes parsing ahead of the single writer, then a
+re-run over the same directory, which only hashes the files and skips them all.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_shards.py --rows 1000000 --shards 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from _synthetic import synthetic_listings
+
+from ebay_price.ingest import load
+from ebay_price.ingest.shards import default_workers, ingest_shards, resolve_shards
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--shards", type=int, default=20)
+    p.add_argument("--workers", type=int, default=max(2, default_workers()))
+    p.add_argument("--reader", choices=("rows", "columnar"), default="rows")
+    args = p.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    src = tmp / "shards"
+    src.mkdir()
+    df = synthetic_listings(args.rows, with_targets=False)
+    size = -(-args.rows // args.shards)
+    for i in range(args.shards):
+        df.slice(i * size, size).write_ndjson(src / f"part-{i:04d}.jsonl")
+    paths = resolve_shards(src)
+    print(f"{args.rows} listings in {len(paths)} shards, {args.reader} reader")
+
+    for workers in (1, args.workers):
+        load.WAREHOUSE = tmp / f"workers{workers}.duckdb"
+        t0 = time.perf_counter()
+        report = ingest_shards(paths, args.reader, workers)
+        secs = time.perf_counter() - t0
+        print(f"{workers} worker(s)   {secs:7.2f} s ({report.rows / secs:>9,.0f} rows/s)")
+    t0 = time.perf_counter()
+    report = ingest_shards(paths, args.reader, args.workers)
+    secs = time.perf_counter() - t0
+    print(f"re-run          {secs:7.2f} s ({report.skipped} shards skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Full feature refresh with the polars engine (load `listings`, run build_features) vs
+the duckdb engine (fit and compute inside the warehouse, COPY the result to Parquet).
+Each run is a fresh process on its own copy of the warehouse; the peak is
+whole-process RSS.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_sql_features.py --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_features import _PeakSampler
+
+
+def _run_one(db: str, engine: str) -> None:
+    from ebay_price.features import build_features as bf
+    from ebay_price.features.incremental import full_refresh
+
+    bf.PROCESSED_DIR = Path(db).parent / "processed"
+    bf.PROCESSED_DIR.mkdir(exist_ok=True)
+    sampler = _PeakSampler()
+    sampler.start()
+    t0 = time.perf_counter()
+    rows = full_refresh(db, Path(db).parent / "state.json", engine=engine)
+    secs = time.perf_counter() - t0
+    print(json.dumps({"secs": secs, "peak_mb": sampler.stop(), "rows": rows}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--db", help=argparse.SUPPRESS)
+    p.add_argument("--engine", help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.db:
+        _run_one(args.db, args.engine)
+        return
+
+    import duckdb
+    from _synthetic import synthetic_listings
+
+    db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+    con = duckdb.connect(db)
+    con.register("df", synthetic_listings(args.rows))
+    con.execute("CREATE TABLE listings AS SELECT *, now()::TIMESTAMP AS _ingested_at FROM df")
+    con.close()
+    print(f"{args.rows} listings in the warehouse")
+    for engine in ("polars", "duckdb"):
+        run_db = str(Path(tempfile.mkdtemp()) / "warehouse.duckdb")
+        shutil.copy(db, run_db)
+        cmd = [sys.executable, __file__, "--db", run_db, "--engine", engine]
+        res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        r = json.loads(res.stdout.strip().splitlines()[-1])
+        print(f"{engine:<8} {r['secs']:7.2f} s   peak RSS {r['peak_mb']:8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
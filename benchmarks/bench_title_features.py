@@ -0,0 +1,52 @@
+"""
+Title features: per-row regex word count vs native `count_matches`, and the hashed
+token/bigram block on one process vs all cores.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_title_features.py --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.features.text import WORD_PATTERN, TitleHasher, _word_count, hash_titles
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--hash-features", type=int, default=2**12)
+    args = p.parse_args()
+
+    titles = synthetic_listings(args.rows).get_column("title")
+    print(f"{args.rows} titles, {os.cpu_count()} cores")
+
+    t0 = time.perf_counter()
+    slow = titles.map_elements(_word_count, return_dtype=pl.Int64)
+    t_slow = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = titles.str.count_matches(WORD_PATTERN).cast(pl.Int64)
+    t_fast = time.perf_counter() - t0
+    assert slow.equals(fast)
+    print(f"word count  map_elements {t_slow:6.2f} s   count_matches {t_fast:6.2f} s")
+
+    hasher = TitleHasher(n_features=args.hash_features)
+    t0 = time.perf_counter()
+    one = hash_titles(titles, hasher, n_jobs=1)
+    t_one = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    hash_titles(titles, hasher)
+    t_all = time.perf_counter() - t0
+    print(
+        f"hashing     1 process {t_one:6.2f} s   all cores {t_all:6.2f} s   "
+        f"nnz/row {one.nnz / one.shape[0]:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Training set before and after dtype compaction: in-memory size, train.parquet size,
+and the model matrix (pandas float64 with fillna, the previous to_numpy, vs the
+float32 matrix built straight from polars).
+
+    PYTHONPATH=src poetry run python benchmarks/bench_train_dtypes.py --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.features.build_features import build_features, training_frame
+from ebay_price.features.dtypes import to_float32
+from ebay_price.modeling.datasets import feature_target_split
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2_000_000)
+    args = p.parse_args()
+
+    feat = build_features(synthetic_listings(args.rows))
+    compact = training_frame(feat)
+    wide = feat.select(compact.columns)
+    tmp = Path(tempfile.mkdtemp())
+    print(f"{args.rows} listings, {compact.width} training columns")
+    print(f"{'':<10}{'memory MB':>11}{'parquet MB':>12}{'matrix MB':>11}{'matrix s':>10}")
+    for label, df in (("wide", wide), ("compact", compact)):
+        path = tmp / f"{label}.parquet"
+        df.write_parquet(path)
+        X, _ = feature_target_split(df, "final_price")
+        t0 = time.perf_counter()
+        M = X.to_pandas().fillna(0).values if label == "wide" else to_float32(X)
+        secs = time.perf_counter() - t0
+        print(
+            f"{label:<10}{df.estimated_size() / 2**20:>11.0f}"
+            f"{path.stat().st_size / 2**20:>12.0f}{M.nbytes / 2**20:>11.0f}{secs:>10.2f}"
+        )
+        del M
+    assert pl.read_parquet(tmp / "compact.parquet").schema == compact.schema
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Upserting a batch (half updates, half new listings) into a warehouse that already holds
+`--rows` listings: the previous merge (an UPDATE ... FROM and an INSERT ... WHERE NOT
+EXISTS per table) vs one MERGE per table. Each run starts from a copy of the same
+warehouse and includes the aggregate update and the commit. Then many small upserts
+with a connection each vs one shared connection.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_upsert.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.features.aggregates import rebuild_aggregates, stage_touched_keys
+from ebay_price.ingest import load
+from ebay_price.ingest.normalize import normalize_frame
+
+
+def _four_statement_batch(con: duckdb.DuckDBPyConnection, df: pl.DataFrame) -> int:
+    """The merge `load._upsert_batch` ran before MERGE, for comparison."""
+    cols_csv = ", ".join(load.BASE_COLS)
+    cols_csv_s = ", ".join(f"s.{c}" for c in load.BASE_COLS)
+    set_csv = ", ".join(f"{c} = s.{c}" for c in load.BASE_COLS[1:])
+    con.register("stg_raw", df.to_arrow())
+    for table in ("raw_listings", "listings"):
+        if table == "listings":
+            stage_touched_keys(con, "stg_raw")
+        con.execute(
+            f"UPDATE {table} AS t SET {set_csv}, _ingested_at = now() "
+            "FROM stg_raw AS s WHERE t.item_id = s.item_id"
+        )
+        con.execute(
+            f"INSERT INTO {table} ({cols_csv}, _ingested_at) SELECT {cols_csv_s}, now() "
+            f"FROM stg_raw s WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.item_id = s.item_id)"
+        )
+    count = con.execute("SELECT COUNT(*) FROM stg_raw").fetchone()[0]
+    con.unregister("stg_raw")
+    return int(count)
+
+
+def _batch(base: pl.DataFrame, n: int) -> pl.DataFrame:
+    new = synthetic_listings(n, seed=1, with_targets=False)
+    return normalize_frame(
+        new.with_columns(
+            pl.when(pl.int_range(n) % 2 == 0)
+            .then(base["item_id"].gather(pl.int_range(n, eager=True) % base.height))
+            .otherwise(pl.concat_str(pl.lit("new"), pl.col("item_id")))
+            .alias("item_id")
+        )
+    )
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--small-upserts", type=int, default=20)
+    args = p.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    base = synthetic_listings(args.rows, with_targets=False)
+    load.WAREHOUSE = tmp / "base.duckdb"
+    load.ensure_warehouse()
+    con = duckdb.connect(str(load.WAREHOUSE))
+    con.register("base", normalize_frame(base).to_arrow())
+    con.execute("INSERT INTO raw_listings BY NAME SELECT * FROM base")
+    con.execute("INSERT INTO listings BY NAME SELECT *, now() AS _ingested_at FROM base")
+    rebuild_aggregates(con)
+    con.close()
+
+    merge_batch = load._upsert_batch
+    print(f"warehouse of {args.rows} listings; batches are half updates, half inserts")
+    for n in (10_000, 100_000, 1_000_000):
+        df = _batch(base, n)
+        line = f"{n:>9} rows"
+        for label, impl in (("four statements", _four_statement_batch), ("MERGE", merge_batch)):
+            load.WAREHOUSE = tmp / "run.duckdb"
+            shutil.copy(tmp / "base.duckdb", load.WAREHOUSE)
+            load._upsert_batch = impl
+            t0 = time.perf_counter()
+            load.upsert_raw(df)
+            secs = time.perf_counter() - t0
+            line += f"   {label} {secs:6.2f} s ({n / secs:>7,.0f} rows/s)"
+        print(line)
+    load._upsert_batch = merge_batch
+
+    small = [_batch(base, 1_000).slice(i * 50, 50) for i in range(args.small_upserts)]
+    line = f"{len(small)} upserts of 50 rows"
+    for label, shared in (("connection each", False), ("shared connection", True)):
+        load.WAREHOUSE = tmp / "run.duckdb"
+        shutil.copy(tmp / "base.duckdb", load.WAREHOUSE)
+        con = duckdb.connect(str(load.WAREHOUSE)) if shared else None
+        t0 = time.perf_counter()
+        for df in small:
+            load.upsert_raw(df, con=con)
+        secs = (time.perf_counter() - t0) / len(small)
+        if con is not None:
+            con.close()
+        line += f"   {label} {secs * 1e3:7.1f} ms/upsert"
+    print(line)
+
+
+if __name__ == "__main__":
+    main()
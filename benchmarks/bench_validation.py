@@ -0,0 +1,42 @@
+"""
+Row validation of a listings snapshot: pydantic ListingRecord on a 50-row sample (what
+`validate_parquet` used to do), pydantic on every row, and the column-wise rules on every row.
+
+    PYTHONPATH=src poetry run python benchmarks/bench_validation.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import polars as pl
+from _synthetic import synthetic_listings
+
+from ebay_price.validation.validators import reject_rows, sample_pydantic_validation
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=1_000_000)
+    args = p.parse_args()
+
+    df = synthetic_listings(args.rows).with_columns(pl.col("sold").cast(pl.Int64))
+    t0 = time.perf_counter()
+    sample_pydantic_validation(df)
+    t_sample = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    sample_pydantic_validation(df, n=df.height)
+    t_pydantic = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    rejects = reject_rows(df)
+    t_rules = time.perf_counter() - t0
+
+    print(f"{args.rows} listings, {rejects.height} rejected")
+    print(f"pydantic, 50-row sample   {t_sample * 1e3:10.1f} ms")
+    print(f"pydantic, every row       {t_pydantic * 1e3:10.1f} ms")
+    print(f"rules, every row          {t_rules * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+# "auto" serves the ONNX export when one exists and onnxruntime is importable
+BACKENDS = ("auto", "joblib", "onnx")
+
+
+class OnnxModel:
+    """
+    An onnxruntime CPU session behind the `predict` / `predict_proba` interface the API
+    already calls on joblib models, so the scoring code does not care which one it has.
+    """
+
+    def __init__(self, model: bytes | str | Path):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        # requests are already spread over the threadpool; one intra-op thread each
+        # avoids oversubscribing the CPU and is fastest for small batches
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        src = model if isinstance(model, bytes) else str(model)
+        self.session = ort.InferenceSession(src, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def _run(self, X: np.ndarray, output: str) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return np.asarray(self.session.run([output], {self.input_name: X})[0])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self._run(X, self.output_names[0]).reshape(len(X))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        name = "probabilities" if "probabilities" in self.output_names else self.output_names[-1]
+        return self._run(X, name)
+
+
+def load_model(path: Path, backend: str = "auto") -> tuple[Any, str, Path]:
+    """
+    Load the model stored at `path` (a .joblib file) with the requested backend.
+    Returns (model, backend actually used, file it was loaded from).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'; expected one of {BACKENDS}.")
+    onnx_file = path.with_suffix(".onnx")
+    if backend != "joblib" and onnx_file.exists():
+        try:
+            return OnnxModel(onnx_file), "onnx", onnx_file
+        except ImportError:
+            if backend == "onnx":
+                raise
+            print(f"[backends] onnxruntime not installed; serving {path.name} with joblib")
+    elif backend == "onnx":
+        print(f"[backends] {onnx_file.name} not found; serving {path.name} with joblib")
+    return joblib.load(path), "joblib", path
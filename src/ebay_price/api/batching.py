@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+@dataclass
+class BatchStats:
+    """Realized batch sizes; `buckets[b]` counts batches of size <= b (cumulative)."""
+
+    batches: int = 0
+    items: int = 0
+    max_size: int = 0
+    buckets: dict[int, int] = field(default_factory=lambda: dict.fromkeys(SIZE_BUCKETS, 0))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def observe(self, size: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.max_size = max(self.max_size, size)
+            for b in self.buckets:
+                if size <= b:
+                    self.buckets[b] += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_size": self.items / self.batches if self.batches else 0.0,
+                "max_size": self.max_size,
+                "size_le": {str(b): n for b, n in self.buckets.items()},
+            }
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesces concurrent single-item calls into one call of `fn` over a list.
+
+    The first item to arrive opens a window of `window_ms`; everything submitted
+    before it closes (up to `max_batch` items) is scored together in a worker thread
+    and each caller's future is resolved with its own result. If the batch call
+    raises, items are retried one by one so only the offending callers see the error.
+    The drain task exits when the queue is empty, so nothing lingers between bursts.
+    """
+
+    def __init__(
+        self, fn: Callable[[list[T]], list[R]], window_ms: float = 2.0, max_batch: int = 64
+    ):
+        self.fn = fn
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.stats = BatchStats()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[tuple[T, asyncio.Future[R]]] | None = None
+        self._worker: asyncio.Task[None] | None = None
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._loop, self._queue, self._worker = loop, asyncio.Queue(), None
+        fut: asyncio.Future[R] = loop.create_future()
+        self._queue.put_nowait((item, fut))
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain(self._queue))
+        return await fut
+
+    async def _collect(
+        self, queue: asyncio.Queue[tuple[T, asyncio.Future[R]]]
+    ) -> list[tuple[T, asyncio.Future[R]]]:
+        loop = asyncio.get_running_loop()
+        batch = [queue.get_nowait()]
+        deadline = loop.time() + self.window_s
+        while len(batch) < self.max_batch:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _drain(self, queue: asyncio.Queue[tuple[T, asyncio.Future[R]]]) -> None:
+        while not queue.empty():
+            batch = await self._collect(queue)
+            self.stats.observe(len(batch))
+            items = [item for item, _ in batch]
+            try:
+                results: list[R | BaseException] = list(await asyncio.to_thread(self.fn, items))
+            except Exception as e:
+                results = [e] if len(batch) == 1 else [await self._one(item) for item in items]
+            for (_, fut), res in zip(batch, results, strict=True):
+                if fut.done():  # caller went away
+                    continue
+                if isinstance(res, BaseException):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+    async def _one(self, item: T) -> R | BaseException:
+        try:
+            return (await asyncio.to_thread(self.fn, [item]))[0]
+        except Exception as e:
+            return e
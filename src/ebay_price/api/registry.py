@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from ebay_price.api.backends import load_model
+from ebay_price.features.fastpath import InferencePlan, JointPlan
+from ebay_price.features.state import FeatureState
+from ebay_price.features.store import pipeline_version
+from ebay_price.features.text import TitleHasher
+
+ART_DIR = Path("data/artifacts/models")
+
+# task -> (model files in order of preference, feature column file)
+TASKS: dict[str, tuple[tuple[str, ...], str]] = {
+    "reg": (("reg_lightgbm.joblib", "reg_linear.joblib"), "reg_feature_columns.json"),
+    "clf": (("clf_lightgbm.joblib", "clf_logit.joblib"), "clf_feature_columns.json"),
+}
+# written by train_baselines: the feature state the model's training set was built with
+FEATURE_STATE_FILE = "{task}_feature_state.json"
+# written by train_baselines when the model also takes a hashed title block
+TITLE_HASHING_FILE = "{task}_title_hashing.json"
+
+
+class ModelNotLoadedError(RuntimeError):
+    """Raised when a task has no resident model."""
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """
+    A deserialized model plus the column order and feature state it was trained on.
+    With `title_hasher`, the model expects the hashed title block after `columns`;
+    `feature_version` names the feature-store rows built with that state's configuration;
+    their label codes and target encodings are those of the store's latest refresh.
+    """
+
+    task: str
+    name: str
+    model: Any
+    columns: list[str]
+    version: str
+    state: FeatureState | None = None
+    plan: InferencePlan | None = None
+    backend: str = "joblib"
+    title_hasher: TitleHasher | None = None
+    feature_version: str | None = None
+
+
+def _file_digest(paths: list[Path]) -> str:
+    h = hashlib.sha256()
+    for p in paths:
+        h.update(p.name.encode("utf-8"))
+        h.update(p.read_bytes())
+    return h.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Keeps the best-available model for each task resident in memory.
+
+    Each model is loaded once by `load()` with the files trained alongside it: its
+    column list, feature state and title hasher. A background watcher
+    (or an explicit `refresh()`) compares the mtime/size of the artifacts on disk and,
+    when they change, loads the new set and swaps it in with a single reference
+    assignment so in-flight requests keep the snapshot they started with.
+    """
+
+    def __init__(
+        self, art_dir: str | Path = ART_DIR, fast_path: bool = True, backend: str = "auto"
+    ):
+        self.art_dir = Path(art_dir)
+        self.fast_path = fast_path
+        self.backend = backend
+        self._models: dict[str, LoadedModel] = {}
+        self._joint: dict[tuple[str, ...], JointPlan] = {}
+        self._fingerprint: tuple[tuple[str, int, int], ...] = ()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+        self._swap_listeners: list[Callable[[], None]] = []
+
+    # ---------- loading ----------
+    def _fingerprint_now(self) -> tuple[tuple[str, int, int], ...]:
+        out: list[tuple[str, int, int]] = []
+        fnames = [
+            f
+            for candidates, cols in TASKS.values()
+            for f in (*candidates, *(Path(c).with_suffix(".onnx").name for c in candidates), cols)
+        ]
+        fnames += [
+            f.format(task=t) for t in TASKS for f in (FEATURE_STATE_FILE, TITLE_HASHING_FILE)
+        ]
+        for fname in fnames:
+            f = self.art_dir / fname
+            if f.exists():
+                st = f.stat()
+                out.append((fname, st.st_mtime_ns, st.st_size))
+        return tuple(sorted(out))
+
+    def _load_task(self, task: str, states: list[FeatureState]) -> LoadedModel | None:
+        candidates, cols_file = TASKS[task]
+        for fname in candidates:
+            f = self.art_dir / fname
+            if not f.exists():
+                continue
+            cols_path = self.art_dir / cols_file
+            state_path = self.art_dir / FEATURE_STATE_FILE.format(task=task)
+            hashing_path = self.art_dir / TITLE_HASHING_FILE.format(task=task)
+            cols = json.loads(cols_path.read_text()) if cols_path.exists() else []
+            hasher = TitleHasher.load(hashing_path) if hashing_path.exists() else None
+            state = self._load_state(task, states)
+            model, backend, model_path = load_model(f, self.backend)
+            digest_paths = [
+                p for p in (model_path, cols_path, state_path, hashing_path) if p.exists()
+            ]
+            # The compiled plan needs training-time state and column order to reproduce
+            # build_features; without them requests go through the frame pipeline
+            plan = InferencePlan(cols, state) if self.fast_path and state and cols else None
+            return LoadedModel(
+                task=task,
+                name=fname,
+                model=model,
+                columns=cols,
+                version=_file_digest(digest_paths),
+                state=state,
+                plan=plan,
+                backend=backend,
+                title_hasher=hasher,
+                feature_version=pipeline_version(state) if state else None,
+            )
+        return None
+
+    def _load_state(self, task: str, seen: list[FeatureState]) -> FeatureState | None:
+        """
+        The feature state saved with `task`'s model. A state equal to one in `seen` is
+        returned as that object, so models trained on one build share a joint plan.
+        """
+        path = self.art_dir / FEATURE_STATE_FILE.format(task=task)
+        if not path.exists():
+            print(f"[registry] {path.name} not found; features will be fitted per request")
+            return None
+        state = FeatureState.load(path)
+        for other in seen:
+            if other.to_dict() == state.to_dict():
+                return other
+        seen.append(state)
+        return state
+
+    def _load_all(self) -> dict[str, LoadedModel]:
+        loaded: dict[str, LoadedModel] = {}
+        states: list[FeatureState] = []
+        for task in TASKS:
+            lm = self._load_task(task, states)
+            if lm is not None:
+                loaded[task] = lm
+        return loaded
+
+    def load(self) -> None:
+        """Load every available model; raise if the artifact directory has none."""
+        with self._lock:
+            fingerprint = self._fingerprint_now()
+            loaded = self._load_all()
+            if not loaded:
+                raise ModelNotLoadedError(
+                    f"No models found in {self.art_dir.resolve()}; "
+                    "run train_baselines before starting the API."
+                )
+            for task in TASKS:
+                if task not in loaded:
+                    print(f"[registry] no model for task '{task}'; its endpoints will return 503")
+            self._models = loaded
+            self._fingerprint = fingerprint
+
+    def refresh(self) -> bool:
+        """Reload and swap if the artifacts changed on disk. Returns True on swap."""
+        fingerprint = self._fingerprint_now()
+        if fingerprint == self._fingerprint:
+            return False
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return False
+            try:
+                loaded = self._load_all()
+            except Exception as e:  # e.g. a file still being written; retry next tick
+                print(f"[registry] reload failed, keeping current models: {e}")
+                return False
+            if not loaded:
+                print("[registry] artifacts disappeared, keeping current models")
+                return False
+            self._models = loaded
+            self._fingerprint = fingerprint
+        print(f"[registry] swapped models: {self.versions()}")
+        for fn in self._swap_listeners:
+            fn()
+        return True
+
+    def add_swap_listener(self, fn: Callable[[], None]) -> None:
+        """Call `fn` after every successful swap (e.g. to drop cached predictions)."""
+        self._swap_listeners.append(fn)
+
+    # ---------- access ----------
+    def get(self, task: str) -> LoadedModel:
+        lm = self._models.get(task)
+        if lm is None:
+            raise ModelNotLoadedError(f"No model loaded for task '{task}'.")
+        return lm
+
+    def get_many(self, *tasks: str) -> list[LoadedModel]:
+        """Models for several tasks taken from the same snapshot (never straddling a swap)."""
+        models = self._models
+        missing = [t for t in tasks if t not in models]
+        if missing:
+            raise ModelNotLoadedError(f"No model loaded for task(s) {missing}.")
+        return [models[t] for t in tasks]
+
+    def joint_plan(self, models: list[LoadedModel]) -> JointPlan | None:
+        """Shared compiled plan for `models`, cached per combination of versions."""
+        state = models[0].state
+        if state is None or any(m.plan is None or m.state is not state for m in models):
+            return None
+        key = tuple(m.version for m in models)
+        plan = self._joint.get(key)
+        if plan is None:
+            plan = JointPlan([m.columns for m in models], state)
+            # only the live versions are worth keeping
+            self._joint = {key: plan}
+        return plan
+
+    def versions(self) -> dict[str, dict[str, str]]:
+        models = self._models
+        return {
+            t: {"model": m.name, "version": m.version, "backend": m.backend}
+            for t, m in models.items()
+        }
+
+    # ---------- watcher ----------
+    def start_watcher(self, interval_s: float = 5.0) -> None:
+        if self._watcher is not None or interval_s <= 0:
+            return
+        self._stop.clear()
+
+        def _run() -> None:
+            while not self._stop.wait(interval_s):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=_run, name="model-registry-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5.0)
+            self._watcher = None
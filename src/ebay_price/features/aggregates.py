@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import numpy as np
+import polars as pl
+
+from ebay_price.features.dtypes import to_float32
+from ebay_price.features.store import DEFAULT_DB, OnlineReader, publish_tables
+
+# Most recent listings (by end_time) per key that the statistics cover
+AGG_WINDOW = 100
+# Read-only copy of the aggregate tables the API looks keys up in, next to the warehouse
+AGG_ONLINE_FILE = "aggregates_online.duckdb"
+# Keys of the listings touched by an upsert, staged on its connection
+TOUCHED_TABLE = "_agg_touched"
+# Every listing's as-of statistics, staged on a chunked build's connection
+ASOF_TABLE = "_agg_asof"
+
+
+@dataclass(frozen=True)
+class AggregateKey:
+    """One aggregate table: price history per value of `columns`."""
+
+    name: str
+    columns: tuple[str, ...]
+
+    @property
+    def table(self) -> str:
+        return f"agg_{self.name}"
+
+    @property
+    def features(self) -> list[str]:
+        return [f"{self.name}_hist_{s}" for s in ("listings", "sell_through", "median_price")]
+
+
+AGG_KEYS = (
+    AggregateKey("seller", ("seller_username",)),
+    AggregateKey("product", ("brand", "model", "condition")),
+)
+AGG_FEATURES = [f for key in AGG_KEYS for f in key.features]
+_KEY_COLS = list(dict.fromkeys(c for key in AGG_KEYS for c in key.columns))
+
+
+def _ident(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _columns(con: duckdb.DuckDBPyConnection, table: str) -> list[str]:
+    return [r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()]
+
+
+def _has_table(con: duckdb.DuckDBPyConnection, table: str) -> bool:
+    return bool(
+        con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0]
+    )
+
+
+def _str(v: Any) -> str | None:
+    return None if v is None else str(v)
+
+
+def _keys_in(key: AggregateKey, columns: Sequence[str]) -> bool:
+    return all(c in columns for c in key.columns)
+
+
+def _stats_query(key: AggregateKey, columns: Sequence[str], touched: str | None = None) -> str:
+    """
+    Per value of `key`: how many of its last AGG_WINDOW listings that have ended there
+    are, the share of them that sold and the median final price of the sold ones, i.e.
+    the history `asof_query` gives a listing starting now. Listings without a
+    `sold` / `final_price` column leave those statistics NULL. With `touched`, only the
+    keys present in that table are computed.
+    """
+    keys = ", ".join(_ident(c) for c in key.columns)
+    sold = "CAST(sold AS DOUBLE)" if "sold" in columns else "NULL::DOUBLE"
+    price = "CAST(final_price AS DOUBLE)" if "final_price" in columns else "NULL::DOUBLE"
+    order = ", ".join(
+        [*(["end_time DESC NULLS LAST"] if "end_time" in columns else []), "item_id DESC"]
+    )
+    where = [f"{_ident(c)} IS NOT NULL" for c in key.columns]
+    if "end_time" in columns:
+        # still open (or ending later): no outcome yet, as in training
+        where.append("TRY_CAST(end_time AS TIMESTAMPTZ) <= now()")
+    if touched is not None:
+        match = " AND ".join(f"t.{_ident(c)} = l.{_ident(c)}" for c in key.columns)
+        where.append(f"EXISTS (SELECT 1 FROM {touched} t WHERE {match})")
+    listings_, sell_through, median_price = key.features
+    return (
+        f"SELECT {keys}, count(*) AS {listings_}, avg(_sold) AS {sell_through}, "
+        f"median(_price) FILTER (WHERE coalesce(_sold, 1) > 0) AS {median_price}\n"
+        "FROM (SELECT "
+        + ", ".join(f"CAST(l.{_ident(c)} AS VARCHAR) AS {_ident(c)}" for c in key.columns)
+        + f", {sold} AS _sold, {price} AS _price, "
+        f"row_number() OVER (PARTITION BY {keys} ORDER BY {order}) AS _rank\n"
+        f"FROM listings l WHERE {' AND '.join(where)})\n"
+        f"WHERE _rank <= {AGG_WINDOW} GROUP BY {keys}"
+    )
+
+
+def asof_query(
+    columns: Sequence[str],
+    source: str = "listings",
+    id_col: str = "item_id",
+    keys: Sequence[AggregateKey] = AGG_KEYS,
+    history: str = "listings",
+) -> str | None:
+    """
+    Per listing of `source` (by `id_col`), the statistics of `_stats_query` as they
+    stood when it started: over the last AGG_WINDOW listings of `history` with the same
+    key that ended strictly before its start_time, so a training row never sees its own
+    outcome or a later one. `columns` are those of `history`; a listing without a start
+    time, or whose key has no earlier listing, gets nulls. None when no key applies.
+    """
+    keys = [k for k in keys if _keys_in(k, columns)]
+    if not keys:
+        return None
+    sold = "CAST(sold AS DOUBLE)" if "sold" in columns else "NULL::DOUBLE"
+    price = "CAST(final_price AS DOUBLE)" if "final_price" in columns else "NULL::DOUBLE"
+    timed = "start_time" in columns and "end_time" in columns
+    started = "TRY_CAST(start_time AS TIMESTAMPTZ)" if timed else "NULL::TIMESTAMPTZ"
+    key_cols = list(dict.fromkeys(c for k in keys for c in k.columns))
+    ctes = [
+        f"_asof_source AS (SELECT {_ident(id_col)}, "
+        + ", ".join(f"CAST({_ident(c)} AS VARCHAR) AS {_ident(c)}" for c in key_cols)
+        + f", {started} AS _started FROM {source})"
+    ]
+    select, joins = [f"s.{_ident(id_col)}"], ["FROM _asof_source s"]
+    for i, key in enumerate(keys):
+        listings_, sell_through, median_price = key.features
+        if not timed:
+            select += [
+                f"NULL::BIGINT AS {listings_}",
+                f"NULL::DOUBLE AS {sell_through}",
+                f"NULL::DOUBLE AS {median_price}",
+            ]
+            continue
+        part = ", ".join(_ident(c) for c in key.columns)
+        where = [f"{_ident(c)} IS NOT NULL" for c in key.columns]
+        where.append("_ended IS NOT NULL")
+        if source != history:
+            where.append(f"({part}) IN (SELECT {part} FROM _asof_source)")
+        # a listing's window is the rows up to the last one ending at the same instant
+        ctes.append(
+            f"_ends_{i} AS (SELECT {part}, _ended, count(*) OVER w AS {listings_}, "
+            f"avg(_sold) OVER w AS {sell_through}, "
+            f"median(_price) FILTER (WHERE coalesce(_sold, 1) > 0) OVER w AS {median_price}\n"
+            "FROM (SELECT "
+            + ", ".join(f"CAST({_ident(c)} AS VARCHAR) AS {_ident(c)}" for c in key.columns)
+            + f", TRY_CAST(end_time AS TIMESTAMPTZ) AS _ended, item_id, {sold} AS _sold, "
+            f"{price} AS _price FROM {history})\nWHERE {' AND '.join(where)}\n"
+            f"WINDOW w AS (PARTITION BY {part} ORDER BY _ended, item_id "
+            f"ROWS BETWEEN {AGG_WINDOW - 1} PRECEDING AND CURRENT ROW)\n"
+            f"QUALIFY row_number() OVER (PARTITION BY {part}, _ended ORDER BY item_id DESC) = 1)"
+        )
+        select += [f"e{i}.{_ident(f)}" for f in key.features]
+        match = " AND ".join(f"s.{_ident(c)} = e{i}.{_ident(c)}" for c in key.columns)
+        joins.append(f"ASOF LEFT JOIN _ends_{i} e{i} ON {match} AND s._started > e{i}._ended")
+    return f"WITH {', '.join(ctes)}\nSELECT {', '.join(select)}\n" + "\n".join(joins)
+
+
+def stage_asof(con: duckdb.DuckDBPyConnection) -> None:
+    """Compute every listing's `asof_query` statistics into ASOF_TABLE, on `con` only."""
+    query = asof_query(_columns(con, "listings"))
+    if query is not None:
+        con.execute(f"CREATE OR REPLACE TEMP TABLE {ASOF_TABLE} AS {query}")
+
+
+def rebuild_aggregates(con: duckdb.DuckDBPyConnection) -> None:
+    """(Re)compute every aggregate table from the whole `listings` table."""
+    columns = _columns(con, "listings")
+    for key in AGG_KEYS:
+        if _keys_in(key, columns):
+            con.execute(f"CREATE OR REPLACE TABLE {key.table} AS {_stats_query(key, columns)}")
+
+
+def stage_touched_keys(con: duckdb.DuckDBPyConnection, incoming: str) -> None:
+    """
+    Record, before `incoming` is upserted into `listings`, the aggregate keys it touches:
+    its own and those the rows it replaces had, which lose a listing if a key changed.
+    Successive calls (one per batch of a chunked ingest) add to the same staged keys.
+    """
+    columns = set(_columns(con, "listings")) & set(_columns(con, incoming))
+    cols = [c for c in _KEY_COLS if c in columns]
+    if not cols:
+        return
+    select = ", ".join(f"CAST({_ident(c)} AS VARCHAR) AS {_ident(c)}" for c in cols)
+    keys = (
+        f"SELECT {select} FROM {incoming} UNION SELECT {select} FROM listings "
+        f"WHERE item_id IN (SELECT CAST(item_id AS VARCHAR) FROM {incoming})"
+    )
+    if _has_table(con, TOUCHED_TABLE):
+        con.execute(
+            f"INSERT INTO {TOUCHED_TABLE} BY NAME ({keys} EXCEPT SELECT * FROM {TOUCHED_TABLE})"
+        )
+    else:
+        con.execute(f"CREATE TEMP TABLE {TOUCHED_TABLE} AS {keys}")
+
+
+def update_aggregates(con: duckdb.DuckDBPyConnection, touched: str = TOUCHED_TABLE) -> None:
+    """
+    Recompute the aggregate rows of the keys in `touched` (see `stage_touched_keys`)
+    after an upsert, then drop it. Runs in the caller's transaction, so the listings and
+    their aggregates commit together. A table that does not exist yet is built whole.
+    """
+    if not _has_table(con, touched):
+        return
+    columns = _columns(con, "listings")
+    staged = _columns(con, touched)
+    for key in AGG_KEYS:
+        if not _keys_in(key, columns):
+            continue
+        if not _has_table(con, key.table):
+            con.execute(f"CREATE TABLE {key.table} AS {_stats_query(key, columns)}")
+            continue
+        if not _keys_in(key, staged):
+            continue
+        match = " AND ".join(f"t.{_ident(c)} = a.{_ident(c)}" for c in key.columns)
+        con.execute(
+            f"DELETE FROM {key.table} a WHERE EXISTS (SELECT 1 FROM {touched} t WHERE {match})"
+        )
+        con.execute(f"INSERT INTO {key.table} BY NAME {_stats_query(key, columns, touched)}")
+    con.execute(f"DROP TABLE {touched}")
+
+
+def aggregate_tables(con: duckdb.DuckDBPyConnection) -> list[AggregateKey]:
+    """The aggregate tables `con` holds."""
+    return [k for k in AGG_KEYS if _has_table(con, k.table)]
+
+
+def publish_aggregates(con: duckdb.DuckDBPyConnection, online_path: str | Path) -> None:
+    """Publish the aggregate tables of `con` to `online_path` for `AggregateLookup`."""
+    tables = {k.table: k.columns for k in aggregate_tables(con)}
+    if tables:
+        publish_tables(con, Path(online_path), tables)
+
+
+def aggregates_online_path(db_path: str | Path) -> Path:
+    return Path(db_path).with_name(AGG_ONLINE_FILE)
+
+
+@dataclass
+class AggregateIndex:
+    """
+    Aggregate rows per key name ("seller", "product"), as joined onto listings at
+    serving time. A training index instead holds `asof`: each listing's statistics by
+    item_id, over the listings that ended before it started.
+    """
+
+    frames: dict[str, pl.DataFrame] = field(default_factory=dict)
+    asof: pl.DataFrame | None = None
+
+    @classmethod
+    def load(cls, con: duckdb.DuckDBPyConnection) -> AggregateIndex:
+        return cls(
+            {k.name: con.execute(f"SELECT * FROM {k.table}").pl() for k in aggregate_tables(con)}
+        )
+
+    @classmethod
+    def as_of(
+        cls, con: duckdb.DuckDBPyConnection, items: pl.Series | None = None
+    ) -> AggregateIndex:
+        """
+        The `asof_query` statistics of every listing in `listings`, or of the item_ids
+        in `items` only: read from ASOF_TABLE when `stage_asof` left it on `con`,
+        otherwise computed over the keys those listings carry.
+        """
+        if items is None:
+            query = asof_query(_columns(con, "listings"))
+        else:
+            con.register("_agg_items", pl.DataFrame({"item_id": items.cast(pl.Utf8)}))
+            if _has_table(con, ASOF_TABLE):
+                query = f"SELECT a.* FROM {ASOF_TABLE} a SEMI JOIN _agg_items USING (item_id)"
+            else:
+                query = asof_query(
+                    _columns(con, "listings"),
+                    "(SELECT * FROM listings SEMI JOIN _agg_items USING (item_id))",
+                )
+        if query is None:
+            return cls()
+        return cls(asof=con.execute(query).pl())
+
+    def join(self, df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+        """
+        Left-join each table onto `df` by its key columns, or the `asof` rows by
+        item_id, keeping row order. Listings with a key that has no history get nulls;
+        a frame without the key columns gets no columns from that table.
+        """
+        columns = df.collect_schema().names()
+        if self.asof is not None:
+            features = [
+                f
+                for key in AGG_KEYS
+                if _keys_in(key, columns)
+                for f in key.features
+                if f in self.asof.columns
+            ]
+            if "item_id" not in columns or not features:
+                return df
+            right = self.asof.select("item_id", *features)
+            return df.join(
+                right.lazy() if isinstance(df, pl.LazyFrame) else right,
+                on="item_id",
+                how="left",
+                maintain_order="left",
+            )
+        for key in AGG_KEYS:
+            frame = self.frames.get(key.name)
+            if frame is None or not _keys_in(key, columns):
+                continue
+            right = frame.select(*key.columns, *key.features)
+            if isinstance(df, pl.LazyFrame):
+                right = right.lazy()
+            df = df.with_columns(pl.col(list(key.columns)).cast(pl.Utf8)).join(
+                right, on=list(key.columns), how="left", maintain_order="left"
+            )
+        return df
+
+    def matrix(self, rows: Sequence[Mapping[str, Any]], columns: Sequence[str]) -> np.ndarray:
+        """`columns` (aggregate features) for each of `rows`, as float32 with nulls at 0."""
+        keys = pl.DataFrame(
+            {c: [_str(r.get(c)) for r in rows] for c in _KEY_COLS},
+            schema={c: pl.Utf8 for c in _KEY_COLS},
+        )
+        joined = self.join(keys)
+        return to_float32(
+            joined.select(
+                [pl.col(c) if c in joined.columns else pl.lit(None).alias(c) for c in columns]
+            )
+        )
+
+
+def refresh_aggregate_index(
+    db_path: str = DEFAULT_DB,
+    rebuild: bool = True,
+    items: pl.Series | None = None,
+    load: bool = True,
+) -> AggregateIndex:
+    """
+    The as-of aggregates of the warehouse at `db_path` for a feature build: every
+    listing's, or those of the item_ids in `items` (see `AggregateIndex.as_of`). With
+    `rebuild` (a full refresh), or when they do not exist yet, the whole-history tables
+    serving reads are first recomputed from `listings` and republished; otherwise they
+    stay as the upserts left them. Without `load`, only that refresh happens.
+    """
+    con = duckdb.connect(db_path)
+    try:
+        if not _has_table(con, "listings"):
+            return AggregateIndex()
+        if rebuild or len(aggregate_tables(con)) < len(AGG_KEYS):
+            rebuild_aggregates(con)
+            publish_aggregates(con, aggregates_online_path(db_path))
+        return AggregateIndex.as_of(con, items) if load else AggregateIndex()
+    finally:
+        con.close()
+
+
+class AggregateLookup:
+    """Point lookups into the published aggregate tables, for serving."""
+
+    def __init__(self, online_path: str | Path):
+        self._reader = OnlineReader(online_path)
+
+    def lookup(self, rows: Sequence[Mapping[str, Any]]) -> AggregateIndex:
+        """The aggregate rows of the keys `rows` carry; empty before any publish."""
+        cur = self._reader.cursor()
+        if cur is None:
+            return AggregateIndex()
+        frames: dict[str, pl.DataFrame] = {}
+        try:
+            tables = {r[0] for r in cur.execute("SHOW TABLES").fetchall()}
+            for key in AGG_KEYS:
+                if key.table not in tables:
+                    continue
+                wanted = (
+                    pl.DataFrame(
+                        {c: [_str(r.get(c)) for r in rows] for c in key.columns},
+                        schema={c: pl.Utf8 for c in key.columns},
+                    )
+                    .drop_nulls()
+                    .unique(maintain_order=True)
+                )
+                if wanted.is_empty():
+                    continue
+                if wanted.height == 1:
+                    # a lone equality predicate is answered from the index
+                    match = " AND ".join(f"{_ident(c)} = ?" for c in key.columns)
+                    query, params = f"SELECT * FROM {key.table} WHERE {match}", list(wanted.row(0))
+                else:
+                    # for a batch, one semi join beats a query per key
+                    cur.register("_agg_wanted", wanted)
+                    keys = ", ".join(_ident(c) for c in key.columns)
+                    query = f"SELECT a.* FROM {key.table} a SEMI JOIN _agg_wanted USING ({keys})"
+                    params = []
+                frames[key.name] = cur.execute(query, params).pl()
+        finally:
+            cur.close()
+        return AggregateIndex(frames)
+
+    def close(self) -> None:
+        self._reader.close()
@@ -1,17 +1,31 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from pathlib import Path
 
 import duckdb
 import polars as pl
 
-from ebay_price.features.categorical import label_encode, target_encode
-from ebay_price.features.datetime import datetime_features
-from ebay_price.features.numeric import numeric_features
-from ebay_price.features.text import text_features
+from ebay_price.features.aggregates import AggregateIndex
+from ebay_price.features.categorical import (
+    TE_COLS,
+    label_encode,
+    label_encode_exprs,
+    target_encode,
+    target_encode_exprs,
+)
+from ebay_price.features.datetime import datetime_exprs, datetime_features
+from ebay_price.features.dtypes import TRAIN_SCHEMA_FILE, compact_dtypes, save_schema
+from ebay_price.features.numeric import numeric_exprs, numeric_features
+from ebay_price.features.parts import append_part, scan_parts, write_parts
+from ebay_price.features.profiling import PROFILE_FILE, PipelineProfiler
+from ebay_price.features.state import FeatureState, fit_feature_state
+from ebay_price.features.text import text_exprs, text_features
 
 PROCESSED_DIR = Path("data/processed")
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+# "polars" loads the warehouse and runs build_features; "duckdb" runs features/sql.py in it
+ENGINES = ("polars", "duckdb")
 
 
 def load_listings(db_path: str = "data/artifacts/warehouse.duckdb") -> pl.DataFrame:
@@ -23,54 +37,173 @@ def load_listings(db_path: str = "data/artifacts/warehouse.duckdb") -> pl.DataFr
         con.close()
 
 
-def build_features(df: pl.DataFrame) -> pl.DataFrame:
+def build_features_lazy(lf: pl.LazyFrame, state: FeatureState) -> pl.LazyFrame:
+    """
+    The feature pipeline as one query plan over `lf`.
+
+    Every stage only reads the input columns (derived columns are written against the
+    expressions they come from), so all of them go into a single `with_columns` that
+    polars evaluates in parallel, without an intermediate frame per stage or column.
+    """
+    columns = lf.collect_schema().names()
+    return lf.with_columns(
+        *datetime_exprs(),
+        *label_encode_exprs(columns, state.vocabularies),
+        *target_encode_exprs(columns, state.target_encodings),
+        *numeric_exprs(columns, state.winsor_bounds),
+        *text_exprs(columns),
+    )
+
+
+# The pipeline stages in order; `build_features_eager` and the profiled build run these
+STAGES: list[tuple[str, Callable[[pl.DataFrame, FeatureState], pl.DataFrame]]] = [
+    ("datetime", lambda df, _: datetime_features(df)),
+    ("label_encode", lambda df, st: label_encode(df, st.vocabularies)),
+    ("target_encode", lambda df, st: target_encode(df, st.target_encodings)),
+    ("numeric", lambda df, st: numeric_features(df, st.winsor_bounds)),
+    ("text", lambda df, _: text_features(df)),
+]
+
+
+def build_features(
+    df: pl.DataFrame,
+    state: FeatureState | None = None,
+    profiler: PipelineProfiler | None = None,
+    aggregates: AggregateIndex | None = None,
+) -> pl.DataFrame:
+    """
+    Run the feature pipeline. With `state`, apply training-time statistics as lookups;
+    without it, fit them on `df` itself (the training path). With `profiler`, the
+    stages run one after another (as in `build_features_eager`) and each is recorded.
+    `aggregates` joins the seller / product price history on as the last step: for a
+    training index (`AggregateIndex.as_of`), only listings that ended before each one
+    started, so no row sees its own outcome.
+    """
+    if profiler is None:
+        if state is None:
+            state = fit_feature_state(df)
+        lf = build_features_lazy(df.lazy(), state)
+        if aggregates is not None:
+            lf = aggregates.join(lf)
+        return lf.collect()
+    if state is None:
+        state = profiler.run("fit_state", fit_feature_state, df)
     out = df
-    out = datetime_features(out)
-    out = label_encode(out)
-    out = target_encode(out)
-    out = numeric_features(out)
-    out = text_features(out)
+    for name, stage in STAGES:
+        out = profiler.run(name, lambda d, stage=stage: stage(d, state), out)
+    if aggregates is not None:
+        out = profiler.run("aggregates", aggregates.join, out)
     return out
 
 
-def save_outputs(feat: pl.DataFrame) -> None:
-    feat_path = PROCESSED_DIR / "features.parquet"
-    feat.write_parquet(feat_path)
+def build_features_eager(df: pl.DataFrame, state: FeatureState | None = None) -> pl.DataFrame:
+    """Stage-by-stage version of `build_features`; kept as the reference it is tested against."""
+    if state is None:
+        state = fit_feature_state(df)
+    out = df
+    for _, stage in STAGES:
+        out = stage(out, state)
+    return out
+
+
+def training_frame(feat: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame | None:
+    """
+    Targets, numeric feature columns and the raw title, downcast by `compact_dtypes`;
+    None when there is no target. item_id and the target-encoded categories come along
+    so `scan_parts` can dedupe and re-encode appended parts; `feature_target_split`
+    leaves them out. A LazyFrame (e.g. a scan of features.parquet) gives back the lazy
+    selection.
+    """
+    schema = feat.collect_schema()
+    targets = [c for c in ("final_price", "sold") if c in schema]
+    if not targets:
+        return None
+    numeric_like = {
+        pl.Int8,
+        pl.Int16,
+        pl.Int32,
+        pl.Int64,
+        pl.UInt8,
+        pl.UInt16,
+        pl.UInt32,
+        pl.UInt64,
+        pl.Float32,
+        pl.Float64,
+        pl.Boolean,
+    }
+    keep: list[str] = []
+    for c, t in schema.items():
+        if c in ("title", "start_time", "end_time"):
+            continue
+        if (c in targets) or (t in numeric_like) or c == "item_id" or c in TE_COLS:
+            keep.append(c)
+    # the raw title feeds the optional hashed title block in train_baselines
+    if "title" in schema:
+        keep.append("title")
+    return compact_dtypes(feat.select(keep))
+
+
+def save_train_schema() -> None:
+    """Record the dtypes train.parquet was written with, next to it."""
+    train = scan_parts(PROCESSED_DIR / "train.parquet")
+    if train is not None:
+        save_schema(train.collect_schema(), PROCESSED_DIR / TRAIN_SCHEMA_FILE)
+
+
+def save_outputs(feat: pl.DataFrame, append: bool = False) -> None:
+    """
+    Write features.parquet and, when there are targets, train.parquet. With `append`
+    (an incremental refresh), `feat` is added to each as a new part instead.
+    """
+    write = append_part if append else write_parts
+    write(feat, PROCESSED_DIR / "features.parquet")
 
     # Optional supervised set if targets exist
-    targets = [c for c in ("final_price", "sold") if c in feat.columns]
-    if targets:
-        numeric_like = {
-            pl.Int8,
-            pl.Int16,
-            pl.Int32,
-            pl.Int64,
-            pl.UInt8,
-            pl.UInt16,
-            pl.UInt32,
-            pl.UInt64,
-            pl.Float32,
-            pl.Float64,
-            pl.Boolean,
-        }
-        keep: list[str] = []
-        for c, t in zip(feat.columns, feat.dtypes, strict=False):
-            if c in ("title", "start_time", "end_time"):
-                continue
-            if (c in targets) or (t in numeric_like):
-                keep.append(c)
-        train = feat.select(keep)
-        train.write_parquet(PROCESSED_DIR / "train.parquet")
+    train = training_frame(feat)
+    if train is not None:
+        write(train, PROCESSED_DIR / "train.parquet")
+        save_train_schema()
 
 
 def main() -> None:
-    df = load_listings()
-    if df.is_empty():
-        print("No listings found.")
-        return
-    feat = build_features(df)
-    save_outputs(feat)
-    print("Features written to data/processed/")
+    import argparse
+
+    from ebay_price.features.incremental import full_refresh, incremental_refresh
+
+    p = argparse.ArgumentParser()
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process listings ingested since the last refresh (falls back to full)",
+    )
+    p.add_argument(
+        "--batch-rows",
+        type=int,
+        default=None,
+        help="stream the warehouse in batches of this many listings instead of loading it",
+    )
+    p.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="polars",
+        help="duckdb computes the features inside the warehouse and writes them out directly",
+    )
+    p.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"time each pipeline stage; prints a summary and writes {PROFILE_FILE}",
+    )
+    args = p.parse_args()
+    if args.engine == "duckdb" and (args.batch_rows or args.profile):
+        p.error("--batch-rows and --profile apply to the polars engine only")
+    profiler = PipelineProfiler() if args.profile else None
+    if args.incremental:
+        incremental_refresh(batch_rows=args.batch_rows, profiler=profiler, engine=args.engine)
+    else:
+        full_refresh(batch_rows=args.batch_rows, profiler=profiler, engine=args.engine)
+    if profiler is not None:
+        print(profiler.summary())
+        print(f"Wrote {profiler.save(PROCESSED_DIR / PROFILE_FILE)}")
 
 
 if __name__ == "__main__":
@@ -1,55 +1,197 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+
 import polars as pl
 
+LABEL_COLS = ("brand", "model", "condition", "listing_type", "category_path")
+TE_COLS = ("brand", "category_path")
+TE_TARGETS = ("final_price", "sold")
+TE_SMOOTHING = 10.0
+
+
+@dataclass
+class TargetEncoding:
+    """
+    Fitted smoothed-mean encoding of `target` by `column`.
+
+    `stats` holds the sufficient statistics behind `table`, per category
+    [rows, non-null targets, target sum], and `global_stats` [non-null targets, sum]
+    over all rows, so rows can be folded in or retracted without refitting.
+    """
+
+    column: str
+    target: str
+    global_mean: float
+    table: dict[str, float] = field(default_factory=dict)
+    stats: dict[str, list[float]] = field(default_factory=dict)
+    global_stats: list[float] = field(default_factory=lambda: [0, 0.0])
+
+    @property
+    def name(self) -> str:
+        return f"{self.column}__te_{self.target}"
 
-def _label_encode(series: pl.Series) -> pl.Series:
-    # Map unique categories to 0..K-1; nulls -> -1
-    cats = series.drop_nulls().unique()
-    mapping = {v: i for i, v in enumerate(cats.to_list())}
-    return series.map_elements(lambda v: mapping.get(v, -1)).alias(series.name + "_le")
+    @classmethod
+    def from_stats(
+        cls,
+        column: str,
+        target: str,
+        stats: dict[str, list[float]],
+        global_stats: list[float],
+        m: float = TE_SMOOTHING,
+    ) -> TargetEncoding:
+        """Encoding derived from statistics aggregated elsewhere (e.g. inside DuckDB)."""
+        gmean, table = _smoothed_table(stats, global_stats, m)
+        return cls(
+            column=column,
+            target=target,
+            global_mean=gmean,
+            table=table,
+            stats=stats,
+            global_stats=global_stats,
+        )
 
+    @property
+    def incremental(self) -> bool:
+        """False for encodings saved before running statistics were kept."""
+        return bool(self.stats) or not self.table
 
-def label_encode(df: pl.DataFrame) -> pl.DataFrame:
-    out = df
-    for col in ("brand", "model", "condition", "listing_type", "category_path"):
-        if col in out.columns:
-            out = out.with_columns(_label_encode(out[col]))
-    return out
+    def update(
+        self, added: pl.DataFrame, removed: pl.DataFrame | None = None, m: float = TE_SMOOTHING
+    ) -> None:
+        """Add the rows in `added`, retract those in `removed`, and re-derive the table."""
+        for frame, sign in ((added, 1), (removed, -1)):
+            if frame is None or frame.is_empty():
+                continue
+            per_cat, (n, total) = _group_stats(frame, self.column, self.target)
+            self.global_stats = [
+                self.global_stats[0] + sign * n,
+                self.global_stats[1] + sign * total,
+            ]
+            for cat, (rows, nn, s) in per_cat.items():
+                cur = self.stats.get(cat, [0, 0, 0.0])
+                nxt = [cur[0] + sign * rows, cur[1] + sign * nn, cur[2] + sign * s]
+                if nxt[0] > 0:
+                    self.stats[cat] = nxt
+                else:
+                    self.stats.pop(cat, None)
+        self.global_mean, self.table = _smoothed_table(self.stats, self.global_stats, m)
 
 
-def _target_encode_mean(
-    df: pl.DataFrame, cat_col: str, target_col: str, m: float = 5.0
+def fit_vocabularies(df: pl.DataFrame) -> dict[str, list[str]]:
+    """Sorted distinct values per label-encoded column; list position is the code."""
+    vocab: dict[str, list[str]] = {}
+    for col in LABEL_COLS:
+        if col in df.columns:
+            cats = df.get_column(col).cast(pl.Utf8, strict=False).drop_nulls().unique().sort()
+            vocab[col] = cats.to_list()
+    return vocab
+
+
+def _label_encode(col: str, vocab: list[str]) -> pl.Expr:
+    # Map known categories to their vocabulary index; unseen -> -1, nulls stay null.
+    # An Enum over the (sorted, distinct) vocabulary has exactly those physical codes;
+    # the non-strict cast turns unseen values into nulls, which become -1.
+    cat = pl.col(col).cast(pl.Utf8, strict=False)
+    codes = cat.cast(pl.Enum(vocab), strict=False).to_physical().cast(pl.Int64).fill_null(-1)
+    return pl.when(cat.is_not_null()).then(codes).otherwise(None).alias(col + "_le")
+
+
+def label_encode_exprs(columns: list[str], vocabularies: dict[str, list[str]]) -> list[pl.Expr]:
+    return [
+        _label_encode(col, vocabularies[col])
+        for col in LABEL_COLS
+        if col in columns and col in vocabularies
+    ]
+
+
+def label_encode(
+    df: pl.DataFrame, vocabularies: dict[str, list[str]] | None = None
 ) -> pl.DataFrame:
+    if vocabularies is None:
+        vocabularies = fit_vocabularies(df)
+    return df.with_columns(label_encode_exprs(df.columns, vocabularies))
+
+
+def _group_stats(
+    df: pl.DataFrame, cat_col: str, target_col: str
+) -> tuple[dict[str, list[float]], list[float]]:
+    """Per-category [rows, non-null targets, target sum] and overall [non-null, sum]."""
+    target = pl.col(target_col).cast(pl.Float64)
+    n, total = df.select(target.count().alias("n"), target.sum().alias("s")).row(0)
+    agg = (
+        df.select(pl.col(cat_col).cast(pl.Utf8, strict=False), target)
+        .drop_nulls(cat_col)
+        .group_by(cat_col)
+        .agg(pl.len().alias("cnt"), target.count().alias("nn"), target.sum().alias("sum"))
+    )
+    per_cat = {
+        c: [cnt, nn, s]
+        for c, cnt, nn, s in zip(
+            agg[cat_col].to_list(),
+            agg["cnt"].to_list(),
+            agg["nn"].to_list(),
+            agg["sum"].to_list(),
+            strict=True,
+        )
+    }
+    return per_cat, [n, total]
+
+
+def _smoothed_table(
+    stats: dict[str, list[float]], global_stats: list[float], m: float
+) -> tuple[float | None, dict[str, float | None]]:
     """
     Mean target encoding with simple m-smoothing:
       enc = (count * mean + m * global_mean) / (count + m)
     """
-    if cat_col not in df.columns or target_col not in df.columns:
-        return df
+    n, total = global_stats
+    gmean = total / n if n else None
+    table: dict[str, float | None] = {}
+    for cat, (rows, nn, s) in stats.items():
+        table[cat] = None if gmean is None or not nn else (rows * (s / nn) + m * gmean) / (rows + m)
+    return gmean, table
 
-    gmean = df.select(pl.mean(target_col).alias("gmean")).item(0, 0)
 
-    agg = (
-        df.group_by(cat_col)
-        .agg([pl.count().alias("cnt"), pl.mean(target_col).alias("mean_t")])
-        .with_columns(
-            ((pl.col("cnt") * pl.col("mean_t") + m * gmean) / (pl.col("cnt") + m)).alias(
-                f"{cat_col}__te_{target_col}"
-            )
-        )[[cat_col, f"{cat_col}__te_{target_col}"]]
+def _fit_target_encoding(
+    df: pl.DataFrame, cat_col: str, target_col: str, m: float = TE_SMOOTHING
+) -> TargetEncoding:
+    stats, global_stats = _group_stats(df, cat_col, target_col)
+    return TargetEncoding.from_stats(cat_col, target_col, stats, global_stats, m)
+
+
+def fit_target_encodings(df: pl.DataFrame) -> list[TargetEncoding]:
+    encodings: list[TargetEncoding] = []
+    for cat in TE_COLS:
+        for target in TE_TARGETS:
+            # sold as 0/1 mean by category/brand approximates sell-through
+            if cat in df.columns and target in df.columns:
+                encodings.append(_fit_target_encoding(df, cat, target))
+    return encodings
+
+
+def _apply_target_encoding(enc: TargetEncoding) -> pl.Expr:
+    # Unseen categories get the prior (what smoothing gives a zero-count group)
+    cat = pl.col(enc.column).cast(pl.Utf8, strict=False)
+    looked_up = cat.replace_strict(
+        list(enc.table.keys()),
+        list(enc.table.values()),
+        default=None,
+        return_dtype=pl.Float64,
+    )
+    return (
+        pl.when(cat.is_not_null())
+        .then(looked_up.fill_null(enc.global_mean))
+        .otherwise(None)
+        .alias(enc.name)
     )
 
-    out = df.join(agg, on=cat_col, how="left")
-    return out
 
+def target_encode_exprs(columns: list[str], encodings: list[TargetEncoding]) -> list[pl.Expr]:
+    return [_apply_target_encoding(enc) for enc in encodings if enc.column in columns]
 
-def target_encode(df: pl.DataFrame) -> pl.DataFrame:
-    out = df
-    for cat in ("brand", "category_path"):
-        if "final_price" in out.columns:
-            out = _target_encode_mean(out, cat, "final_price", m=10.0)
-        if "sold" in out.columns:
-            # sold as 0/1 mean by category/brand approximates sell-through
-            out = _target_encode_mean(out, cat, "sold", m=10.0)
-    return out
+
+def target_encode(df: pl.DataFrame, encodings: list[TargetEncoding] | None = None) -> pl.DataFrame:
+    if encodings is None:
+        encodings = fit_target_encodings(df)
+    return df.with_columns(target_encode_exprs(df.columns, encodings))
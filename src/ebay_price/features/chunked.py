@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import polars as pl
+
+from ebay_price.features import build_features as bf
+from ebay_price.features.aggregates import AggregateIndex, stage_asof
+from ebay_price.features.categorical import LABEL_COLS, TE_COLS, TE_TARGETS, TargetEncoding
+from ebay_price.features.numeric import WINSOR_COLS
+from ebay_price.features.parts import PART_FILE, publish_parts, staging_dir
+from ebay_price.features.profiling import PipelineProfiler
+from ebay_price.features.state import FeatureState
+
+# Listings per record batch; peak memory scales with this, not with the warehouse
+DEFAULT_BATCH_ROWS = 250_000
+# DuckDB's buffer pool otherwise grows to 80% of RAM; past this it spills to disk
+DUCKDB_MEMORY_LIMIT = "512MB"
+
+
+def iter_batches(
+    con: duckdb.DuckDBPyConnection, query: str, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[pl.DataFrame]:
+    """Stream the result of `query` as polars frames of at most `batch_rows` rows."""
+    res = con.execute(query)
+    # duckdb 1.5 renamed fetch_record_batch to to_arrow_reader
+    if hasattr(res, "to_arrow_reader"):
+        reader = res.to_arrow_reader(batch_rows)
+    else:
+        reader = res.fetch_record_batch(batch_rows)
+    for rb in reader:
+        yield pl.from_arrow(rb)
+
+
+def fit_winsor_bounds_sql(
+    con: duckdb.DuckDBPyConnection, columns: list[str], source: str = "listings"
+) -> dict[str, tuple[float, float]]:
+    """
+    `fit_winsor_bounds` computed inside DuckDB: the same 1% / 99% nearest-rank values of
+    the non-negative-clipped columns of `source`, picked from a sort DuckDB can spill.
+    """
+    n = con.execute(f"SELECT count(*) FROM {source}").fetchone()[0]
+    if not n:
+        return {}
+    # polars' "nearest" quantile is the value at rank round((n - 1) * q), half up
+    lo, hi = (int((n - 1) * q + 0.5) for q in (0.01, 0.99))
+    bounds: dict[str, tuple[float, float]] = {}
+    for col in WINSOR_COLS:
+        if col not in columns:
+            continue
+        ranked = con.execute(
+            f"SELECT x FROM (SELECT x, row_number() OVER (ORDER BY x) - 1 AS i FROM ("
+            f'SELECT greatest(coalesce("{col}", 0), 0)::DOUBLE AS x FROM {source})) '
+            "WHERE i IN (?, ?) ORDER BY i",
+            [lo, hi],
+        ).fetchall()
+        bounds[col] = (ranked[0][0], ranked[-1][0])
+    return bounds
+
+
+def fit_feature_state_chunked(
+    con: duckdb.DuckDBPyConnection, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> FeatureState:
+    """
+    Pass 1: the state `fit_feature_state` would fit on the whole table, without loading
+    it. Only the categorical and target columns are streamed; vocabularies are merged
+    as sets and target encodings fold each batch into their running statistics.
+    """
+    columns = [r[0] for r in con.execute("DESCRIBE listings").fetchall()]
+    label = [c for c in LABEL_COLS if c in columns]
+    encodings = [
+        TargetEncoding(column=c, target=t, global_mean=None)
+        for c in TE_COLS
+        for t in TE_TARGETS
+        if c in columns and t in columns
+    ]
+    needed = dict.fromkeys([*label, *(e.column for e in encodings), *(e.target for e in encodings)])
+    seen: dict[str, set[str]] = {c: set() for c in label}
+    if needed:
+        select = ", ".join(f'"{c}"' for c in needed)
+        for batch in iter_batches(con, f"SELECT {select} FROM listings", batch_rows):
+            for c in label:
+                values = batch.get_column(c).cast(pl.Utf8, strict=False).drop_nulls().unique()
+                seen[c].update(values.to_list())
+            for enc in encodings:
+                enc.update(batch)
+    return FeatureState(
+        winsor_bounds=fit_winsor_bounds_sql(con, columns),
+        # byte-wise string order, the same as polars' sort
+        vocabularies={c: sorted(v) for c, v in seen.items()},
+        target_encodings=encodings,
+    )
+
+
+class _ParquetSink:
+    """
+    Appends frames as row groups to the only part of a fresh output directory, which
+    replaces the one at `path` on commit.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.staged: Path | None = None
+        self._writer: Any = None
+
+    def write(self, df: pl.DataFrame) -> None:
+        import pyarrow.parquet as pq
+
+        table = df.to_arrow()
+        if self._writer is None:
+            self.staged = staging_dir(self.path)
+            self._writer = pq.ParquetWriter(self.staged / PART_FILE.format(0), table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def commit(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            publish_parts(self.staged, self.path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            shutil.rmtree(self.staged, ignore_errors=True)
+
+
+def build_features_chunked(
+    db_path: str,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    profiler: PipelineProfiler | None = None,
+    aggregates: bool = False,
+) -> tuple[FeatureState, int, Any]:
+    """
+    `build_features` over the whole warehouse in bounded memory.
+
+    Fits the state in a first pass (`fit_feature_state_chunked`), then streams
+    `listings` in insertion order a batch at a time, builds features with that state and
+    appends each batch to features.parquet and train.parquet as a row group of their
+    first part. The old outputs are only replaced once every batch has been written.
+    `profiler` sums each stage over the batches. With `aggregates`, every listing's
+    as-of seller / product history is staged once and each batch joins its own rows.
+    Returns (state, rows, largest `_ingested_at`).
+    """
+    sinks = [_ParquetSink(bf.PROCESSED_DIR / n) for n in ("features.parquet", "train.parquet")]
+    con = duckdb.connect(db_path, read_only=True, config={"memory_limit": DUCKDB_MEMORY_LIMIT})
+    try:
+        state = fit_feature_state_chunked(con, batch_rows)
+        rows, watermark = 0, None
+        if aggregates:
+            stage_asof(con)
+        # streamed on a cursor so the per-batch lookups can use `con` meanwhile
+        cur = con.cursor()
+        for batch in iter_batches(cur, "SELECT * FROM listings", batch_rows):
+            index = AggregateIndex.as_of(con, batch.get_column("item_id")) if aggregates else None
+            feat = bf.build_features(batch, state, profiler, index)
+            sinks[0].write(feat)
+            train = bf.training_frame(feat)
+            if train is not None:
+                sinks[1].write(train)
+            rows += feat.height
+            if "_ingested_at" in batch.columns:
+                latest = batch.get_column("_ingested_at").max()
+                if latest is not None and (watermark is None or latest > watermark):
+                    watermark = latest
+        for sink in sinks:
+            sink.commit()
+        bf.save_train_schema()
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
+    finally:
+        con.close()
+    return state, rows, watermark
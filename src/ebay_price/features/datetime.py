@@ -3,37 +3,39 @@ from __future__ import annotations
 import polars as pl
 
 
-def datetime_features(df: pl.DataFrame) -> pl.DataFrame:
+def datetime_exprs() -> list[pl.Expr]:
     """
-    Adds:
+    Expressions for:
       - start_dt, end_dt (parsed from ISO8601 with trailing Z)
       - duration_hours (end - start in hours)
       - start_weekday (0=Mon)
       - start_hour (0-23)
       - start_month (1-12)
+
+    The derived columns re-use the parse expressions rather than the new columns, so
+    the whole set fits in one `with_columns` (polars evaluates the shared parse once).
     """
-    out = df.with_columns(
-        [
-            pl.col("start_time")
-            .cast(pl.Utf8, strict=False)
-            .str.strptime(pl.Datetime, format="%+", strict=False)
-            .alias("start_dt"),
-            pl.col("end_time")
-            .cast(pl.Utf8, strict=False)
-            .str.strptime(pl.Datetime, format="%+", strict=False)
-            .alias("end_dt"),
-        ]
-    ).with_columns(
-        [
-            (
-                (
-                    pl.col("end_dt").cast(pl.Datetime) - pl.col("start_dt").cast(pl.Datetime)
-                ).dt.total_seconds()
-                / 3600.0
-            ).alias("duration_hours"),
-            pl.col("start_dt").dt.weekday().alias("start_weekday"),
-            pl.col("start_dt").dt.hour().alias("start_hour"),
-            pl.col("start_dt").dt.month().alias("start_month"),
-        ]
+    start = (
+        pl.col("start_time")
+        .cast(pl.Utf8, strict=False)
+        .str.strptime(pl.Datetime, format="%+", strict=False)
+    )
+    end = (
+        pl.col("end_time")
+        .cast(pl.Utf8, strict=False)
+        .str.strptime(pl.Datetime, format="%+", strict=False)
     )
-    return out
+    return [
+        start.alias("start_dt"),
+        end.alias("end_dt"),
+        ((end.cast(pl.Datetime) - start.cast(pl.Datetime)).dt.total_seconds() / 3600.0).alias(
+            "duration_hours"
+        ),
+        start.dt.weekday().alias("start_weekday"),
+        start.dt.hour().alias("start_hour"),
+        start.dt.month().alias("start_month"),
+    ]
+
+
+def datetime_features(df: pl.DataFrame) -> pl.DataFrame:
+    return df.with_columns(datetime_exprs())
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+TRAIN_SCHEMA_FILE = "train_schema.json"
+# Labels keep the dtype they were ingested with
+TARGET_COLS = ("final_price", "sold")
+# Columns whose domain is bounded by construction (calendar fields, 0/1 flags)
+SMALL_INT_COLS = (
+    "start_weekday",
+    "start_hour",
+    "start_month",
+    "title_has_digit",
+    "title_has_brand",
+)
+# Wide dtype -> the one it is stored as. Fixed per dtype rather than fitted to the data,
+# so every batch of a chunked build and every refresh lands on the same schema
+_NARROW: dict[pl.DataType, pl.DataType] = {
+    pl.Float64(): pl.Float32(),
+    pl.Int64(): pl.Int32(),
+    pl.UInt64(): pl.UInt32(),
+}
+
+
+def compact_schema(schema: pl.Schema) -> dict[str, pl.DataType]:
+    """The dtype each column of a training frame with `schema` is stored as."""
+    out: dict[str, pl.DataType] = {}
+    for col, dtype in schema.items():
+        if col in TARGET_COLS:
+            out[col] = dtype
+        elif col in SMALL_INT_COLS and dtype.is_integer():
+            out[col] = pl.Int8()
+        else:
+            out[col] = _NARROW.get(dtype, dtype)
+    return out
+
+
+def compact_dtypes(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Downcast a training frame to `compact_schema`: Float32 features, Int32 counts and
+    label codes (signed, -1 is the unseen code), Int8 calendar fields and flags.
+    Integer casts are strict, so a value that does not fit fails the build instead of
+    wrapping. Float32 keeps ~7 significant digits, well past what prices carry.
+    """
+    schema = df.collect_schema()
+    changed = [pl.col(c).cast(t) for c, t in compact_schema(schema).items() if schema[c] != t]
+    return df.with_columns(changed) if changed else df
+
+
+def save_schema(schema: pl.Schema | dict[str, pl.DataType], path: str | Path) -> Path:
+    """Record column -> dtype next to a Parquet output."""
+    p = Path(path)
+    p.write_text(json.dumps({c: str(t) for c, t in schema.items()}, indent=2))
+    return p
+
+
+def to_float32(df: pl.DataFrame) -> np.ndarray:
+    """
+    Dense float32 model matrix with nulls, NaNs and non-numeric values as 0, straight
+    from polars. Training and the API's frame path both go through here, as the
+    compiled plan writes float32.
+    """
+    if df.width == 0:
+        return np.zeros((df.height, 0), dtype=np.float32)
+    X = df.select(pl.all().cast(pl.Float32, strict=False).fill_nan(0).fill_null(0))
+    return X.to_numpy()
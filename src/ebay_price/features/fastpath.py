@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import re
+from collections.abc import Callable, Mapping, Sequence
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+from ebay_price.features.categorical import LABEL_COLS
+from ebay_price.features.inference import REQUIRED_DEFAULTS
+from ebay_price.features.numeric import NUMERIC_COLS
+from ebay_price.features.state import FeatureState
+from ebay_price.features.text import _word_count
+
+# Columns _ensure_required_fields passes through pd.to_numeric(errors="coerce")
+COERCED_NUMERIC = (
+    "start_price",
+    "shipping_cost",
+    "watchers",
+    "bids",
+    "seller_feedback_score",
+    "seller_positive_percent",
+)
+# Null fills applied by normalize.to_polars to the remaining columns
+NULL_FILLS: dict[str, Any] = {"final_price": 0.0, "sold": 0, "currency": "USD"}
+
+# What polars' "%+" accepts: date, T/space, H:M:S, optional fraction, Z or +hh[:]mm offset
+_ISO_RE = re.compile(
+    r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})[Tt ](\d{1,2}):(\d{2}):(\d{2})(?:\.(\d+))?"
+    r"\s*(?:([Zz])|([+-])(\d{2}):?(\d{2}))\s*$"
+)
+_DIGIT_RE = re.compile(r"\d")
+_NAN = float("nan")
+
+Row = dict[str, Any]
+Extractor = Callable[[Row], float]
+
+
+def _to_number(v: Any) -> float:
+    """Scalar version of pd.to_numeric(errors="coerce"): unparseable or missing -> NaN."""
+    if v is None:
+        return _NAN
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _parse_ts(v: Any) -> dt.datetime | None:
+    if isinstance(v, dt.datetime):
+        return v if v.tzinfo else v.replace(tzinfo=dt.UTC)
+    if not isinstance(v, str):
+        return None
+    m = _ISO_RE.match(v)
+    if m is None:
+        return None
+    y, mo, d, h, mi, s, frac, z, sign, oh, om = m.groups()
+    try:
+        ts = dt.datetime(
+            int(y), int(mo), int(d), int(h), int(mi), int(s), int((frac or "0")[:6].ljust(6, "0"))
+        )
+    except ValueError:
+        return None
+    if z is None:
+        offset = dt.timedelta(hours=int(oh), minutes=int(om))
+        ts = ts - offset if sign == "+" else ts + offset
+    return ts.replace(tzinfo=dt.UTC)
+
+
+def _prepare(listing: Mapping[str, Any]) -> Row:
+    """Apply the defaults, numeric coercion and null fills of the pandas/polars path."""
+    row: Row = dict(listing)
+    for k, v in REQUIRED_DEFAULTS.items():
+        row.setdefault(k, v)
+    for c in COERCED_NUMERIC:
+        if c in row:
+            row[c] = _to_number(row[c])
+    for c, v in NULL_FILLS.items():
+        if c in row and row[c] is None:
+            row[c] = v
+    row["_start_dt"] = _parse_ts(row.get("start_time"))
+    row["_end_dt"] = _parse_ts(row.get("end_time"))
+    return row
+
+
+def _clipped(row: Row, col: str) -> float:
+    # numeric_features: clip(lower_bound=0); NaN passes through. Nulls were already
+    # filled by _prepare, so None here means the column is absent altogether.
+    x = _to_number(row.get(col))
+    return 0.0 if x < 0 else x
+
+
+@lru_cache(maxsize=4096)
+def _brand_pattern(brand: str) -> re.Pattern[str] | None:
+    try:
+        return re.compile(brand)
+    except re.error:
+        return None
+
+
+def _title_has_brand(row: Row) -> float:
+    title, brand = row.get("title"), row.get("brand")
+    if brand is None or title is None:
+        return 0.0
+    pat = _brand_pattern(str(brand))
+    return float(pat is not None and pat.search(str(title)) is not None)
+
+
+def _duration_hours(row: Row) -> float:
+    start, end = row["_start_dt"], row["_end_dt"]
+    if start is None or end is None:
+        return _NAN
+    # polars dt.total_seconds() truncates toward zero
+    us = (end - start) // dt.timedelta(microseconds=1)
+    secs = abs(us) // 1_000_000
+    return (secs if us >= 0 else -secs) / 3600.0
+
+
+def _dt_part(key: str, part: Callable[[dt.datetime], int]) -> Extractor:
+    def f(row: Row) -> float:
+        ts = row[key]
+        return _NAN if ts is None else float(part(ts))
+
+    return f
+
+
+def _win(col: str, lo: float, hi: float) -> Extractor:
+    def f(row: Row) -> float:
+        x = _clipped(row, col)
+        return min(max(x, lo), hi) if x == x else x
+
+    return f
+
+
+def _log1p_win(col: str, lo: float, hi: float) -> Extractor:
+    win = _win(col, lo, hi)
+    return lambda row: math.log1p(win(row))
+
+
+def _label(col: str, vocab: list[str]) -> Extractor:
+    mapping = {v: float(i) for i, v in enumerate(vocab)}
+
+    def f(row: Row) -> float:
+        v = row.get(col)
+        return _NAN if v is None else mapping.get(str(v), -1.0)
+
+    return f
+
+
+def _target(col: str, table: dict[str, float], prior: float) -> Extractor:
+    def f(row: Row) -> float:
+        v = row.get(col)
+        return _NAN if v is None else table.get(str(v), prior)
+
+    return f
+
+
+def _raw(col: str) -> Extractor:
+    return lambda row: _to_number(row.get(col))
+
+
+def _title_len(row: Row) -> float:
+    t = row.get("title")
+    return _NAN if t is None else float(len(str(t)))
+
+
+def _title_wc(row: Row) -> float:
+    t = row.get("title")
+    return _NAN if t is None else float(_word_count(str(t)))
+
+
+def _title_has_digit(row: Row) -> float:
+    t = row.get("title")
+    return float(t is not None and _DIGIT_RE.search(str(t)) is not None)
+
+
+def _extractors(state: FeatureState) -> dict[str, Extractor]:
+    """Per-column equivalents of build_features, with `state` baked into closures."""
+    ex: dict[str, Extractor] = {
+        "seller_feedback_score": _raw("seller_feedback_score"),
+        "seller_positive_percent": _raw("seller_positive_percent"),
+        "duration_hours": _duration_hours,
+        "start_weekday": _dt_part("_start_dt", lambda ts: ts.isoweekday()),
+        "start_hour": _dt_part("_start_dt", lambda ts: ts.hour),
+        "start_month": _dt_part("_start_dt", lambda ts: ts.month),
+        "title_len": _title_len,
+        "title_wc": _title_wc,
+        "title_has_digit": _title_has_digit,
+        "title_has_brand": _title_has_brand,
+    }
+    for col in NUMERIC_COLS:
+        # inference drops the raw target column after building features
+        if col != "final_price":
+            ex[col] = lambda row, c=col: _clipped(row, c)
+    for col, (lo, hi) in state.winsor_bounds.items():
+        ex[f"{col}_win"] = _win(col, lo, hi)
+        ex[f"log1p_{col}"] = _log1p_win(col, lo, hi)
+    for col in LABEL_COLS:
+        if col in state.vocabularies:
+            ex[f"{col}_le"] = _label(col, state.vocabularies[col])
+    for enc in state.target_encodings:
+        ex[enc.name] = _target(enc.column, enc.table, enc.global_mean)
+    return ex
+
+
+class InferencePlan:
+    """
+    build_features + align_to_columns compiled for one listing at a time.
+
+    Each training column gets a closure over its fitted lookup table or bounds;
+    columns the pipeline never produces are left at 0, as align_to_columns does.
+    `transform` writes straight into a float32 vector in training column order,
+    with missing values zero-filled like `.fillna(0)` on the pandas path.
+    """
+
+    def __init__(self, columns: Sequence[str], state: FeatureState):
+        self.columns = list(columns)
+        extractors = _extractors(state)
+        self._steps: list[tuple[int, Extractor]] = [
+            (i, extractors[c]) for i, c in enumerate(self.columns) if c in extractors
+        ]
+
+    @property
+    def width(self) -> int:
+        return len(self.columns)
+
+    def _fill(self, listing: Mapping[str, Any], out: np.ndarray) -> None:
+        row = _prepare(listing)
+        for i, fn in self._steps:
+            v = fn(row)
+            out[i] = v if v == v else 0.0
+
+    def transform(self, listing: Mapping[str, Any], out: np.ndarray | None = None) -> np.ndarray:
+        if out is None:
+            out = np.zeros(self.width, dtype=np.float32)
+        else:
+            out.fill(0.0)
+        self._fill(listing, out)
+        return out
+
+    def transform_many(self, listings: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        X = np.zeros((len(listings), self.width), dtype=np.float32)
+        for r, listing in enumerate(listings):
+            self._fill(listing, X[r])
+        return X
+
+
+class JointPlan:
+    """
+    One feature pass shared by several models: the listing is compiled against the
+    union of their column lists once, then each model's matrix is a column gather.
+    """
+
+    def __init__(self, column_sets: Sequence[Sequence[str]], state: FeatureState):
+        union = list(dict.fromkeys(c for cols in column_sets for c in cols))
+        self.plan = InferencePlan(union, state)
+        pos = {c: i for i, c in enumerate(union)}
+        self._index = [np.fromiter((pos[c] for c in cols), dtype=np.intp) for cols in column_sets]
+
+    def transform_many(self, listings: Sequence[Mapping[str, Any]]) -> list[np.ndarray]:
+        U = self.plan.transform_many(listings)
+        return [U[:, idx] for idx in self._index]
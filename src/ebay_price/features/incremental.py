@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+from pathlib import Path
+
+import duckdb
+import polars as pl
+
+from ebay_price.features import build_features as bf
+from ebay_price.features.aggregates import refresh_aggregate_index
+from ebay_price.features.categorical import LABEL_COLS
+from ebay_price.features.chunked import DUCKDB_MEMORY_LIMIT, build_features_chunked
+from ebay_price.features.parts import (
+    PART_FILE,
+    part_paths,
+    publish_parts,
+    scan_parts,
+    staging_dir,
+)
+from ebay_price.features.profiling import PipelineProfiler
+from ebay_price.features.sql import fit_feature_state_sql, write_features_sql
+from ebay_price.features.state import FEATURE_STATE_PATH, FeatureState, fit_feature_state
+from ebay_price.features.store import DEFAULT_DB, FeatureStore, pipeline_version
+
+REFRESH_STATE_FILE = "refresh_state.json"
+
+
+def _refresh_state_path() -> Path:
+    return bf.PROCESSED_DIR / REFRESH_STATE_FILE
+
+
+def read_watermark() -> dt.datetime | None:
+    """Largest `_ingested_at` already folded into features.parquet, if any."""
+    p = _refresh_state_path()
+    if not p.exists():
+        return None
+    value = json.loads(p.read_text()).get("watermark")
+    return dt.datetime.fromisoformat(value) if value else None
+
+
+def _save_watermark(wm: dt.datetime | None, mode: str, rows: int) -> None:
+    _refresh_state_path().write_text(
+        json.dumps(
+            {"watermark": wm.isoformat() if wm else None, "mode": mode, "rows": rows}, indent=2
+        )
+    )
+
+
+def _write_watermark(df: pl.DataFrame, mode: str, previous: dt.datetime | None = None) -> None:
+    wm = df.get_column("_ingested_at").max() if "_ingested_at" in df.columns else None
+    if previous is not None and (wm is None or wm < previous):
+        wm = previous
+    _save_watermark(wm, mode, df.height)
+
+
+def load_listings_since(db_path: str, since: dt.datetime) -> pl.DataFrame:
+    """Listings ingested or updated after `since` (upserts restamp `_ingested_at`)."""
+    con = duckdb.connect(db_path)
+    try:
+        return con.execute("SELECT * FROM listings WHERE _ingested_at > ?", [since]).pl()
+    finally:
+        con.close()
+
+
+def full_refresh(
+    db_path: str = DEFAULT_DB,
+    state_path: str | Path = FEATURE_STATE_PATH,
+    batch_rows: int | None = None,
+    profiler: PipelineProfiler | None = None,
+    engine: str = "polars",
+) -> int:
+    """
+    Refit the feature state on the whole warehouse and rewrite every output. With
+    `batch_rows`, the warehouse is streamed in batches of that size instead of loaded.
+    `profiler` records the state fit and each feature stage. `engine="duckdb"` fits
+    and computes everything inside DuckDB instead (`batch_rows` and `profiler` unused).
+    The seller / product aggregate tables are recomputed from scratch first, and each
+    listing gets its history as of its own start.
+    """
+    if engine == "duckdb" or batch_rows:
+        refresh_aggregate_index(db_path, load=False)
+    if engine == "duckdb":
+        return _full_refresh_sql(db_path, state_path)
+    if batch_rows:
+        return _full_refresh_chunked(db_path, state_path, batch_rows, profiler, aggregates=True)
+    aggregates = refresh_aggregate_index(db_path)
+    df = bf.load_listings(db_path)
+    if df.is_empty():
+        print("No listings in warehouse.")
+        return 0
+    if profiler is not None:
+        state = profiler.run("fit_state", fit_feature_state, df)
+    else:
+        state = fit_feature_state(df)
+    feat = bf.build_features(df, state, profiler, aggregates)
+    bf.save_outputs(feat)
+    FeatureStore(db_path).write(feat, pipeline_version(state), state.target_encodings)
+    state.save(state_path)
+    _write_watermark(df, "full")
+    print(f"Rebuilt features for {df.height} listings.")
+    return df.height
+
+
+def _full_refresh_chunked(
+    db_path: str,
+    state_path: str | Path,
+    batch_rows: int,
+    profiler: PipelineProfiler | None = None,
+    aggregates: bool = False,
+) -> int:
+    state, rows, watermark = build_features_chunked(db_path, batch_rows, profiler, aggregates)
+    if not rows:
+        print("No listings in warehouse.")
+        return 0
+    store = FeatureStore(db_path, memory_limit=DUCKDB_MEMORY_LIMIT)
+    features_path = bf.PROCESSED_DIR / "features.parquet"
+    store.write(features_path, pipeline_version(state), state.target_encodings)
+    state.save(state_path)
+    _save_watermark(watermark, "full", rows)
+    print(f"Rebuilt features for {rows} listings in batches of {batch_rows}.")
+    return rows
+
+
+def _full_refresh_sql(db_path: str, state_path: str | Path) -> int:
+    features_path = bf.PROCESSED_DIR / "features.parquet"
+    train_path = bf.PROCESSED_DIR / "train.parquet"
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        rows = con.execute("SELECT count(*) FROM listings").fetchone()[0]
+        if not rows:
+            print("No listings in warehouse.")
+            return 0
+        state = fit_feature_state_sql(con)
+        staged = staging_dir(features_path)
+        write_features_sql(con, state, staged / PART_FILE.format(0))
+        columns = {r[0] for r in con.execute("DESCRIBE listings").fetchall()}
+        watermark = None
+        if "_ingested_at" in columns:
+            # through polars, which converts time zones without needing pytz
+            watermark = con.execute("SELECT max(_ingested_at) FROM listings").pl().item()
+    finally:
+        con.close()
+    train = bf.training_frame(pl.scan_parquet(staged / PART_FILE.format(0)))
+    if train is not None:
+        staged_train = staging_dir(train_path)
+        train.sink_parquet(staged_train / PART_FILE.format(0))
+    publish_parts(staged, features_path)
+    if train is not None:
+        publish_parts(staged_train, train_path)
+        bf.save_train_schema()
+    FeatureStore(db_path).write(features_path, pipeline_version(state), state.target_encodings)
+    state.save(state_path)
+    _save_watermark(watermark, "full", rows)
+    print(f"Rebuilt features for {rows} listings inside DuckDB.")
+    return rows
+
+
+def _extend_vocabularies(state: FeatureState, delta: pl.DataFrame) -> None:
+    # New categories go on the end so the codes already in features.parquet stay valid
+    for col in LABEL_COLS:
+        if col not in state.vocabularies or col not in delta.columns:
+            continue
+        vocab = state.vocabularies[col]
+        known = set(vocab)
+        seen = delta.get_column(col).cast(pl.Utf8, strict=False).drop_nulls().unique().sort()
+        vocab.extend(v for v in seen.to_list() if v not in known)
+
+
+def incremental_refresh(
+    db_path: str = DEFAULT_DB,
+    state_path: str | Path = FEATURE_STATE_PATH,
+    batch_rows: int | None = None,
+    profiler: PipelineProfiler | None = None,
+    engine: str = "polars",
+) -> int:
+    """
+    Fold listings ingested since the last refresh into the processed outputs and the
+    feature store.
+
+    Only the new or updated item_ids go through build_features. Their previous rows are
+    retracted from, and the new rows added to, the running target-encoding statistics.
+    The rows built are appended to features.parquet and train.parquet as a new part and
+    upserted into the feature store; earlier rows are not rewritten. Their target
+    encodings are recomputed as they are read (`scan_parts`, `FeatureStore.read`), and
+    their seller / product history stays as of their own start. Winsor bounds stay as
+    last fitted; unseen categories are appended to the vocabularies. A full refresh
+    compacts the parts again.
+    Falls back to `full_refresh` (passing `batch_rows`, `profiler` and `engine` on) when
+    there is no previous refresh to build on; the delta itself always goes through polars.
+    """
+    features_path = bf.PROCESSED_DIR / "features.parquet"
+    watermark = read_watermark()
+    state = FeatureState.load(state_path) if Path(state_path).exists() else None
+    if (
+        watermark is None
+        or state is None
+        or not features_path.is_dir()
+        or not all(enc.incremental for enc in state.target_encodings)
+    ):
+        print("No incremental baseline found; running a full rebuild.")
+        return full_refresh(db_path, state_path, batch_rows, profiler, engine)
+
+    delta = load_listings_since(db_path, watermark)
+    if delta.is_empty():
+        print("No listings ingested since the last refresh.")
+        return 0
+    delta = delta.unique("item_id", keep="last", maintain_order=True)
+
+    # Retract the rows being replaced using their processed values; targets there are
+    # only clipped at 0, which matches the ingest-normalized values they were fitted on
+    ids = delta.get_column("item_id").implode()
+    prior = scan_parts(features_path).filter(pl.col("item_id").is_in(ids)).collect()
+    for enc in state.target_encodings:
+        if enc.column in delta.columns and enc.target in delta.columns:
+            enc.update(delta, prior)
+    _extend_vocabularies(state, delta)
+
+    aggregates = refresh_aggregate_index(db_path, rebuild=False, items=delta["item_id"])
+    delta_feat = bf.build_features(delta, state, profiler, aggregates)
+    bf.save_outputs(delta_feat, append=True)
+    store = FeatureStore(db_path)
+    version = pipeline_version(state)
+    if store.versions()[:1] == [version]:
+        store.write(delta_feat, version, state.target_encodings)
+    else:
+        # the store holds another version (or none yet); it needs every row under this one
+        store.write(scan_parts(features_path).collect(), version, state.target_encodings)
+    state.save(state_path)
+    _write_watermark(delta, "incremental", previous=watermark)
+    parts = len(part_paths(features_path))
+    print(
+        f"Merged {delta.height} new or updated listings ({prior.height} replaced); "
+        f"features.parquet has {parts} parts."
+    )
+    return delta.height
@@ -7,6 +7,8 @@ import pandas as pd
 import polars as pl
 
 from ebay_price.features.build_features import build_features
+from ebay_price.features.profiling import PipelineProfiler
+from ebay_price.features.state import FeatureState
 from ebay_price.ingest.normalize import to_polars
 
 REQUIRED_DEFAULTS: dict[str, Any] = {
@@ -44,19 +46,28 @@ def _ensure_required_fields(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def build_inference_features(df: pd.DataFrame) -> pl.DataFrame:
+def _prepare(df: pd.DataFrame) -> pl.DataFrame:
+    df = _ensure_required_fields(df)
+    rows = df.to_dict(orient="records")
+    return to_polars(rows)  # apply normalize types/timestamps
+
+
+def build_inference_features(
+    df: pd.DataFrame,
+    state: FeatureState | None = None,
+    profiler: PipelineProfiler | None = None,
+) -> pl.DataFrame:
     """
     Convert a pandas payload (one or many rows) into the model's feature frame.
-    Uses the exact same build_features pipeline as training.
+    Uses the exact same build_features pipeline as training; pass the fitted
+    `state` so encodings and bounds match what the model was trained on, and a
+    `profiler` to record payload normalization ("prepare") and each pipeline stage.
     """
     if not isinstance(df, pd.DataFrame):
         raise TypeError("build_inference_features expects a pandas.DataFrame")
 
-    df = _ensure_required_fields(df)
-
-    rows = df.to_dict(orient="records")
-    pl_df = to_polars(rows)  # apply normalize types/timestamps
-    feats = build_features(pl_df)  # run full training feature pipeline
+    pl_df = profiler.run("prepare", _prepare, df) if profiler is not None else _prepare(df)
+    feats = build_features(pl_df, state, profiler)  # run full training feature pipeline
 
     # Drop target if present
     if "final_price" in feats.columns:
@@ -65,5 +76,7 @@ def build_inference_features(df: pd.DataFrame) -> pl.DataFrame:
 
 
 # Backward-compat name used by older streamlit_app versions
-def prepare_features_for_inference(df: pd.DataFrame) -> pl.DataFrame:
-    return build_inference_features(df)
+def prepare_features_for_inference(
+    df: pd.DataFrame, state: FeatureState | None = None
+) -> pl.DataFrame:
+    return build_inference_features(df, state)
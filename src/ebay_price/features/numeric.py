@@ -3,29 +3,47 @@ from __future__ import annotations
 import polars as pl
 
 NUMERIC_COLS = ["start_price", "final_price", "shipping_cost", "watchers", "bids"]
+WINSOR_COLS = ("start_price", "final_price", "shipping_cost")
 
 
-def _clip_nonneg(series: pl.Series) -> pl.Series:
-    return series.fill_null(0).clip(lower_bound=0)
+def _clip_nonneg(x: pl.Series | pl.Expr) -> pl.Series | pl.Expr:
+    return x.fill_null(0).clip(lower_bound=0)
 
 
-def numeric_features(df: pl.DataFrame) -> pl.DataFrame:
-    out = df
-    for col in NUMERIC_COLS:
-        if col in out.columns:
-            out = out.with_columns(_clip_nonneg(out[col]).alias(col))
+def fit_winsor_bounds(df: pl.DataFrame) -> dict[str, tuple[float, float]]:
+    """1% / 99% bounds of the non-negative-clipped monetary columns."""
+    bounds: dict[str, tuple[float, float]] = {}
+    for col in WINSOR_COLS:
+        if col in df.columns:
+            clipped = _clip_nonneg(df.get_column(col))
+            bounds[col] = (
+                clipped.quantile(0.01, interpolation="nearest"),
+                clipped.quantile(0.99, interpolation="nearest"),
+            )
+    return bounds
+
 
+def numeric_exprs(columns: list[str], bounds: dict[str, tuple[float, float]]) -> list[pl.Expr]:
+    """
+    Non-negative clip of NUMERIC_COLS (in place) plus winsorized and log1p variants of
+    the monetary columns. The variants are written against the clipped expression, not
+    the replaced column, so everything evaluates in a single `with_columns`.
+    """
+    exprs = [_clip_nonneg(pl.col(col)).alias(col) for col in NUMERIC_COLS if col in columns]
     # winsorize key monetary columns at 1% / 99% to reduce outlier impact
-    for col in ("start_price", "final_price", "shipping_cost"):
-        if col in out.columns:
-            q = out.select(
-                [
-                    pl.quantile(col, 0.01, interpolation="nearest").alias("q1"),
-                    pl.quantile(col, 0.99, interpolation="nearest").alias("q99"),
-                ]
-            )
-            q1, q99 = q.item(0, 0), q.item(0, 1)
-            out = out.with_columns(pl.col(col).clip(q1, q99).alias(f"{col}_win"))
+    for col in WINSOR_COLS:
+        if col in columns and col in bounds:
+            q1, q99 = bounds[col]
+            win = _clip_nonneg(pl.col(col)).clip(q1, q99)
+            exprs.append(win.alias(f"{col}_win"))
             # log1p variant
-            out = out.with_columns(pl.col(f"{col}_win").log1p().alias(f"log1p_{col}"))
-    return out
+            exprs.append(win.log1p().alias(f"log1p_{col}"))
+    return exprs
+
+
+def numeric_features(
+    df: pl.DataFrame, bounds: dict[str, tuple[float, float]] | None = None
+) -> pl.DataFrame:
+    if bounds is None:
+        bounds = fit_winsor_bounds(df)
+    return df.with_columns(numeric_exprs(df.columns, bounds))
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+
+import polars as pl
+
+from ebay_price.features.categorical import TargetEncoding, target_encode_exprs
+
+# features.parquet and train.parquet are directories of parts: a full refresh writes the
+# first, each incremental refresh appends one with the rows it added or replaced
+PART_FILE = "part-{:06d}.parquet"
+
+
+def part_paths(path: str | Path) -> list[Path]:
+    """The parts of the output at `path` in write order; a lone file is its only part."""
+    p = Path(path)
+    if p.is_file():
+        return [p]
+    return sorted(p.glob("part-*.parquet")) if p.is_dir() else []
+
+
+def scan_parts(path: str | Path, encodings: Sequence[TargetEncoding] = ()) -> pl.LazyFrame | None:
+    """
+    The output at `path` as one frame: the newest row of each item_id, where it was
+    last written, and the target encodings recomputed from `encodings` (rows keep the
+    values of the refresh that wrote them). None when nothing has been written.
+    """
+    parts = part_paths(path)
+    if not parts:
+        return None
+    lf = pl.concat([pl.scan_parquet(p) for p in parts], how="diagonal_relaxed")
+    columns = lf.collect_schema().names()
+    if len(parts) > 1 and "item_id" in columns:
+        lf = lf.unique("item_id", keep="last", maintain_order=True)
+    if encodings:
+        lf = lf.with_columns(target_encode_exprs(columns, list(encodings)))
+    return lf
+
+
+def staging_dir(path: str | Path) -> Path:
+    """An empty directory to write a full rewrite of `path` into (see `publish_parts`)."""
+    staged = Path(path).with_name(Path(path).name + ".tmp")
+    shutil.rmtree(staged, ignore_errors=True)
+    staged.mkdir(parents=True)
+    return staged
+
+
+def publish_parts(staged: Path, path: str | Path) -> None:
+    """Swap the directory `staged` in for the output at `path`, dropping its old parts."""
+    final = Path(path)
+    old = final.with_name(final.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if final.is_dir():
+        final.rename(old)
+    else:
+        # a single-file output from before outputs were split into parts
+        final.unlink(missing_ok=True)
+    staged.rename(final)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def write_parts(df: pl.DataFrame | pl.LazyFrame, path: str | Path) -> None:
+    """Replace the output at `path` with `df` as its only part."""
+    staged = staging_dir(path)
+    part = staged / PART_FILE.format(0)
+    if isinstance(df, pl.LazyFrame):
+        df.sink_parquet(part)
+    else:
+        df.write_parquet(part)
+    publish_parts(staged, path)
+
+
+def append_part(df: pl.DataFrame, path: str | Path) -> Path:
+    """Add `df` to the output at `path` as its next part."""
+    parts = part_paths(path)
+    if parts and not Path(path).is_dir():
+        raise ValueError(f"{path} is a single file; rebuild it before appending")
+    Path(path).mkdir(parents=True, exist_ok=True)
+    n = int(parts[-1].stem.removeprefix("part-")) + 1 if parts else 0
+    part = Path(path) / PART_FILE.format(n)
+    tmp = part.with_name(part.name + ".tmp")
+    df.write_parquet(tmp)
+    tmp.replace(part)
+    return part
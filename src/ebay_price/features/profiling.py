@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+import polars as pl
+
+PROFILE_FILE = "build_profile.json"
+_STATM = Path("/proc/self/statm")
+
+T = TypeVar("T")
+
+
+def _rss_mb() -> float | None:
+    """Current resident set size; None where /proc is not available."""
+    try:
+        pages = int(_STATM.read_text().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class _PeakRss(threading.Thread):
+    """Polls RSS while a stage runs, so a stage that frees what it allocated still shows."""
+
+    def __init__(self, interval_s: float = 0.002):
+        super().__init__(daemon=True)
+        self.interval_s = interval_s
+        self.start_mb = _rss_mb()
+        self.peak_mb = self.start_mb
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval_s):
+            self._sample()
+
+    def _sample(self) -> None:
+        now = _rss_mb()
+        if now is not None and self.peak_mb is not None:
+            self.peak_mb = max(self.peak_mb, now)
+
+    def stop(self) -> float | None:
+        self._done.set()
+        self.join()
+        self._sample()
+        if self.peak_mb is None or self.start_mb is None:
+            return None
+        return self.peak_mb - self.start_mb
+
+
+@dataclass
+class StageProfile:
+    """One pipeline stage, summed over every call (a chunked build calls each per batch)."""
+
+    stage: str
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_delta_mb: float | None = None
+    rows_in: int = 0
+    rows_out: int | None = None
+    cols_in: int = 0
+    cols_out: int | None = None
+
+
+class PipelineProfiler:
+    """
+    Opt-in per-stage profile of the feature pipeline.
+
+    Pass one to `build_features` / `build_inference_features`; the pipeline then runs
+    stage by stage instead of as one fused query plan, and `run` records wall time,
+    process CPU time, peak RSS growth and frame shape around each stage. `on_stage` is
+    called with the stage name and that call's wall time (the API feeds its stage
+    histogram from it).
+    """
+
+    def __init__(
+        self,
+        track_memory: bool = True,
+        on_stage: Callable[[str, float], None] | None = None,
+    ):
+        self.track_memory = track_memory
+        self.on_stage = on_stage
+        self.stages: dict[str, StageProfile] = {}
+
+    def run(self, name: str, fn: Callable[[Any], T], df_in: Any) -> T:
+        """
+        Call `fn(df_in)` as stage `name` and record it. `df_in` may be a pandas or polars
+        frame; an output that is not a polars frame (a fitted state) has no shape recorded.
+        """
+        sampler = _PeakRss() if self.track_memory else None
+        if sampler is not None:
+            sampler.start()
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        try:
+            out = fn(df_in)
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            rss = sampler.stop() if sampler is not None else None
+        p = self.stages.setdefault(name, StageProfile(name))
+        p.calls += 1
+        p.wall_s += wall
+        p.cpu_s += cpu
+        if rss is not None:
+            p.peak_rss_delta_mb = max(p.peak_rss_delta_mb or 0.0, rss)
+        p.rows_in += len(df_in)
+        p.cols_in = df_in.shape[1]
+        if isinstance(out, pl.DataFrame):
+            p.rows_out = (p.rows_out or 0) + out.height
+            p.cols_out = out.width
+        if self.on_stage is not None:
+            self.on_stage(name, wall)
+        return out
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"stages": [asdict(p) for p in self.stages.values()]}
+
+    def summary(self) -> str:
+        total = sum(p.wall_s for p in self.stages.values()) or 1.0
+        lines = [
+            f"{'stage':<15}{'calls':>6}{'wall s':>9}{'%':>6}{'cpu s':>9}{'peak MB':>9}"
+            f"{'rows in':>11}{'rows out':>11}{'cols':>10}"
+        ]
+        for p in self.stages.values():
+            rss = "-" if p.peak_rss_delta_mb is None else f"{p.peak_rss_delta_mb:.0f}"
+            rows_out = "-" if p.rows_out is None else p.rows_out
+            cols = f"{p.cols_in}->{'-' if p.cols_out is None else p.cols_out}"
+            lines.append(
+                f"{p.stage:<15}{p.calls:>6}{p.wall_s:>9.3f}{100 * p.wall_s / total:>6.1f}"
+                f"{p.cpu_s:>9.3f}{rss:>9}{p.rows_in:>11}{rows_out:>11}{cols:>10}"
+            )
+        return "\n".join(lines)
+
+    def save(self, path: str | Path) -> Path:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(self.to_dict(), indent=2))
+        return p
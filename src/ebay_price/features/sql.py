@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Sequence
+from functools import reduce
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import polars as pl
+
+from ebay_price.features.aggregates import AggregateKey, aggregate_tables, asof_query
+from ebay_price.features.categorical import LABEL_COLS, TE_COLS, TE_TARGETS, TargetEncoding
+from ebay_price.features.chunked import fit_winsor_bounds_sql
+from ebay_price.features.numeric import NUMERIC_COLS, WINSOR_COLS
+from ebay_price.features.state import FeatureState
+from ebay_price.features.text import WORD_PATTERN
+
+FEATURE_VIEW = "v_features"
+# polars' "%+" only parses timestamps that carry an offset; TRY_CAST alone would read
+# offset-less ones in the session time zone
+_OFFSET_PATTERN = r"(Z|[+-]\d{2}(:?\d{2})?)$"
+_REGEX_META = r"[\\.^$|?*+()\[\]{}]"
+
+
+def _ident(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _double(x: float | None) -> str:
+    # via a string, so the bound is the exact double (a bare literal would be a DECIMAL)
+    return "NULL" if x is None else f"'{x!r}'::DOUBLE"
+
+
+def _columns(con: duckdb.DuckDBPyConnection, source: str) -> list[str]:
+    return [r[0] for r in con.execute(f"DESCRIBE {source}").fetchall()]
+
+
+def _fit_target_encoding_sql(
+    con: duckdb.DuckDBPyConnection, source: str, cat_col: str, target_col: str
+) -> TargetEncoding:
+    cat = f"CAST({_ident(cat_col)} AS VARCHAR)"
+    y = f"CAST({_ident(target_col)} AS DOUBLE)"
+    n, total = con.execute(f"SELECT count({y}), coalesce(sum({y}), 0) FROM {source}").fetchone()
+    rows = con.execute(
+        f"SELECT {cat}, count(*), count({y}), coalesce(sum({y}), 0) FROM {source} "
+        f"WHERE {_ident(cat_col)} IS NOT NULL GROUP BY 1"
+    ).fetchall()
+    stats = {c: [cnt, nn, s] for c, cnt, nn, s in rows}
+    return TargetEncoding.from_stats(cat_col, target_col, stats, [n, total])
+
+
+def fit_feature_state_sql(con: duckdb.DuckDBPyConnection, source: str = "listings") -> FeatureState:
+    """
+    `fit_feature_state` on `source` with every statistic aggregated inside DuckDB: only
+    the distinct categories and per-category target sums come back to Python.
+    """
+    columns = _columns(con, source)
+    vocabularies: dict[str, list[str]] = {}
+    for col in LABEL_COLS:
+        if col in columns:
+            rows = con.execute(
+                f"SELECT DISTINCT CAST({_ident(col)} AS VARCHAR) FROM {source} "
+                f"WHERE {_ident(col)} IS NOT NULL"
+            ).fetchall()
+            # byte-wise string order, the same as polars' sort
+            vocabularies[col] = sorted(r[0] for r in rows)
+    return FeatureState(
+        winsor_bounds=fit_winsor_bounds_sql(con, columns, source),
+        vocabularies=vocabularies,
+        target_encodings=[
+            _fit_target_encoding_sql(con, source, c, t)
+            for c in TE_COLS
+            for t in TE_TARGETS
+            if c in columns and t in columns
+        ],
+    )
+
+
+def feature_query(
+    columns: list[str],
+    state: FeatureState,
+    source: str = "listings",
+    aggregates: Sequence[AggregateKey] = (),
+) -> tuple[str, dict[str, pl.DataFrame]]:
+    """
+    The feature pipeline as one DuckDB query over `source`, column for column what
+    `build_features` produces and in the same row order. Vocabularies and encoding
+    tables are joined in from the returned lookup frames (one per categorical column),
+    which the caller registers under their keys before running the query. The statistics
+    of `aggregates` are computed as of each listing's start (`asof_query`), as
+    `AggregateIndex.as_of` does.
+    """
+    parts: dict[str, list[pl.DataFrame]] = {}
+
+    def _lookup(col: str, values: list[str], mapped: list[Any], dtype: pl.DataType) -> str:
+        # every table keyed on `col` goes into one frame, so each column is joined once
+        name = f"v{len(parts.get(col, []))}"
+        frame = pl.DataFrame(
+            {"value": values, name: mapped}, schema={"value": pl.Utf8, name: dtype}
+        )
+        parts.setdefault(col, []).append(frame)
+        return f"_lk_{col}.{name}"
+
+    def _ts(col: str) -> str:
+        s = f"CAST({_ident(col)} AS VARCHAR)"
+        parsed = f"TRY_CAST({s} AS TIMESTAMPTZ)"
+        return f"CASE WHEN regexp_matches({s}, '{_OFFSET_PATTERN}') THEN {parsed} END"
+
+    def _clip(col: str) -> str:
+        return f"greatest(coalesce(p.{_ident(col)}, 0), 0)"
+
+    replaced = [f"{_clip(c)} AS {_ident(c)}" for c in NUMERIC_COLS if c in columns]
+    select = [
+        "p.* EXCLUDE (_row, _start)" + (f" REPLACE ({', '.join(replaced)})" if replaced else "")
+    ]
+    select += [
+        "trunc((epoch_us(p.end_dt) - epoch_us(p.start_dt)) / 1e6) / 3600.0 AS duration_hours",
+        "CAST(p._start.isodow AS TINYINT) AS start_weekday",
+        "CAST(p._start.hour AS TINYINT) AS start_hour",
+        "CAST(p._start.month AS TINYINT) AS start_month",
+    ]
+    for col in LABEL_COLS:
+        if col in columns and col in state.vocabularies:
+            vocab = state.vocabularies[col]
+            code = _lookup(col, vocab, list(range(len(vocab))), pl.Int64)
+            select.append(
+                f"CASE WHEN p.{_ident(col)} IS NOT NULL THEN coalesce({code}, -1) END "
+                f"AS {_ident(col + '_le')}"
+            )
+    for enc in state.target_encodings:
+        if enc.column not in columns:
+            continue
+        value = _lookup(enc.column, list(enc.table), list(enc.table.values()), pl.Float64)
+        # unseen categories get the prior, as in _apply_target_encoding
+        select.append(
+            f"CASE WHEN p.{_ident(enc.column)} IS NOT NULL "
+            f"THEN coalesce({value}, {_double(enc.global_mean)}) END AS {_ident(enc.name)}"
+        )
+    for col in WINSOR_COLS:
+        if col in columns and col in state.winsor_bounds:
+            q1, q99 = state.winsor_bounds[col]
+            win = f"least(greatest({_clip(col)}, {_double(q1)}), {_double(q99)})"
+            select.append(f"{win} AS {_ident(col + '_win')}")
+            # DuckDB has no log1p; ln(1 + x) only drifts for x below ~1e-8
+            select.append(f"ln(1 + {win}) AS {_ident('log1p_' + col)}")
+    title = "CAST(p.title AS VARCHAR)"
+    select += [
+        f"CAST(length({title}) AS UINTEGER) AS title_len",
+        f"len(regexp_extract_all({title}, '{WORD_PATTERN}')) AS title_wc",
+        rf"CAST(coalesce(regexp_matches({title}, '\d'), false) AS TINYINT) AS title_has_digit",
+    ]
+    if "brand" in columns:
+        # polars reads the brand as a pattern per row. Most brands have no metacharacter,
+        # and compiling each as a regex dominated the query, so those take a substring
+        # test; TRY turns a pattern that does not compile into "no match"
+        brand = "CAST(p.brand AS VARCHAR)"
+        select.append(
+            f"CAST(coalesce(CASE WHEN p.brand IS NULL THEN false "
+            f"WHEN NOT regexp_matches({brand}, '{_REGEX_META}') THEN contains({title}, {brand}) "
+            f"ELSE TRY(regexp_matches({title}, {brand})) END, false) AS INTEGER) "
+            "AS title_has_brand"
+        )
+    lookups: dict[str, pl.DataFrame] = {}
+    joins: list[str] = []
+    for col, frames in parts.items():
+        alias = f"_lk_{col}"
+        lookups[alias] = reduce(
+            lambda a, b: a.join(b, on="value", how="full", coalesce=True), frames
+        )
+        joins.append(f"LEFT JOIN {alias} ON {alias}.value = CAST(p.{_ident(col)} AS VARCHAR)")
+    asof = asof_query(columns, "p", "_row", aggregates, history=source)
+    if asof is not None:
+        select += [
+            f"_asof.{_ident(f)}"
+            for key in aggregates
+            if all(c in columns for c in key.columns)
+            for f in key.features
+        ]
+        joins.append(f"LEFT JOIN ({asof}) _asof ON _asof._row = p._row")
+    # one date_part call splits the calendar fields out of start_dt in a single pass
+    query = (
+        f"WITH parsed AS (SELECT *, {_ts('start_time')} AS start_dt, "
+        f"{_ts('end_time')} AS end_dt, row_number() OVER () AS _row FROM {source}),\n"
+        "p AS (SELECT *, date_part(['isodow', 'hour', 'month'], start_dt) AS _start "
+        "FROM parsed)\n"
+        f"SELECT {', '.join(select)}\nFROM p\n" + "\n".join(joins) + "\nORDER BY p._row"
+    )
+    return query, lookups
+
+
+def create_feature_view(
+    con: duckdb.DuckDBPyConnection,
+    state: FeatureState,
+    source: str = "listings",
+    name: str = FEATURE_VIEW,
+) -> None:
+    """
+    Register the lookup tables and create `name` as a temporary view of `feature_query`
+    on `con`, joining whichever aggregate tables it holds. Timestamps are read and
+    written in UTC, as build_features does.
+    """
+    query, lookups = feature_query(_columns(con, source), state, source, aggregate_tables(con))
+    con.execute("SET TimeZone = 'UTC'")
+    for alias, frame in lookups.items():
+        con.register(alias, frame)
+    con.execute(f"CREATE OR REPLACE TEMP VIEW {name} AS {query}")
+
+
+def build_features_sql(
+    con: duckdb.DuckDBPyConnection, state: FeatureState | None = None, source: str = "listings"
+) -> pl.DataFrame:
+    """
+    `build_features` run inside DuckDB on `source`. Without `state`, it is fitted on
+    `source` by `fit_feature_state_sql`.
+    """
+    if state is None:
+        state = fit_feature_state_sql(con, source)
+    create_feature_view(con, state, source)
+    return con.execute(f"SELECT * FROM {FEATURE_VIEW}").pl()
+
+
+def write_features_sql(
+    con: duckdb.DuckDBPyConnection,
+    state: FeatureState,
+    path: str | Path,
+    source: str = "listings",
+) -> int:
+    """
+    Compute the features of `source` inside DuckDB and COPY them straight to the Parquet
+    file at `path` (replaced only once complete). Returns the number of rows written.
+    """
+    create_feature_view(con, state, source)
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    quoted = str(tmp).replace("'", "''")
+    try:
+        (rows,) = con.execute(
+            f"COPY (SELECT * FROM {FEATURE_VIEW}) TO '{quoted}' (FORMAT parquet)"
+        ).fetchone()
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
+    return int(rows)
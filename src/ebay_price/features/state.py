@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from ebay_price.features.categorical import (
+    TargetEncoding,
+    fit_target_encodings,
+    fit_vocabularies,
+)
+from ebay_price.features.numeric import fit_winsor_bounds
+
+FEATURE_STATE_PATH = Path("data/processed/feature_state.json")
+
+
+@dataclass
+class FeatureState:
+    """
+    Everything build_features learns from the training frame.
+
+    Fitted once at feature-build time and saved next to the processed outputs;
+    train_baselines copies it into each model's artifacts, so inference applies the
+    training-time bounds, vocabularies and encodings as lookups instead of
+    re-deriving them from the request rows.
+    """
+
+    winsor_bounds: dict[str, tuple[float, float]] = field(default_factory=dict)
+    vocabularies: dict[str, list[str]] = field(default_factory=dict)
+    target_encodings: list[TargetEncoding] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> FeatureState:
+        return cls(
+            winsor_bounds={k: (float(lo), float(hi)) for k, (lo, hi) in d["winsor_bounds"].items()},
+            vocabularies={k: list(v) for k, v in d["vocabularies"].items()},
+            target_encodings=[TargetEncoding(**e) for e in d["target_encodings"]],
+        )
+
+    def save(self, path: str | Path = FEATURE_STATE_PATH) -> Path:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(self.to_dict(), indent=2))
+        return p
+
+    @classmethod
+    def load(cls, path: str | Path = FEATURE_STATE_PATH) -> FeatureState:
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+def fit_feature_state(df: pl.DataFrame) -> FeatureState:
+    return FeatureState(
+        winsor_bounds=fit_winsor_bounds(df),
+        vocabularies=fit_vocabularies(df),
+        target_encodings=fit_target_encodings(df),
+    )
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+import duckdb
+import polars as pl
+
+from ebay_price.features.categorical import TargetEncoding, target_encode_exprs
+from ebay_price.features.state import FeatureState
+
+DEFAULT_DB = "data/artifacts/warehouse.duckdb"
+FEATURE_TABLE = "feature_store"
+# Target-encoding tables per pipeline version, applied to the rows as they are read
+ENCODING_TABLE = "feature_store_encodings"
+# Read-only copy of the table the API serves lookups from, next to the warehouse file
+ONLINE_FILE = "feature_store_online.duckdb"
+# Bump when a change to the feature code (rather than the fitted state) changes values
+PIPELINE_REVISION = 2
+# Pipeline versions kept in the table; the API may still serve the previous one until
+# models trained on the new one are deployed
+KEEP_VERSIONS = 2
+# Writes of more than 1/PATCH_SHARE of the table rebuild the online copy instead of
+# patching it (deleted rows leave free blocks in the patched file until a rebuild)
+PATCH_SHARE = 4
+_KEY_COLS = ("pipeline_version", "_materialized_at")
+
+
+def pipeline_version(state: FeatureState) -> str:
+    """
+    Short hash of the pipeline revision and the configuration the features came from:
+    the winsor bounds and which columns are label- or target-encoded. Vocabularies only
+    grow between full refits and target encodings move with every refresh, so neither
+    is hashed; `FeatureStore` keeps the encodings next to the rows instead.
+    """
+    config = {
+        "revision": PIPELINE_REVISION,
+        "winsor_bounds": state.winsor_bounds,
+        "vocabularies": sorted(state.vocabularies),
+        "target_encodings": [[e.column, e.target] for e in state.target_encodings],
+    }
+    payload = json.dumps(config, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _dump_encodings(encodings: Sequence[TargetEncoding]) -> str:
+    # the lookup tables only; the running statistics stay in the feature state
+    keep = ("column", "target", "global_mean", "table")
+    return json.dumps([{k: getattr(e, k) for k in keep} for e in encodings])
+
+
+def _load_encodings(row: tuple[str] | None) -> list[TargetEncoding]:
+    return [TargetEncoding(**e) for e in json.loads(row[0])] if row else []
+
+
+def _from_table(df: pl.DataFrame, encodings: Sequence[TargetEncoding] = ()) -> pl.DataFrame:
+    # DuckDB hands UTC timestamps back as "Etc/UTC"; match what build_features produced
+    df = df.drop(_KEY_COLS)
+    utc = [
+        c
+        for c, t in df.schema.items()
+        if isinstance(t, pl.Datetime) and t.time_zone not in (None, "UTC")
+    ]
+    df = df.with_columns(pl.col(utc).dt.convert_time_zone("UTC"))
+    return df.with_columns(target_encode_exprs(df.columns, list(encodings)))
+
+
+def _has_table(con: duckdb.DuckDBPyConnection, table: str = FEATURE_TABLE) -> bool:
+    return bool(
+        con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0]
+    )
+
+
+def publish_tables(
+    con: duckdb.DuckDBPyConnection, online_path: Path, tables: dict[str, tuple[str, ...]]
+) -> None:
+    """
+    Copy each table of `con` in `tables` into a fresh DuckDB file at `online_path`, with
+    an index on the listed columns. The copy is built under a temporary name and renamed
+    over the old one, so a reader holding the previous file keeps a consistent snapshot
+    until it reopens.
+    """
+    tmp = online_path.with_name(online_path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    quoted = str(tmp).replace("'", "''")
+    con.execute(f"ATTACH '{quoted}' AS online")  # ATTACH takes no bound parameters
+    try:
+        for table, index in tables.items():
+            con.execute(f"CREATE TABLE online.{table} AS SELECT * FROM {table}")
+            cols = ", ".join(f'"{c}"' for c in index)
+            con.execute(f"CREATE INDEX {table}_{'_'.join(index)} ON online.{table} ({cols})")
+    finally:
+        con.execute("DETACH online")
+    os.replace(tmp, online_path)
+
+
+class OnlineReader:
+    """
+    Read-only connection to a file written by `publish_tables`, reopened when the file
+    has been replaced since the last call.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._con: duckdb.DuckDBPyConnection | None = None
+        self._key: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+        # bumped on every reopen, so callers can tell their cached reads are stale
+        self.generation = 0
+
+    def cursor(self) -> duckdb.DuckDBPyConnection | None:
+        """A cursor on the current copy; None until one has been published."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            if self._con is None or self._key != key:
+                # attached rather than connected to: duckdb.connect hands back the cached
+                # database of a path while any cursor on it lives, i.e. the replaced file.
+                # The replaced connection is closed once no cursor uses it any more
+                con = duckdb.connect(":memory:")
+                quoted = str(self.path).replace("'", "''")
+                con.execute(f"ATTACH '{quoted}' AS online (READ_ONLY)")
+                self._con, self._key = con, key
+                self.generation += 1
+            # connections are not shared across threads; a cursor is cheap
+            return self._con.cursor().execute("USE online")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+            self._con, self._key = None, None
+
+
+class FeatureStore:
+    """
+    Materialized feature rows in the DuckDB warehouse, keyed by item_id and the
+    `pipeline_version` that produced them.
+
+    A full feature build writes every row and an incremental one only the rows it
+    built; training reads a whole version back in bulk. Target encodings are stored
+    per version beside the rows and applied as they are read, so a refresh that only
+    moved them need not rewrite the rows. Each write also publishes an indexed copy of
+    the table to `online_path` (patching the last copy for a small upsert), which
+    `lookup` keeps open read-only: the warehouse file stays free for the next refresh,
+    and a known listing is served without running build_features.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path = DEFAULT_DB,
+        online_path: str | Path | None = None,
+        keep_versions: int = KEEP_VERSIONS,
+        memory_limit: str | None = None,
+    ):
+        self.db_path = str(db_path)
+        self.online_path = Path(online_path or Path(db_path).with_name(ONLINE_FILE))
+        self.keep_versions = keep_versions
+        # caps DuckDB's buffer pool while writing (it spills past this); None = its default
+        self.memory_limit = memory_limit
+        self._reader = OnlineReader(self.online_path)
+        self._online_encodings: tuple[int, str, list[TargetEncoding]] | None = None
+
+    # ---------- offline: warehouse table ----------
+    def _ensure_table(self, con: duckdb.DuckDBPyConnection) -> None:
+        if not _has_table(con):
+            con.execute(
+                f"CREATE TABLE {FEATURE_TABLE} AS SELECT ''::VARCHAR AS pipeline_version, "
+                "now() AS _materialized_at, * FROM incoming LIMIT 0"
+            )
+            return
+        have = {r[0] for r in con.execute(f"DESCRIBE {FEATURE_TABLE}").fetchall()}
+        for col, dtype, *_ in con.execute("DESCRIBE incoming").fetchall():
+            if col not in have:
+                con.execute(f'ALTER TABLE {FEATURE_TABLE} ADD COLUMN "{col}" {dtype}')
+
+    def write(
+        self,
+        feat: pl.DataFrame | str | Path,
+        version: str,
+        encodings: Sequence[TargetEncoding] = (),
+    ) -> int:
+        """
+        Upsert `feat` (one row per item_id) under `version`, drop all but the newest
+        `keep_versions` versions and republish the online copy. `feat` may also be a
+        Parquet file or a directory of parts, which DuckDB streams in rather than it
+        being loaded here. With `encodings`, their columns are stored empty and the
+        encodings themselves replace those of `version`. Returns the number of rows
+        written.
+        """
+        if isinstance(feat, pl.DataFrame) and feat.is_empty():
+            return 0
+        self.online_path.parent.mkdir(parents=True, exist_ok=True)
+        config = {"memory_limit": self.memory_limit} if self.memory_limit else {}
+        con = duckdb.connect(self.db_path, config=config)
+        try:
+            if isinstance(feat, pl.DataFrame):
+                con.register("_feat", feat)
+                source = "_feat"
+            else:
+                path = Path(feat) / "*.parquet" if Path(feat).is_dir() else Path(feat)
+                quoted = str(path).replace("'", "''")
+                source = f"read_parquet('{quoted}', union_by_name = true)"
+            columns = {r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()}
+            emptied = [f'NULL::DOUBLE AS "{e.name}"' for e in encodings if e.name in columns]
+            replace = f" REPLACE ({', '.join(emptied)})" if emptied else ""
+            con.execute(f"CREATE TEMP VIEW incoming AS SELECT *{replace} FROM {source}")
+            rows = con.execute("SELECT count(*) FROM incoming").fetchone()[0]
+            if not rows:
+                return 0
+            con.execute("BEGIN TRANSACTION")
+            self._ensure_table(con)
+            con.execute(
+                f"DELETE FROM {FEATURE_TABLE} WHERE pipeline_version = ? "
+                "AND item_id IN (SELECT item_id FROM incoming)",
+                [version],
+            )
+            con.execute(
+                f"INSERT INTO {FEATURE_TABLE} BY NAME SELECT ? AS pipeline_version, "
+                "now() AS _materialized_at, * FROM incoming",
+                [version],
+            )
+            con.execute(
+                f"DELETE FROM {FEATURE_TABLE} WHERE pipeline_version NOT IN ("
+                f"SELECT pipeline_version FROM {FEATURE_TABLE} GROUP BY 1 "
+                "ORDER BY max(_materialized_at) DESC LIMIT ?)",
+                [self.keep_versions],
+            )
+            tables = {FEATURE_TABLE: ("item_id",)}
+            if encodings or _has_table(con, ENCODING_TABLE):
+                con.execute(
+                    f"CREATE TABLE IF NOT EXISTS {ENCODING_TABLE} "
+                    "(pipeline_version VARCHAR, encodings VARCHAR)"
+                )
+                if encodings:
+                    con.execute(
+                        f"DELETE FROM {ENCODING_TABLE} WHERE pipeline_version = ?", [version]
+                    )
+                    con.execute(
+                        f"INSERT INTO {ENCODING_TABLE} VALUES (?, ?)",
+                        [version, _dump_encodings(encodings)],
+                    )
+                con.execute(
+                    f"DELETE FROM {ENCODING_TABLE} WHERE pipeline_version NOT IN ("
+                    f"SELECT DISTINCT pipeline_version FROM {FEATURE_TABLE})"
+                )
+                tables[ENCODING_TABLE] = ("pipeline_version",)
+            con.execute("COMMIT")
+            total = con.execute(f"SELECT count(*) FROM {FEATURE_TABLE}").fetchone()[0]
+            # a small upsert patches the published copy; a bulk one rebuilds it
+            if rows * PATCH_SHARE > total or not self._patch_online(con, version, tables):
+                publish_tables(con, self.online_path, tables)
+        finally:
+            con.close()
+        return rows
+
+    def _patch_online(
+        self, con: duckdb.DuckDBPyConnection, version: str, tables: dict[str, tuple[str, ...]]
+    ) -> bool:
+        """
+        Apply the upsert just committed from `incoming` to a copy of the published file
+        and swap it in like `publish_tables` does, so a delta costs a file copy rather
+        than rebuilding the table and its index. False, with nothing published, when
+        there is no copy yet or its columns no longer match the table.
+        """
+        if not self.online_path.exists():
+            return False
+        tmp = self.online_path.with_name(self.online_path.name + ".tmp")
+        shutil.copyfile(self.online_path, tmp)
+        quoted = str(tmp).replace("'", "''")
+        con.execute(f"ATTACH '{quoted}' AS online")
+        try:
+            described = [
+                con.execute(f"DESCRIBE {db}{FEATURE_TABLE}").fetchall() for db in ("", "online.")
+            ]
+            patched = described[0] == described[1]
+            if patched:
+                con.execute("BEGIN TRANSACTION")
+                con.execute(
+                    f"DELETE FROM online.{FEATURE_TABLE} WHERE pipeline_version NOT IN ("
+                    f"SELECT DISTINCT pipeline_version FROM {FEATURE_TABLE}) "
+                    "OR (pipeline_version = ? AND item_id IN (SELECT item_id FROM incoming))",
+                    [version],
+                )
+                con.execute(
+                    f"INSERT INTO online.{FEATURE_TABLE} SELECT * FROM {FEATURE_TABLE} "
+                    "WHERE pipeline_version = ? AND item_id IN (SELECT item_id FROM incoming)",
+                    [version],
+                )
+                if ENCODING_TABLE in tables:
+                    con.execute(f"DROP TABLE IF EXISTS online.{ENCODING_TABLE}")
+                    con.execute(
+                        f"CREATE TABLE online.{ENCODING_TABLE} AS SELECT * FROM {ENCODING_TABLE}"
+                    )
+                con.execute("COMMIT")
+                # into the file itself: a WAL would not move with it below
+                con.execute("CHECKPOINT online")
+        finally:
+            con.execute("DETACH online")
+        if not patched:
+            tmp.unlink()
+            return False
+        os.replace(tmp, self.online_path)
+        return True
+
+    def _read_only(self) -> duckdb.DuckDBPyConnection | None:
+        if not Path(self.db_path).exists():
+            return None
+        con = duckdb.connect(self.db_path, read_only=True)
+        if not _has_table(con):
+            con.close()
+            return None
+        return con
+
+    def versions(self) -> list[str]:
+        """Pipeline versions in the table, newest first."""
+        con = self._read_only()
+        if con is None:
+            return []
+        try:
+            rows = con.execute(
+                f"SELECT pipeline_version FROM {FEATURE_TABLE} GROUP BY 1 "
+                "ORDER BY max(_materialized_at) DESC"
+            ).fetchall()
+        finally:
+            con.close()
+        return [r[0] for r in rows]
+
+    def read(self, version: str | None = None) -> pl.DataFrame:
+        """Every row of `version` (default: the newest), ordered by item_id."""
+        con = self._read_only()
+        if con is None:
+            return pl.DataFrame()
+        try:
+            if version is None:
+                latest = con.execute(
+                    f"SELECT pipeline_version FROM {FEATURE_TABLE} GROUP BY 1 "
+                    "ORDER BY max(_materialized_at) DESC LIMIT 1"
+                ).fetchone()
+                if latest is None:
+                    return pl.DataFrame()
+                version = latest[0]
+            df = con.execute(
+                f"SELECT * FROM {FEATURE_TABLE} WHERE pipeline_version = ? ORDER BY item_id",
+                [version],
+            ).pl()
+            encodings = []
+            if _has_table(con, ENCODING_TABLE):
+                encodings = _load_encodings(
+                    con.execute(
+                        f"SELECT encodings FROM {ENCODING_TABLE} WHERE pipeline_version = ?",
+                        [version],
+                    ).fetchone()
+                )
+        finally:
+            con.close()
+        return _from_table(df, encodings)
+
+    # ---------- online: point lookups ----------
+    def lookup(self, item_ids: Sequence[str], version: str) -> pl.DataFrame:
+        """
+        Stored rows for `item_ids` under `version`, in request order; ids with no row
+        are left out. Categoricals are encoded as of the latest write of `version`.
+        """
+        cur = self._reader.cursor() if item_ids else None
+        if cur is None:
+            return pl.DataFrame()
+        try:
+            # DuckDB only takes the item_id index for a lone equality predicate, so each
+            # id is its own query and the (at most keep_versions) rows are filtered here
+            parts = [
+                cur.execute(f"SELECT * FROM {FEATURE_TABLE} WHERE item_id = ?", [i]).pl()
+                for i in dict.fromkeys(item_ids)
+            ]
+            encodings = self._lookup_encodings(cur, version)
+        finally:
+            cur.close()
+        df = pl.concat(parts, how="vertical_relaxed").filter(pl.col("pipeline_version") == version)
+        return _from_table(df, encodings)
+
+    def _lookup_encodings(
+        self, cur: duckdb.DuckDBPyConnection, version: str
+    ) -> list[TargetEncoding]:
+        # read once per published copy and version, not on every lookup
+        cached = self._online_encodings
+        if cached is not None and cached[:2] == (self._reader.generation, version):
+            return cached[2]
+        encodings = []
+        if _has_table(cur, ENCODING_TABLE):
+            encodings = _load_encodings(
+                cur.execute(
+                    f"SELECT encodings FROM {ENCODING_TABLE} WHERE pipeline_version = ?",
+                    [version],
+                ).fetchone()
+            )
+        self._online_encodings = (self._reader.generation, version, encodings)
+        return encodings
+
+    def close(self) -> None:
+        self._reader.close()
@@ -1,38 +1,44 @@
 from __future__ import annotations
 
+import json
+import os
 import re
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any
 
+import numpy as np
 import polars as pl
+import scipy.sparse as sp
+
+WORD_PATTERN = r"[A-Za-z0-9]+"
+_WORD_RE = re.compile(WORD_PATTERN)
+
+# Titles per worker task when hashing in parallel; below this one process is faster
+HASH_CHUNK_ROWS = 50_000
 
 
 def _word_count(s: str) -> int:
     if not s:
         return 0
-    return len(re.findall(r"[A-Za-z0-9]+", s))
+    return len(_WORD_RE.findall(s))
 
 
-def text_features(df: pl.DataFrame) -> pl.DataFrame:
-    out = df.with_columns(
-        [
-            pl.col("title").cast(pl.Utf8, strict=False).str.len_chars().alias("title_len"),
-            pl.col("title").cast(pl.Utf8, strict=False).map_elements(_word_count).alias("title_wc"),
-            pl.col("title")
-            .cast(pl.Utf8, strict=False)
-            .str.contains(r"\d")
-            .fill_null(False)
-            .cast(pl.Int8)
-            .alias("title_has_digit"),
-        ]
-    )
-
-    if "brand" in out.columns:
-        out = out.with_columns(
+def text_exprs(columns: list[str]) -> list[pl.Expr]:
+    title = pl.col("title").cast(pl.Utf8, strict=False)
+    exprs = [
+        title.str.len_chars().alias("title_len"),
+        title.str.count_matches(WORD_PATTERN).cast(pl.Int64).alias("title_wc"),
+        title.str.contains(r"\d").fill_null(False).cast(pl.Int8).alias("title_has_digit"),
+    ]
+    if "brand" in columns:
+        exprs.append(
             pl.when(
                 (pl.col("brand").is_not_null())
                 & (
-                    pl.col("title")
-                    .cast(pl.Utf8, strict=False)
-                    .str.contains(
+                    title.str.contains(
                         pl.col("brand").cast(pl.Utf8, strict=False), literal=False, strict=False
                     )
                 )
@@ -41,4 +47,70 @@ def text_features(df: pl.DataFrame) -> pl.DataFrame:
             .otherwise(0)
             .alias("title_has_brand")
         )
-    return out
+    return exprs
+
+
+def text_features(df: pl.DataFrame) -> pl.DataFrame:
+    return df.with_columns(text_exprs(df.columns))
+
+
+@dataclass(frozen=True)
+class TitleHasher:
+    """
+    Hashed bag of lowercase title tokens and token bigrams.
+
+    Tokens are hashed straight into `n_features` columns (murmurhash3, stable across
+    processes and library versions), so there is no vocabulary to fit or keep in
+    memory and the same settings reproduce the same columns at inference time.
+    """
+
+    n_features: int = 2**12
+    ngram_max: int = 2
+
+    @cached_property
+    def _vectorizer(self) -> Any:
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        return HashingVectorizer(
+            n_features=self.n_features,
+            lowercase=True,
+            token_pattern=WORD_PATTERN,
+            ngram_range=(1, self.ngram_max),
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+
+    def transform(self, titles: Sequence[str | None], n_jobs: int = 1) -> sp.csr_matrix:
+        """
+        CSR matrix of token counts, one row per title (None -> empty row). With
+        `n_jobs` != 1 the titles are hashed in chunks on that many worker processes.
+        """
+        docs = [t or "" for t in titles]
+        vec = self._vectorizer
+        if n_jobs == 1 or len(docs) <= HASH_CHUNK_ROWS:
+            return vec.transform(docs).tocsr()
+        from joblib import Parallel, delayed
+
+        chunks = [docs[i : i + HASH_CHUNK_ROWS] for i in range(0, len(docs), HASH_CHUNK_ROWS)]
+        parts = Parallel(n_jobs=n_jobs)(delayed(vec.transform)(c) for c in chunks)
+        return sp.vstack(parts, format="csr")
+
+    def save(self, path: str | Path) -> Path:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(asdict(self), indent=2))
+        return p
+
+    @classmethod
+    def load(cls, path: str | Path) -> TitleHasher:
+        return cls(**json.loads(Path(path).read_text()))
+
+
+def hash_titles(
+    titles: pl.Series | Sequence[str | None], hasher: TitleHasher, n_jobs: int | None = None
+) -> sp.csr_matrix:
+    """Hashed title block for a whole column, spread over all cores by default."""
+    if isinstance(titles, pl.Series):
+        titles = titles.cast(pl.Utf8, strict=False).to_list()
+    return hasher.transform(titles, n_jobs=n_jobs or os.cpu_count() or 1)
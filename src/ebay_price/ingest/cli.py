@@ -1,58 +1,163 @@
 from __future__ import annotations
 
-from collections.abc import Iterable
+import time
+from collections.abc import Callable, Iterable
 from pathlib import Path
 from typing import Any
 
-from ebay_price.features.build_features import build_features, load_listings, save_outputs
-from ebay_price.ingest.load import ensure_warehouse, upsert_raw
-from ebay_price.ingest.normalize import to_polars, validate_rows
-from ebay_price.ingest.sources import read_csv, read_jsonl
+import duckdb
 
+from ebay_price.features.build_features import ENGINES
+from ebay_price.features.incremental import full_refresh, incremental_refresh
+from ebay_price.ingest.load import ensure_warehouse, upsert_raw, upsert_raw_batches
+from ebay_price.ingest.normalize import normalize_frame, to_polars, validate_frame, validate_rows
+from ebay_price.ingest.shards import Shard, ingest_shards, read_shard, resolve_shards
+from ebay_price.ingest.sources import chunked, read_listing_batches, read_rows
 
-def _rows_from_path(path: str | Path) -> Iterable[dict[str, Any]]:
-    p = Path(path)
-    if p.suffix.lower() == ".jsonl":
-        return read_jsonl(p)
-    if p.suffix.lower() == ".csv":
-        return read_csv(p)
-    raise SystemExit(f"Unsupported file type: {p.suffix}")
+# Rows read, validated and upserted at a time by a chunked ingest
+DEFAULT_INGEST_BATCH_ROWS = 50_000
+# rows: a dict per row through ListingRaw; columnar: the file read natively by DuckDB
+INGEST_READERS = ("rows", "columnar")
 
 
-def ingest_file(path: str | Path) -> int:
+def _print_progress(path: str | Path) -> Callable[[int], None]:
+    t0 = time.perf_counter()
+
+    def report(rows: int) -> None:
+        secs = time.perf_counter() - t0
+        print(f"{path}: {rows} rows upserted ({rows / max(secs, 1e-9):,.0f} rows/s)", flush=True)
+
+    return report
+
+
+def _print_shard(shard: Shard, rows: int) -> None:
+    print(f"{shard.path}: {rows} rows upserted", flush=True)
+
+
+def ingest_rows(
+    rows: Iterable[dict[str, Any]],
+    batch_rows: int = DEFAULT_INGEST_BATCH_ROWS,
+    progress: Callable[[int], None] | None = None,
+    before_commit: Callable[[duckdb.DuckDBPyConnection, int], None] | None = None,
+    db_path: str | Path | None = None,
+) -> int:
+    """
+    Validate, normalize and upsert raw listing dicts `batch_rows` at a time, all in one
+    transaction on the warehouse at `db_path` (default: load.WAREHOUSE). `rows` is
+    consumed lazily, so an iterator over a file is never held in memory whole.
+    `progress` and `before_commit` are `upsert_raw_batches`'.
+    """
+    ensure_warehouse(db_path)
+    batches = (to_polars(chunk) for chunk in chunked(validate_rows(rows), batch_rows))
+    return upsert_raw_batches(batches, progress, before_commit=before_commit, db_path=db_path)
+
+
+def ingest_file(
+    path: str | Path,
+    batch_rows: int | None = None,
+    progress: Callable[[int], None] | None = None,
+    reader: str = "rows",
+) -> int:
+    """
+    Validate, normalize and upsert the CSV / JSONL file at `path`. With `batch_rows`,
+    the file is streamed through in chunks of that many rows, all in one warehouse
+    transaction, so memory stays flat however large the file is; `progress` is then
+    called with the running row count after each chunk. The `columnar` reader parses
+    the file into typed columns without building Python objects per row.
+    """
+    if reader != "columnar" and batch_rows:
+        return ingest_rows(read_rows(path), batch_rows, progress)
     ensure_warehouse()
-    rows = validate_rows(_rows_from_path(path))
-    df = to_polars(rows)
-    count = upsert_raw(df)
-    return count
+    if not batch_rows:
+        return upsert_raw(read_shard(path, reader))
+    batches = (normalize_frame(validate_frame(b)) for b in read_listing_batches(path, batch_rows))
+    return upsert_raw_batches(batches, progress)
 
 
-def refresh_features() -> None:
-    df = load_listings()  # from DuckDB
-    if df.is_empty():
-        print("No listings in warehouse.")
-        return
-    feat = build_features(df)
-    save_outputs(feat)
-    print("Refreshed features from warehouse.")
+def refresh_features(
+    incremental: bool = False, batch_rows: int | None = None, engine: str = "polars"
+) -> None:
+    # Incremental merges rows ingested since the last refresh; full refits everything,
+    # streaming the warehouse in batches when `batch_rows` is set, or inside DuckDB
+    if incremental:
+        incremental_refresh(batch_rows=batch_rows, engine=engine)
+    else:
+        full_refresh(batch_rows=batch_rows, engine=engine)
 
 
 def main() -> None:
     import argparse
 
     p = argparse.ArgumentParser()
-    p.add_argument("--ingest", type=str, help="Path to CSV or JSONL file to ingest")
+    p.add_argument(
+        "--ingest",
+        type=str,
+        help="CSV or JSONL file to ingest, or a directory / glob of them to ingest as shards",
+    )
+    p.add_argument(
+        "--ingest-batch-rows",
+        type=int,
+        nargs="?",
+        const=DEFAULT_INGEST_BATCH_ROWS,
+        default=None,
+        help=f"With --ingest, stream the file in chunks of this many rows "
+        f"(default {DEFAULT_INGEST_BATCH_ROWS}) in one transaction, reporting progress",
+    )
+    p.add_argument(
+        "--ingest-reader",
+        choices=INGEST_READERS,
+        default="rows",
+        help="With --ingest, columnar parses the file natively with DuckDB",
+    )
+    p.add_argument(
+        "--ingest-workers",
+        type=int,
+        default=None,
+        help="With a directory / glob --ingest, processes parsing shards "
+        "(default: one per CPU but one)",
+    )
     p.add_argument(
         "--refresh-features", action="store_true", help="Rebuild processed features from warehouse"
     )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="With --refresh-features, only process listings ingested since the last refresh",
+    )
+    p.add_argument(
+        "--batch-rows",
+        type=int,
+        default=None,
+        help="With --refresh-features, stream the warehouse in batches of this many listings",
+    )
+    p.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="polars",
+        help="With --refresh-features, duckdb computes the features inside the warehouse",
+    )
     args = p.parse_args()
 
-    if args.ingest:
-        n = ingest_file(args.ingest)
+    if args.ingest and Path(args.ingest).is_file():
+        progress = _print_progress(args.ingest) if args.ingest_batch_rows else None
+        n = ingest_file(args.ingest, args.ingest_batch_rows, progress, args.ingest_reader)
         print(f"Ingested {n} rows from {args.ingest}")
+    elif args.ingest:
+        if args.ingest_batch_rows:
+            p.error("--ingest-batch-rows takes a single file; shards are upserted whole")
+        paths = resolve_shards(args.ingest)
+        if not paths:
+            p.error(f"no .jsonl / .csv files match {args.ingest}")
+        report = ingest_shards(paths, args.ingest_reader, args.ingest_workers, _print_shard)
+        print(
+            f"Ingested {report.rows} rows from {report.shards} files "
+            f"({report.skipped} already ingested)"
+        )
 
     if args.refresh_features:
-        refresh_features()
+        refresh_features(
+            incremental=args.incremental, batch_rows=args.batch_rows, engine=args.engine
+        )
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
@@ -31,13 +32,15 @@ class EbayClient:
         return []
 
     @staticmethod
-    def load_local_jsonl(path: str | Path) -> list[dict[str, Any]]:
-        path = Path(path)
-        items: list[dict[str, Any]] = []
-        with path.open("r", encoding="utf-8") as f:
+    def iter_local_jsonl(path: str | Path) -> Iterator[dict[str, Any]]:
+        """Raw listing dicts from a JSONL file, one line at a time."""
+        with Path(path).open("r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
-                items.append(json.loads(line))
-        return items
+                yield json.loads(line)
+
+    @staticmethod
+    def load_local_jsonl(path: str | Path) -> list[dict[str, Any]]:
+        return list(EbayClient.iter_local_jsonl(path))
@@ -7,13 +7,13 @@ from ebay_price.modeling.train_baselines import train_classification, train_regr
 
 
 @task
-def t_ingest(path: str) -> int:
-    return ingest_file(path)
+def t_ingest(path: str, batch_rows: int | None = None) -> int:
+    return ingest_file(path, batch_rows)
 
 
 @task
-def t_refresh_features() -> None:
-    refresh_features()
+def t_refresh_features(incremental: bool = False, batch_rows: int | None = None) -> None:
+    refresh_features(incremental=incremental, batch_rows=batch_rows)
 
 
 @task
@@ -27,10 +27,16 @@ def t_train_classification() -> None:
 
 
 @flow(name="eBay ETL + Train")
-def etl_train(path: str | None = None, do_classification: bool = True) -> None:
+def etl_train(
+    path: str | None = None,
+    do_classification: bool = True,
+    incremental: bool = False,
+    batch_rows: int | None = None,
+    ingest_batch_rows: int | None = None,
+) -> None:
     if path:
-        t_ingest(path)
-    t_refresh_features()
+        t_ingest(path, ingest_batch_rows)
+    t_refresh_features(incremental, batch_rows)
     t_train_regression()
     if do_classification:
         t_train_classification()
@@ -43,5 +49,14 @@ if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--path", type=str, default=None)
     p.add_argument("--no-clf", action="store_true")
+    p.add_argument("--incremental", action="store_true")
+    p.add_argument("--batch-rows", type=int, default=None)
+    p.add_argument("--ingest-batch-rows", type=int, default=None)
     args = p.parse_args()
-    etl_train(path=args.path, do_classification=not args.no_clf)
+    etl_train(
+        path=args.path,
+        do_classification=not args.no_clf,
+        incremental=args.incremental,
+        batch_rows=args.batch_rows,
+        ingest_batch_rows=args.ingest_batch_rows,
+    )
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 import argparse
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Any
 
+from ebay_price.ingest.cli import DEFAULT_INGEST_BATCH_ROWS, _print_progress, ingest_rows
 from ebay_price.ingest.ebay_client import EbayClient
-from ebay_price.ingest.normalize import normalize_item
-from ebay_price.ingest.writer import duckdb_upsert_listings, write_parquet
+from ebay_price.ingest.writer import snapshot_upserted
 from ebay_price.utils.settings import load_settings
 
 
@@ -16,31 +17,40 @@ def main():
     parser.add_argument("--input", type=str, help="Path to local JSONL when mode=local")
     parser.add_argument("--query", type=str, default="iphone")
     parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_INGEST_BATCH_ROWS,
+        help="Rows validated and upserted at a time, all in one transaction",
+    )
     args = parser.parse_args()
 
     cfg = load_settings()
     client = EbayClient(site=cfg.ebay__site)
 
-    raw_items: list[dict[str, Any]]
+    raw_items: Iterable[dict[str, Any]]
     if args.mode == "local":
         if not args.input:
             raise SystemExit("Provide --input path to a JSONL file in local mode.")
-        raw_items = EbayClient.load_local_jsonl(args.input)
+        # streamed a line at a time: the file is never read into memory whole
+        raw_items = EbayClient.iter_local_jsonl(args.input)
     elif args.mode == "completed":
         raw_items = client.list_completed(query=args.query, limit=args.limit)
     else:
         raw_items = client.list_active(query=args.query, limit=args.limit)
 
-    # Normalize
-    listings = [normalize_item(r) for r in raw_items if r]
-    # Write to Parquet (snapshot)
+    # Validate, normalize and upsert into the DuckDB warehouse in chunks, one transaction;
+    # the Parquet snapshot of what was upserted is written just before it commits
     parquet_path = Path(cfg.storage__parquet_bucket) / "listings_snapshot.parquet"
-    write_parquet(listings, parquet_path)
-
-    # Upsert into DuckDB warehouse
-    duckdb_upsert_listings(cfg.storage__duckdb_path, listings)
-
-    print(f"Ingested {len(listings)} records.")
+    n = ingest_rows(
+        (r for r in raw_items if r),
+        args.batch_rows,
+        _print_progress(args.input or args.mode),
+        before_commit=snapshot_upserted(parquet_path),
+        db_path=cfg.storage__duckdb_path,
+    )
+
+    print(f"Ingested {n} records.")
     print(f"Parquet: {parquet_path}")
     print(f"DuckDB:  {cfg.storage__duckdb_path}")
 
@@ -1,17 +1,27 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Iterable
 from pathlib import Path
 
 import duckdb
 import polars as pl
 
+from ebay_price.features.aggregates import (
+    aggregates_online_path,
+    publish_aggregates,
+    stage_touched_keys,
+    update_aggregates,
+)
+from ebay_price.features.chunked import DUCKDB_MEMORY_LIMIT
+
 WAREHOUSE = Path("data/artifacts/warehouse.duckdb")
 DDL = Path("warehouse/ddl.sql")
 
 
-def ensure_warehouse() -> None:
-    WAREHOUSE.parent.mkdir(parents=True, exist_ok=True)
-    con = duckdb.connect(str(WAREHOUSE))
+def ensure_warehouse(db_path: str | Path | None = None) -> None:
+    db_path = Path(db_path or WAREHOUSE)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect(str(db_path))
     try:
         con.execute(DDL.read_text())
         # Guarantee canonical table has _ingested_at (CTAS can drop defaults/cols in some versions)
@@ -21,126 +31,123 @@ def ensure_warehouse() -> None:
         con.close()
 
 
-def upsert_raw(df: pl.DataFrame) -> int:
-    if df.is_empty():
-        return 0
-
-    base_cols = [
-        "item_id",
-        "title",
-        "category_path",
-        "brand",
-        "model",
-        "condition",
-        "start_time",
-        "end_time",
-        "listing_type",
-        "start_price",
-        "shipping_cost",
-        "seller_username",
-        "seller_feedback_score",
-        "seller_positive_percent",
-        "watchers",
-        "bids",
-        "currency",
-    ]
-    cols_csv = ", ".join(base_cols)
-    cols_csv_s = ", ".join([f"s.{c}" for c in base_cols])
-
-    con = duckdb.connect(str(WAREHOUSE))
-    try:
-        # Stage incoming rows
-        con.register("stg", df.to_arrow())
-        con.execute("CREATE TEMP TABLE stg_raw AS SELECT * FROM stg")
+BASE_COLS = [
+    "item_id",
+    "title",
+    "category_path",
+    "brand",
+    "model",
+    "condition",
+    "start_time",
+    "end_time",
+    "listing_type",
+    "start_price",
+    "shipping_cost",
+    "seller_username",
+    "seller_feedback_score",
+    "seller_positive_percent",
+    "watchers",
+    "bids",
+    "currency",
+]
 
-        # Ensure canonical has _ingested_at (idempotent)
-        con.execute("ALTER TABLE listings ADD COLUMN IF NOT EXISTS _ingested_at TIMESTAMP")
 
-        # 1) UPDATE existing rows in raw_listings
-        con.execute(
-            """
-            UPDATE raw_listings AS t
-            SET
-                title                   = s.title,
-                category_path           = s.category_path,
-                brand                   = s.brand,
-                model                   = s.model,
-                condition               = s.condition,
-                start_time              = s.start_time,
-                end_time                = s.end_time,
-                listing_type            = s.listing_type,
-                start_price             = s.start_price,
-                shipping_cost           = s.shipping_cost,
-                seller_username         = s.seller_username,
-                seller_feedback_score   = s.seller_feedback_score,
-                seller_positive_percent = s.seller_positive_percent,
-                watchers                = s.watchers,
-                bids                    = s.bids,
-                currency                = s.currency,
-                _ingested_at            = now()
-            FROM stg_raw AS s
-            WHERE t.item_id = s.item_id
-            """
+def _merge_sql(table: str) -> str:
+    """Upsert the staged rows into `table` by item_id in one statement."""
+    cols_csv = ", ".join(BASE_COLS)
+    cols_csv_s = ", ".join([f"s.{c}" for c in BASE_COLS])
+    set_csv = ",\n            ".join(f"{c:<23} = s.{c}" for c in BASE_COLS[1:])
+    return f"""
+        MERGE INTO {table} AS t
+        USING stg_raw AS s
+        ON t.item_id = s.item_id
+        WHEN MATCHED THEN UPDATE SET
+            {set_csv},
+            _ingested_at            = now()
+        WHEN NOT MATCHED THEN INSERT (
+            {cols_csv}, _ingested_at
         )
-
-        # 2) INSERT new rows into raw_listings (DEFAULT fills _ingested_at)
-        con.execute(
-            f"""
-            INSERT INTO raw_listings (
-                {cols_csv}
-            )
-            SELECT
-                {cols_csv_s}
-            FROM stg_raw s
-            WHERE NOT EXISTS (
-                SELECT 1 FROM raw_listings t WHERE t.item_id = s.item_id
-            )
-            """
+        VALUES (
+            {cols_csv_s}, now()
         )
+        """
 
-        # 3) UPDATE listings (canonical)
-        con.execute(
-            """
-            UPDATE listings AS t
-            SET
-                title                   = s.title,
-                category_path           = s.category_path,
-                brand                   = s.brand,
-                model                   = s.model,
-                condition               = s.condition,
-                start_time              = s.start_time,
-                end_time                = s.end_time,
-                listing_type            = s.listing_type,
-                start_price             = s.start_price,
-                shipping_cost           = s.shipping_cost,
-                seller_username         = s.seller_username,
-                seller_feedback_score   = s.seller_feedback_score,
-                seller_positive_percent = s.seller_positive_percent,
-                watchers                = s.watchers,
-                bids                    = s.bids,
-                currency                = s.currency,
-                _ingested_at            = now()
-            FROM stg_raw AS s
-            WHERE t.item_id = s.item_id
-            """
-        )
 
-        # 4) INSERT new rows into listings (must supply _ingested_at explicitly)
-        con.execute(
-            f"""
-            INSERT INTO listings (
-                {cols_csv}, _ingested_at
-            )
-            SELECT
-                {cols_csv_s}, now()
-            FROM stg_raw s
-            WHERE NOT EXISTS (
-                SELECT 1 FROM listings t WHERE t.item_id = s.item_id
-            )
-            """
-        )
+def _upsert_batch(con: duckdb.DuckDBPyConnection, df: pl.DataFrame) -> int:
+    """Merge one frame of validated rows into raw_listings and listings on `con`."""
+    # An item_id repeated within the batch keeps its last row, as across two upserts
+    df = df.unique(subset="item_id", keep="last", maintain_order=True)
+
+    # Stage incoming rows as a view over the frame: a temp table replaced per batch
+    # would keep every batch's copy alive until the transaction commits
+    con.register("stg_raw", df.to_arrow())
+
+    # Keys whose seller / product aggregates this upsert changes (old and new values)
+    stage_touched_keys(con, "stg_raw")
 
-        cnt = con.execute("SELECT COUNT(*) FROM stg_raw").fetchone()[0]
-        return int(cnt)
+    # Update the rows already there and insert the rest: raw landing table, then canonical
+    con.execute(_merge_sql("raw_listings"))
+    con.execute(_merge_sql("listings"))
+
+    con.unregister("stg_raw")
+    return df.height
+
+
+def upsert_raw_batches(
+    batches: Iterable[pl.DataFrame],
+    progress: Callable[[int], None] | None = None,
+    con: duckdb.DuckDBPyConnection | None = None,
+    before_commit: Callable[[duckdb.DuckDBPyConnection, int], None] | None = None,
+    publish: bool = True,
+    db_path: str | Path | None = None,
+) -> int:
+    """
+    Upsert a stream of frames (e.g. `to_polars` over fixed-size chunks of a file) into
+    the warehouse in a single transaction, so memory follows the batch size rather than
+    the file size, and a failure part-way (a row that does not validate) leaves the
+    warehouse untouched. The aggregates of every touched key are recomputed once, at
+    the end. `progress` is called with the running row count after each batch. Returns
+    the rows upserted, counting an item_id repeated within a batch once. Pass `con` to
+    reuse an open warehouse connection across calls. `before_commit` runs inside the
+    transaction with the connection and row count, to record something atomically with
+    the rows; without `publish`, the caller publishes the aggregates when it is done.
+    `db_path` is the warehouse file (default WAREHOUSE); the aggregates are published
+    beside it.
+    """
+    db_path = db_path or WAREHOUSE
+    own = con is None
+    if own:
+        # capped so the open transaction's data spills instead of growing with the file
+        con = duckdb.connect(str(db_path), config={"memory_limit": DUCKDB_MEMORY_LIMIT})
+    try:
+        # Ensure canonical has _ingested_at (idempotent)
+        con.execute("ALTER TABLE listings ADD COLUMN IF NOT EXISTS _ingested_at TIMESTAMP")
+        con.execute("BEGIN TRANSACTION")
+        try:
+            count = 0
+            for df in batches:
+                if df.is_empty():
+                    continue
+                count += _upsert_batch(con, df)
+                if progress is not None:
+                    progress(count)
+            # 5) Recompute the aggregates of the touched keys
+            update_aggregates(con)
+            if before_commit is not None:
+                before_commit(con, count)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        if count and publish:
+            publish_aggregates(con, aggregates_online_path(db_path))
+        return count
     finally:
-        con.close()
+        if own:
+            con.close()
+
+
+def upsert_raw(df: pl.DataFrame, con: duckdb.DuckDBPyConnection | None = None) -> int:
+    if df.is_empty():
+        return 0
+    return upsert_raw_batches([df], con=con)
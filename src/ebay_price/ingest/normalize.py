@@ -6,6 +6,8 @@ from typing import Any
 import polars as pl
 
 from ebay_price.ingest.schema import ListingRaw
+from ebay_price.ingest.sources import TYPE_ERRORS, TYPE_ERRORS_COL
+from ebay_price.validation.rules import Rule, describe_rejects, model_rules, split_rejects
 
 
 def validate_rows(rows: Iterable[dict[str, Any]]):
@@ -14,9 +16,28 @@ def validate_rows(rows: Iterable[dict[str, Any]]):
         yield ListingRaw(**r).model_dump()
 
 
+def validate_frame(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    `validate_rows` for a natively read frame: ListingRaw's constraints, column-wise,
+    plus the values the columnar readers could not convert to their column's type.
+    """
+    rules = model_rules(ListingRaw, df.schema)
+    if TYPE_ERRORS_COL in df.columns:
+        errors = pl.col(TYPE_ERRORS_COL)
+        rules += [Rule(reason, errors.list.contains(reason)) for reason in TYPE_ERRORS.values()]
+    _, rejects = split_rejects(df, rules)
+    if rejects.height:
+        raise ValueError(f"{rejects.height} rows failed validation:\n{describe_rejects(rejects)}")
+    return df.drop(TYPE_ERRORS_COL, strict=False)
+
+
 def to_polars(rows: Iterable[dict]) -> pl.DataFrame:
     """Normalize incoming rows to a polars DataFrame with sane types."""
-    df = pl.DataFrame(list(rows))
+    return normalize_frame(pl.DataFrame(list(rows)))
+
+
+def normalize_frame(df: pl.DataFrame) -> pl.DataFrame:
+    """`to_polars` for rows already read into a frame (the columnar readers)."""
     if df.is_empty():
         return df
 
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+import duckdb
+import polars as pl
+
+from ebay_price.features.aggregates import aggregates_online_path, publish_aggregates
+from ebay_price.features.chunked import DUCKDB_MEMORY_LIMIT
+from ebay_price.ingest import load
+from ebay_price.ingest.normalize import normalize_frame, to_polars, validate_frame, validate_rows
+from ebay_price.ingest.sources import read_listings, read_rows
+
+# Files a directory or glob given to `ingest.cli --ingest` contributes
+SHARD_SUFFIXES = (".jsonl", ".csv")
+# Warehouse table of the shards already ingested (see warehouse/ddl.sql)
+MANIFEST_TABLE = "ingest_manifest"
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One input file, as the manifest identifies it."""
+
+    path: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class ShardReport:
+    shards: int = 0
+    skipped: int = 0
+    rows: int = 0
+
+
+def resolve_shards(spec: str | Path) -> list[Path]:
+    """
+    The files `spec` names: a file, every .jsonl / .csv under a directory, or those a
+    glob pattern (`**` included) matches. Sorted by path, the order they are upserted in,
+    so the later shard wins for an item_id that appears in several.
+    """
+    p = Path(spec)
+    if p.is_file():
+        return [p.resolve()]
+    found = p.rglob("*") if p.is_dir() else map(Path, glob.glob(str(spec), recursive=True))
+    return sorted(f.resolve() for f in found if f.is_file() and f.suffix.lower() in SHARD_SUFFIXES)
+
+
+def file_sha256(path: str | Path) -> str:
+    with Path(path).open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def default_workers() -> int:
+    """One parsing process per CPU but the one the warehouse writer needs."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def read_shard(path: str | Path, reader: str = "rows") -> pl.DataFrame:
+    """The CSV / JSONL file at `path`, validated and normalized into one frame."""
+    if reader == "columnar":
+        return normalize_frame(validate_frame(read_listings(path)))
+    return to_polars(validate_rows(read_rows(path)))
+
+
+def _parse_shard(
+    path: str, reader: str, ingested: frozenset[str]
+) -> tuple[Shard, pl.DataFrame | None]:
+    """Identify the shard at `path` and, unless `ingested` has its hash, read it."""
+    shard = Shard(path, Path(path).stat().st_size, file_sha256(path))
+    if shard.sha256 in ingested:
+        return shard, None
+    return shard, read_shard(path, reader)
+
+
+def _parsed_shards(
+    jobs: Sequence[tuple[str, str, frozenset[str]]], workers: int
+) -> Iterator[tuple[Shard, pl.DataFrame | None]]:
+    """`_parse_shard` over `jobs`, in order, up to `workers` of them at a time."""
+    if workers <= 1:
+        for job in jobs:
+            yield _parse_shard(*job)
+        return
+    # spawn: forking a process that already runs polars / DuckDB threads can deadlock
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        todo = iter(jobs)
+        # a bounded window, so only a few parsed shards ever wait for the writer
+        pending: deque[Future] = deque(
+            pool.submit(_parse_shard, *j) for j in islice(todo, 2 * workers)
+        )
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(pool.submit(_parse_shard, *j) for j in islice(todo, 1))
+            yield result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def ingest_shards(
+    paths: Sequence[str | Path],
+    reader: str = "rows",
+    workers: int | None = None,
+    progress: Callable[[Shard, int], None] | None = None,
+) -> ShardReport:
+    """
+    Ingest many CSV / JSONL files: `workers` processes read, validate and hash them
+    while this one upserts them into the warehouse in path order, over one connection.
+    Each shard commits together with its manifest row (path, size, sha256, rows), so a
+    re-run skips the shards already in, including after a crash part-way through, and a
+    file that changed since is ingested again. `progress` is called after each shard.
+    """
+    load.ensure_warehouse()
+    report = ShardReport()
+    con = duckdb.connect(str(load.WAREHOUSE), config={"memory_limit": DUCKDB_MEMORY_LIMIT})
+    try:
+        ingested: dict[str, set[str]] = {}
+        for path, digest in con.execute(f"SELECT path, sha256 FROM {MANIFEST_TABLE}").fetchall():
+            ingested.setdefault(path, set()).add(digest)
+        jobs = [(str(p), reader, frozenset(ingested.get(str(p), ()))) for p in map(Path, paths)]
+        for shard, df in _parsed_shards(jobs, workers or default_workers()):
+            if df is None:
+                report.skipped += 1
+                continue
+
+            def record(con: duckdb.DuckDBPyConnection, rows: int, shard: Shard = shard) -> None:
+                con.execute(
+                    f"INSERT INTO {MANIFEST_TABLE} (path, size, sha256, rows) VALUES (?, ?, ?, ?)",
+                    [shard.path, shard.size, shard.sha256, rows],
+                )
+
+            rows = load.upsert_raw_batches([df], con=con, before_commit=record, publish=False)
+            report.shards += 1
+            report.rows += rows
+            if progress is not None:
+                progress(shard, rows)
+        if report.rows:
+            publish_aggregates(con, aggregates_online_path(load.WAREHOUSE))
+        return report
+    finally:
+        con.close()
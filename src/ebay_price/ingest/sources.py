@@ -2,9 +2,53 @@ from __future__ import annotations
 
 import csv
 import json
-from collections.abc import Iterator
+import types
+from collections.abc import Iterable, Iterator
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, TypeVar, get_args
+
+import duckdb
+import polars as pl
+
+from ebay_price.features.chunked import iter_batches
+from ebay_price.ingest.schema import ListingRaw
+
+T = TypeVar("T")
+
+_SQL_TYPES = {str: "VARCHAR", float: "DOUBLE", int: "BIGINT"}
+
+
+def _listing_raw_columns() -> dict[str, str]:
+    columns = {}
+    for name, info in ListingRaw.model_fields.items():
+        ann = info.annotation
+        if isinstance(ann, types.UnionType):
+            ann = next(a for a in get_args(ann) if a is not type(None))
+        columns[name] = _SQL_TYPES[ann]
+    return columns
+
+
+# ListingRaw's fields as DuckDB types: the columns, in order, the columnar readers yield
+LISTING_RAW_COLUMNS = _listing_raw_columns()
+# Extra column of the columnar readers: why a row's values did not convert to those types
+TYPE_ERRORS_COL = "_type_errors"
+_TYPE_NAMES = {"VARCHAR": "a string", "DOUBLE": "a number", "BIGINT": "an integer"}
+TYPE_ERRORS = {c: f"{c} is not {_TYPE_NAMES[t]}" for c, t in LISTING_RAW_COLUMNS.items()}
+
+
+def read_rows(path: str | Path) -> Iterator[dict[str, Any]]:
+    """The rows of the CSV / JSONL file at `path`, as dicts."""
+    p = Path(path)
+    if p.suffix.lower() == ".jsonl":
+        return read_jsonl(p)
+    if p.suffix.lower() == ".csv":
+        return read_csv(p)
+    raise SystemExit(f"Unsupported file type: {p.suffix}")
+
+
+def _literal(value: object) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
 
 
 def read_jsonl(path: str | Path) -> Iterator[dict[str, Any]]:
@@ -23,3 +67,106 @@ def read_csv(path: str | Path) -> Iterator[dict[str, Any]]:
         reader = csv.DictReader(f)
         for row in reader:
             yield dict(row)
+
+
+def _from_text(text: str, sql_type: str) -> str:
+    """`text` converted to `sql_type` as pydantic would, or NULL where it would refuse."""
+    if sql_type == "DOUBLE":
+        return f"TRY_CAST(trim({text}) AS DOUBLE)"
+    if sql_type == "BIGINT":
+        # a plain CAST would round '2.6' to 3 and take '1e3'; the pattern is only matched
+        # against what does not read back as the same integer
+        n = f"TRY_CAST({text} AS BIGINT)"
+        return (
+            f"CASE WHEN CAST({n} AS VARCHAR) = trim({text}) THEN {n} "
+            f"WHEN regexp_full_match(trim({text}), '[+-]?[0-9]+(_[0-9]+)*(\\.0+)?') "
+            f"THEN TRY_CAST(regexp_replace(trim({text}), '\\.0+$', '') AS BIGINT) END"
+        )
+    return text
+
+
+def _from_json(col: str, sql_type: str) -> str:
+    """The JSON value `col` converted to `sql_type` as pydantic would, or NULL."""
+    kind = f"json_type({col})"
+    if sql_type == "VARCHAR":
+        # pydantic does not turn a number into a string
+        return f"CASE WHEN {kind} = 'VARCHAR' THEN {col} ->> '$' END"
+    whole = f"TRY_CAST({col} AS DOUBLE)"
+    typed = (
+        f"CASE WHEN {whole} = floor({whole}) THEN TRY_CAST({whole} AS BIGINT) END"
+        if sql_type == "BIGINT"
+        else whole
+    )
+    text = f"({col} ->> '$')"
+    return (
+        f"CASE WHEN {kind} = 'VARCHAR' THEN {_from_text(text, sql_type)} "
+        f"WHEN {kind} = 'DOUBLE' THEN {typed} ELSE TRY_CAST({col} AS {sql_type}) END"
+    )
+
+
+def listings_query(con: duckdb.DuckDBPyConnection, path: str | Path) -> str:
+    """
+    A query reading the JSONL / CSV file at `path` natively, as the ListingRaw columns
+    with their types: fields it does not have are null and extra ones are dropped, like
+    `validate_rows` does. The values are read untyped and converted as pydantic would;
+    a value it would refuse (3.7 watchers, a numeric title) is null instead, and named in
+    the TYPE_ERRORS_COL list of its row, for `normalize.validate_frame` to reject.
+    """
+    p = Path(path)
+    suffix = p.suffix.lower()
+    if suffix == ".jsonl":
+        columns = ", ".join(f"{_literal(c)}: 'JSON'" for c in LISTING_RAW_COLUMNS)
+        src = f"read_json({_literal(p)}, format = 'newline_delimited', columns = {{{columns}}})"
+        present = set(LISTING_RAW_COLUMNS)
+        convert = _from_json
+    elif suffix == ".csv":
+        # everything as text first, so ids that look numeric stay as written
+        src = f"read_csv({_literal(p)}, header = true, all_varchar = true)"
+        present = {r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {src}").fetchall()}
+        convert = _from_text
+    else:
+        raise ValueError(f"Unsupported file type: {p.suffix}")
+    typed = {
+        c: convert(f'"{c}"', t) if c in present else f"NULL::{t}"
+        for c, t in LISTING_RAW_COLUMNS.items()
+    }
+    # a JSON null is already NULL, so a non-null value that converted to NULL is refused
+    errors = [
+        f'CASE WHEN "{c}" IS NOT NULL AND "_{c}" IS NULL THEN {_literal(TYPE_ERRORS[c])} END'
+        for c in LISTING_RAW_COLUMNS
+        if c in present
+    ]
+    return (
+        "SELECT "
+        + ", ".join(f'"_{c}" AS "{c}"' for c in LISTING_RAW_COLUMNS)
+        + f", list_filter([{', '.join(errors)}]::VARCHAR[], e -> e IS NOT NULL)"
+        + f" AS {TYPE_ERRORS_COL}"
+        + " FROM (SELECT *, "
+        + ", ".join(f'{v} AS "_{c}"' for c, v in typed.items())
+        + f" FROM {src})"
+    )
+
+
+def read_listings(path: str | Path) -> pl.DataFrame:
+    """The file at `path` read whole by `listings_query`."""
+    con = duckdb.connect()
+    try:
+        return con.execute(listings_query(con, path)).pl()
+    finally:
+        con.close()
+
+
+def read_listing_batches(path: str | Path, batch_rows: int) -> Iterator[pl.DataFrame]:
+    """The file at `path` streamed by `listings_query` as frames of at most `batch_rows` rows."""
+    con = duckdb.connect()
+    try:
+        yield from iter_batches(con, listings_query(con, path), batch_rows)
+    finally:
+        con.close()
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Consecutive lists of at most `size` items, read lazily from `items`."""
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
@@ -7,6 +8,14 @@ import duckdb
 import polars as pl
 from sqlalchemy import create_engine, text
 
+from ebay_price.features.aggregates import (
+    aggregates_online_path,
+    publish_aggregates,
+    stage_touched_keys,
+    update_aggregates,
+)
+from ebay_price.ingest.sources import chunked
+
 
 def write_parquet(records: list[dict[str, Any]], parquet_path: str | Path) -> None:
     if not records:
@@ -17,6 +26,30 @@ def write_parquet(records: list[dict[str, Any]], parquet_path: str | Path) -> No
     df.write_parquet(parquet_path)
 
 
+def snapshot_upserted(
+    parquet_path: str | Path,
+) -> Callable[[duckdb.DuckDBPyConnection, int], None]:
+    """
+    A `before_commit` hook for `load.upsert_raw_batches` that writes the rows of the
+    upsert to `parquet_path`. Every row it merged carries the transaction's now() as
+    _ingested_at, so DuckDB copies them straight from the warehouse, without holding
+    them in memory.
+    """
+    parquet_path = Path(parquet_path)
+
+    def snapshot(con: duckdb.DuckDBPyConnection, rows: int) -> None:
+        if not rows:
+            return
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        quoted = str(parquet_path).replace("'", "''")  # COPY takes no bound parameters
+        con.execute(
+            "COPY (SELECT * EXCLUDE (_ingested_at) FROM raw_listings WHERE _ingested_at = now()) "
+            f"TO '{quoted}' (FORMAT parquet)"
+        )
+
+    return snapshot
+
+
 def duckdb_upsert_listings(duckdb_path: str | Path, listings: list[dict[str, Any]]) -> None:
     if not listings:
         return
@@ -50,12 +83,17 @@ def duckdb_upsert_listings(duckdb_path: str | Path, listings: list[dict[str, Any
         )
         df = pl.from_dicts(listings)
         con.register("incoming_df", df.to_pandas())  # register as table
+        con.execute("BEGIN TRANSACTION")
+        stage_touched_keys(con, "incoming_df")
         con.execute(
             """
             INSERT OR REPLACE INTO listings
             SELECT * FROM incoming_df;
         """
         )
+        update_aggregates(con)
+        con.execute("COMMIT")
+        publish_aggregates(con, aggregates_online_path(duckdb_path))
     finally:
         con.close()
 
@@ -66,13 +104,10 @@ def postgres_load_staging_and_merge(pg_url: str, raw_jsonl_path: str | Path) ->
     engine = create_engine(pg_url)
     raw_jsonl_path = Path(raw_jsonl_path)
 
-    with engine.begin() as conn:
-        # staging insert
-        lines = [
-            line for line in raw_jsonl_path.read_text(encoding="utf-8").splitlines() if line.strip()
-        ]
-        for chunk_start in range(0, len(lines), 1000):
-            chunk = lines[chunk_start : chunk_start + 1000]
+    with engine.begin() as conn, raw_jsonl_path.open("r", encoding="utf-8") as f:
+        # staging insert, streaming the file 1000 lines at a time
+        lines = (line.rstrip("\r\n") for line in f if line.strip())
+        for chunk in chunked(lines, 1000):
             values = ",".join([f"('{line}')" for line in chunk])
             conn.execute(text(f"INSERT INTO staging_listings (raw_json) VALUES {values};"))
 
@@ -1,18 +1,43 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import polars as pl
 from sklearn.model_selection import train_test_split
 
+from ebay_price.features.categorical import TargetEncoding
+from ebay_price.features.dtypes import compact_dtypes, to_float32
+from ebay_price.features.parts import scan_parts
+
 PROCESSED_DIR = Path("data/processed")
 
 
-def load_train(path: str | None = None) -> pl.DataFrame:
+def load_train(path: str | None = None, encodings: Sequence[TargetEncoding] = ()) -> pl.DataFrame:
+    """
+    train.parquet with each listing's newest row; pass the feature state's `encodings`
+    to bring rows appended by earlier incremental refreshes up to date.
+    """
     p = Path(path) if path else PROCESSED_DIR / "train.parquet"
-    if not p.exists():
+    train = scan_parts(p, encodings)
+    if train is None:
         raise FileNotFoundError(f"Training parquet not found: {p}")
-    return pl.read_parquet(p)
+    # a no-op for current outputs; narrows a train.parquet written before compaction
+    return compact_dtypes(train.collect())
+
+
+def load_train_from_store(db_path: str | None = None, version: str | None = None) -> pl.DataFrame:
+    """The same supervised set, read in bulk from the warehouse feature store (newest version)."""
+    from ebay_price.features.build_features import training_frame
+    from ebay_price.features.store import DEFAULT_DB, FeatureStore
+
+    feat = FeatureStore(db_path or DEFAULT_DB).read(version)
+    train = training_frame(feat) if not feat.is_empty() else None
+    if train is None:
+        raise FileNotFoundError(f"No training rows in the feature store at {db_path or DEFAULT_DB}")
+    return train
 
 
 def feature_target_split(
@@ -46,18 +71,20 @@ def feature_target_split(
     return X, y
 
 
-def to_numpy(df: pl.DataFrame):
-    return df.to_pandas().fillna(0).values  # simple and compatible with most estimators
+def to_numpy(df: pl.DataFrame) -> np.ndarray:
+    # float32, the dtype the API's compiled plan and ONNX sessions feed the models
+    return to_float32(df)
 
 
 def train_val_split(
-    X: pl.DataFrame,
+    X: pl.DataFrame | Any,
     y: pl.Series,
     test_size: float = 0.2,
     random_state: int = 42,
     stratify: bool = False,
 ):
-    X_np = X.to_pandas().fillna(0).values
+    # a prebuilt (possibly sparse) design matrix is split as-is
+    X_np = to_numpy(X) if isinstance(X, pl.DataFrame) else X
     y_np = y.to_pandas().values
     strat = y_np if stratify else None
     X_tr, X_va, y_tr, y_va = train_test_split(
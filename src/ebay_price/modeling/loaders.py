@@ -6,6 +6,8 @@ from pathlib import Path
 import joblib
 import polars as pl
 
+from ebay_price.features.state import FeatureState
+
 ART = Path("data/artifacts/models")
 
 
@@ -20,6 +22,12 @@ def load_reg_model_and_columns() -> tuple[object, list[str], str]:
     return model, cols, mpath.name
 
 
+def load_feature_state() -> FeatureState | None:
+    """Load the feature state saved with the regression model, if present."""
+    path = ART / "reg_feature_state.json"
+    return FeatureState.load(path) if path.exists() else None
+
+
 def load_processed_features() -> pl.DataFrame:
     """Load processed training features (the same the model trained on)."""
     from ebay_price.features.build_features import build_features, load_listings
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import scipy.sparse as sp
+
+# Max |joblib - onnx| allowed on the validation split before an export is discarded.
+# ONNX runs the trees in float32, so a row sitting on a split threshold can land on
+# the other side; the tolerances are relative to the prediction scale.
+REG_PARITY_RTOL = 1e-3
+CLF_PARITY_ATOL = 1e-3
+# Validation rows compared; sparse designs (hashed titles) are densified for onnxruntime
+PARITY_MAX_ROWS = 10_000
+
+
+def onnx_path(joblib_path: Path) -> Path:
+    """The ONNX artifact that sits next to a joblib model (`reg_lightgbm.onnx`, ...)."""
+    return joblib_path.with_suffix(".onnx")
+
+
+def to_onnx(model: Any, n_features: int) -> bytes:
+    """Serialize a fitted LightGBM or scikit-learn model to an ONNX graph (float32 input)."""
+    from lightgbm import LGBMModel
+
+    if isinstance(model, LGBMModel):
+        from onnxmltools import convert_lightgbm
+        from onnxmltools.convert.common.data_types import FloatTensorType
+
+        onx = convert_lightgbm(
+            model,
+            initial_types=[("input", FloatTensorType([None, n_features]))],
+            zipmap=False,
+            target_opset=15,
+        )
+    else:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+
+        options = {id(model): {"zipmap": False}} if hasattr(model, "predict_proba") else None
+        onx = convert_sklearn(
+            model,
+            initial_types=[("input", FloatTensorType([None, n_features]))],
+            options=options,
+            target_opset=15,
+        )
+    return onx.SerializeToString()
+
+
+def parity(model: Any, onnx_bytes: bytes, X: np.ndarray) -> dict[str, Any]:
+    """
+    Compare the joblib model with its ONNX export on `X` (the validation split).
+    Regressors are compared on `predict`, classifiers on the positive-class probability.
+    """
+    from ebay_price.api.backends import OnnxModel
+
+    onx = OnnxModel(onnx_bytes)
+    if hasattr(model, "predict_proba"):
+        ref = np.asarray(model.predict_proba(X), dtype=float)[:, 1]
+        got = onx.predict_proba(X)[:, 1]
+        tol = np.full_like(ref, CLF_PARITY_ATOL)
+    else:
+        ref = np.asarray(model.predict(X), dtype=float)
+        got = onx.predict(X)
+        tol = np.maximum(REG_PARITY_RTOL * np.abs(ref), REG_PARITY_RTOL)
+    err = np.abs(ref - got)
+    return {
+        "rows": int(len(X)),
+        "max_abs_err": float(err.max()) if len(err) else 0.0,
+        "rows_over_tol": int((err > tol).sum()),
+        "ok": bool((err <= tol).all()),
+    }
+
+
+def export_onnx(model: Any, joblib_path: Path, X_val: Any) -> dict[str, Any]:
+    """
+    Write `<model>.onnx` next to `joblib_path` if the export matches the joblib model on
+    the validation split; otherwise remove any stale export so the API keeps using joblib.
+    Returns the parity report (or the reason the export was skipped) for the metrics file.
+    """
+    out = onnx_path(joblib_path)
+    X_val = X_val[:PARITY_MAX_ROWS]
+    if sp.issparse(X_val):
+        X_val = X_val.toarray()
+    try:
+        onnx_bytes = to_onnx(model, X_val.shape[1])
+        report = parity(model, onnx_bytes, X_val)
+    except ImportError as e:  # onnxmltools / skl2onnx / onnxruntime are optional
+        out.unlink(missing_ok=True)
+        return {"ok": False, "skipped": f"missing dependency: {e.name}"}
+    except Exception as e:  # an unsupported model must not fail the training run
+        out.unlink(missing_ok=True)
+        print(f"[onnx] could not export {out.name}: {e}")
+        return {"ok": False, "skipped": f"export failed: {e}"}
+    if report["ok"]:
+        out.write_bytes(onnx_bytes)
+    else:
+        out.unlink(missing_ok=True)
+        print(f"[onnx] {out.name} failed parity, not written: {report}")
+    return report
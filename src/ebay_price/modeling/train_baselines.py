@@ -6,26 +6,82 @@ from pathlib import Path
 import joblib
 import numpy as np
 import polars as pl
+import scipy.sparse as sp
 from lightgbm import LGBMClassifier, LGBMRegressor
 from sklearn.linear_model import LinearRegression, LogisticRegression
 
-from ebay_price.modeling.datasets import feature_target_split, load_train, train_val_split
+from ebay_price.features.categorical import TargetEncoding
+from ebay_price.features.state import FEATURE_STATE_PATH, FeatureState
+from ebay_price.features.text import TitleHasher, hash_titles
+from ebay_price.modeling.datasets import (
+    feature_target_split,
+    load_train,
+    load_train_from_store,
+    to_numpy,
+    train_val_split,
+)
 from ebay_price.modeling.metrics import classification_metrics, regression_metrics
+from ebay_price.modeling.onnx_export import export_onnx
 
 ARTIFACTS_DIR = Path("data/artifacts/models")
 ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def train_regression(target: str = "final_price") -> None:
-    df = load_train()
+def _design_matrix(df: pl.DataFrame, X: pl.DataFrame, task: str, title_hash_features: int):
+    """
+    The dense feature columns, plus the hashed title block when `title_hash_features` > 0.
+    The hasher settings are saved next to the model so inference appends the same block.
+    """
+    hasher_path = ARTIFACTS_DIR / f"{task}_title_hashing.json"
+    if title_hash_features <= 0 or "title" not in df.columns:
+        if title_hash_features > 0:
+            print("[train] no title column in training data; skipping hashed title features")
+        hasher_path.unlink(missing_ok=True)
+        return X
+    hasher = TitleHasher(n_features=title_hash_features)
+    block = hash_titles(df.get_column("title"), hasher)
+    hasher.save(hasher_path)
+    return sp.hstack([sp.csr_matrix(to_numpy(X)), block], format="csr")
+
+
+def _read_feature_state() -> str | None:
+    """The feature state the current training set was built with, read as saved."""
+    return FEATURE_STATE_PATH.read_text() if FEATURE_STATE_PATH.exists() else None
+
+
+def _encodings(state: str | None) -> list[TargetEncoding]:
+    """The target encodings of `state`, which rows of older train.parquet parts lag."""
+    return FeatureState.from_dict(json.loads(state)).target_encodings if state else []
+
+
+def _save_feature_state(task: str, state: str | None) -> None:
+    """
+    Copy `state` (from `_read_feature_state`) into the model artifacts, where the API
+    loads it with the `task` model; without one, drop a copy left by an older run.
+    """
+    path = ARTIFACTS_DIR / f"{task}_feature_state.json"
+    if state is None:
+        print(f"[train] no {FEATURE_STATE_PATH}; the API will fit features per request")
+        path.unlink(missing_ok=True)
+        return
+    path.write_text(state)
+
+
+def train_regression(
+    target: str = "final_price", title_hash_features: int = 0, from_store: bool = False
+) -> None:
+    # read with the training set, before a later feature build can replace either
+    state = _read_feature_state()
+    df = load_train_from_store() if from_store else load_train(encodings=_encodings(state))
     if target not in df.columns:
         raise SystemExit(f"Target '{target}' not in training data.")
     X, y = feature_target_split(df, target)
 
     # Persist training feature columns for inference alignment
     (ARTIFACTS_DIR / "reg_feature_columns.json").write_text(json.dumps(X.columns, indent=2))
+    _save_feature_state("reg", state)
 
-    X_tr, X_va, y_tr, y_va = train_val_split(X, y)
+    X_tr, X_va, y_tr, y_va = train_val_split(_design_matrix(df, X, "reg", title_hash_features), y)
 
     # If the training set is tiny, tree models cannot fit; measure size safely
     n_train = getattr(y_tr, "shape", None)[0] if hasattr(y_tr, "shape") else len(y_tr)
@@ -38,6 +94,8 @@ def train_regression(target: str = "final_price") -> None:
     m_lr = regression_metrics(y_va, yhat)
 
     metrics_out: dict[str, object] = {"linear": m_lr}
+    # ONNX exports are only kept when they match the joblib model on the validation split
+    onnx_parity: dict[str, object] = {}
 
     # LightGBM baseline (only when training set has >= 2 rows)
     if not tiny_train:
@@ -55,17 +113,24 @@ def train_regression(target: str = "final_price") -> None:
         m_lgbm = regression_metrics(y_va, yhat_l)
         metrics_out["lightgbm"] = m_lgbm
         joblib.dump(lgbm, ARTIFACTS_DIR / "reg_lightgbm.joblib")
+        onnx_parity["lightgbm"] = export_onnx(lgbm, ARTIFACTS_DIR / "reg_lightgbm.joblib", X_va)
     else:
         metrics_out["lightgbm"] = "skipped: training set < 2 rows"
 
     # Save artifacts
     joblib.dump(lr, ARTIFACTS_DIR / "reg_linear.joblib")
+    onnx_parity["linear"] = export_onnx(lr, ARTIFACTS_DIR / "reg_linear.joblib", X_va)
+    metrics_out["onnx_parity"] = onnx_parity
     (ARTIFACTS_DIR / "reg_metrics.json").write_text(json.dumps(metrics_out, indent=2))
     print("Regression metrics:", metrics_out)
 
 
-def train_classification(target: str = "sold") -> None:
-    df = load_train()
+def train_classification(
+    target: str = "sold", title_hash_features: int = 0, from_store: bool = False
+) -> None:
+    # read with the training set, before a later feature build can replace either
+    state = _read_feature_state()
+    df = load_train_from_store() if from_store else load_train(encodings=_encodings(state))
     if target not in df.columns:
         raise SystemExit(f"Target '{target}' not in training data.")
 
@@ -74,9 +139,12 @@ def train_classification(target: str = "sold") -> None:
         df = df.with_columns(pl.col(target).cast(pl.Boolean, strict=False))
 
     X, y = feature_target_split(df, target)
+    # 0/1 labels: converters such as onnxmltools cannot export boolean classes
+    y = y.cast(pl.Int8)
 
     # Persist training feature columns for inference alignment
     (ARTIFACTS_DIR / "clf_feature_columns.json").write_text(json.dumps(X.columns, indent=2))
+    _save_feature_state("clf", state)
 
     # Guard for single-class datasets
     y_np_all = y.to_pandas().values
@@ -93,7 +161,9 @@ def train_classification(target: str = "sold") -> None:
         return
 
     # Stratified split for classification
-    X_tr, X_va, y_tr, y_va = train_val_split(X, y, stratify=True)
+    X_tr, X_va, y_tr, y_va = train_val_split(
+        _design_matrix(df, X, "clf", title_hash_features), y, stratify=True
+    )
 
     # Logistic Regression
     logit = LogisticRegression(max_iter=1000)
@@ -118,8 +188,12 @@ def train_classification(target: str = "sold") -> None:
     # Save artifacts and metrics
     joblib.dump(logit, ARTIFACTS_DIR / "clf_logit.joblib")
     joblib.dump(lgbm, ARTIFACTS_DIR / "clf_lightgbm.joblib")
+    onnx_parity = {
+        "logit": export_onnx(logit, ARTIFACTS_DIR / "clf_logit.joblib", X_va),
+        "lightgbm": export_onnx(lgbm, ARTIFACTS_DIR / "clf_lightgbm.joblib", X_va),
+    }
     (ARTIFACTS_DIR / "clf_metrics.json").write_text(
-        json.dumps({"logit": m_logit, "lightgbm": m_lgbm}, indent=2)
+        json.dumps({"logit": m_logit, "lightgbm": m_lgbm, "onnx_parity": onnx_parity}, indent=2)
     )
     print("Classification metrics:", {"logit": m_logit, "lightgbm": m_lgbm})
 
@@ -129,9 +203,22 @@ if __name__ == "__main__":
 
     p = argparse.ArgumentParser()
     p.add_argument("--task", choices=["regression", "classification"], required=True)
+    p.add_argument(
+        "--title-hash-features",
+        type=int,
+        default=0,
+        help="append a hashed title token/bigram block of this width (0 = off)",
+    )
+    p.add_argument(
+        "--from-store",
+        action="store_true",
+        help="read the training set from the warehouse feature store instead of train.parquet",
+    )
     args = p.parse_args()
 
     if args.task == "regression":
-        train_regression()
+        train_regression(title_hash_features=args.title_hash_features, from_store=args.from_store)
     else:
-        train_classification()
+        train_classification(
+            title_hash_features=args.title_hash_features, from_store=args.from_store
+        )
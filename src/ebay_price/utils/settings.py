@@ -25,6 +25,24 @@ class AppSettings(BaseSettings):
     )
     postgres__schema: str = Field(default="public")
 
+    api__models_dir: str = Field(default="data/artifacts/models")
+    api__reload_interval_s: float = Field(default=5.0)
+    api__max_batch_size: int = Field(default=10_000)
+    api__fast_path: bool = Field(default=True)
+    # "auto" serves <model>.onnx through onnxruntime when present, else the joblib model
+    api__inference_backend: str = Field(default="auto")
+    # micro-batching of concurrent single-listing requests; window 0 disables it
+    api__batch_window_ms: float = Field(default=2.0)
+    api__batch_max_size: int = Field(default=64)
+    # prediction cache keyed by listing + model version; 0 entries disables it
+    api__cache_max_entries: int = Field(default=50_000)
+    api__cache_ttl_s: float = Field(default=300.0)
+    # listings scored per chunk by the NDJSON streaming endpoints
+    api__stream_chunk_size: int = Field(default=1000)
+    # time each build_features stage per request (stage="features_<name>"); turns off
+    # the compiled fast path, so it is for diagnosing, not for serving
+    api__profile_features: bool = Field(default=False)
+
 
 def load_settings() -> AppSettings:
     # Load layered: .env variables override TOML on disk
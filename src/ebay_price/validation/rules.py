@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import types
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, get_args
+
+import annotated_types as at
+import polars as pl
+from pydantic import BaseModel
+
+from ebay_price.validation.schemas import CURRENCY_CODE_LEN, LISTING_TYPES, ListingRecord
+
+# Columns of the rejects frame: the row's position in the input and the rules it broke
+ROW_COL = "_row"
+REASONS_COL = "_reasons"
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A row-level check: rows where `violated` is true are rejected for `reason`."""
+
+    reason: str
+    violated: pl.Expr
+
+
+def _base_type(annotation: Any) -> Any:
+    if isinstance(annotation, types.UnionType):
+        return next(a for a in get_args(annotation) if a is not type(None))
+    return annotation
+
+
+def _as_float(col: str) -> pl.Expr:
+    return pl.col(col).cast(pl.Float64, strict=False)
+
+
+def _as_datetime(col: str, dtype: pl.DataType) -> pl.Expr:
+    """`col` as UTC datetimes; ISO strings without an offset are taken as UTC, as pydantic does."""
+    if isinstance(dtype, pl.Datetime):
+        c = pl.col(col)
+        return c.dt.replace_time_zone("UTC") if dtype.time_zone is None else c
+    s = pl.col(col).cast(pl.Utf8, strict=False)
+    # the naive formats only see strings without an offset: parsing the nulls is free
+    naive = pl.when(~s.str.contains(r"(Z|[+-]\d\d:?\d\d)$")).then(s)
+    return pl.coalesce(
+        s.str.strptime(pl.Datetime("us", "UTC"), format="%+", strict=False),
+        *(
+            naive.str.strptime(pl.Datetime("us"), format=f, strict=False).dt.replace_time_zone(
+                "UTC"
+            )
+            for f in ("%Y-%m-%dT%H:%M:%S%.f", "%Y-%m-%d %H:%M:%S%.f")
+        ),
+    )
+
+
+def _type_rules(col: str, base: Any, dtype: pl.DataType) -> list[Rule]:
+    c = pl.col(col)
+    if base is datetime and dtype == pl.Utf8:
+        return [
+            Rule(f"{col} is not a datetime", c.is_not_null() & _as_datetime(col, dtype).is_null())
+        ]
+    if base in (int, float) and dtype == pl.Utf8:
+        return [Rule(f"{col} is not a number", c.is_not_null() & _as_float(col).is_null())]
+    if base is int and dtype.is_float():
+        return [Rule(f"{col} is not an integer", c != c.floor())]
+    if base is bool and dtype.is_integer():
+        return [Rule(f"{col} is not a boolean", ~c.is_in([0, 1]))]
+    return []
+
+
+def model_rules(model: type[BaseModel], schema: pl.Schema) -> list[Rule]:
+    """
+    The per-field constraints of `model` (required, min_length, ge / gt / le / lt and the
+    field's type) as rules over a frame with `schema`. Like pydantic, a null optional
+    value passes and columns the model does not have are ignored.
+    """
+    rules = []
+    for col, info in model.model_fields.items():
+        if col not in schema:
+            if info.is_required():
+                rules.append(Rule(f"{col} is required", pl.lit(True)))
+            continue
+        dtype = schema[col]
+        c = pl.col(col)
+        if info.is_required():
+            rules.append(Rule(f"{col} is required", c.is_null()))
+        base = _base_type(info.annotation)
+        rules += _type_rules(col, base, dtype)
+        num = _as_float(col)
+        for m in info.metadata:
+            if isinstance(m, at.MinLen) and dtype == pl.Utf8:
+                rules.append(
+                    Rule(f"{col} is shorter than {m.min_length}", c.str.len_chars() < m.min_length)
+                )
+            elif isinstance(m, at.Ge):
+                rules.append(Rule(f"{col} < {m.ge}", num < m.ge))
+            elif isinstance(m, at.Gt):
+                rules.append(Rule(f"{col} <= {m.gt}", num <= m.gt))
+            elif isinstance(m, at.Le):
+                rules.append(Rule(f"{col} > {m.le}", num > m.le))
+            elif isinstance(m, at.Lt):
+                rules.append(Rule(f"{col} >= {m.lt}", num >= m.lt))
+    return rules
+
+
+def listing_record_rules(schema: pl.Schema) -> list[Rule]:
+    """`ListingRecord`'s field constraints plus its listing_type, currency and time checks."""
+    rules = model_rules(ListingRecord, schema)
+    if "listing_type" in schema:
+        rules.append(
+            Rule(
+                f"listing_type not one of {sorted(LISTING_TYPES)}",
+                ~pl.col("listing_type").is_in(sorted(LISTING_TYPES)),
+            )
+        )
+    if "currency" in schema:
+        rules.append(
+            Rule(
+                "currency is not a 3-letter code",
+                pl.col("currency").str.len_chars() != CURRENCY_CODE_LEN,
+            )
+        )
+    if "start_time" in schema and "end_time" in schema:
+        start = _as_datetime("start_time", schema["start_time"])
+        end = _as_datetime("end_time", schema["end_time"])
+        rules.append(Rule("end_time before start_time", end < start))
+    return rules
+
+
+def split_rejects(df: pl.DataFrame, rules: Sequence[Rule]) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Split `df` into the rows that pass every rule and the ones that do not. The rejects
+    keep their columns, plus their row number in `df` and the reasons they failed.
+    """
+    violated = [r.violated.fill_null(False) for r in rules]
+    bad = pl.any_horizontal(violated) if violated else pl.lit(False)
+    # lazily, so a datetime column that several rules parse is parsed once
+    flagged = df.lazy().with_row_index(ROW_COL).with_columns(bad.alias("_bad")).collect()
+    rejects = flagged.filter(pl.col("_bad")).drop("_bad")
+    # the reasons are only spelled out for the (few) rows that need them
+    reasons = (
+        pl.concat_list(
+            [pl.when(v).then(pl.lit(r.reason)) for r, v in zip(rules, violated, strict=True)]
+        ).list.drop_nulls()
+        if violated
+        else pl.lit([], dtype=pl.List(pl.Utf8))
+    )
+    rejects = rejects.with_columns(reasons.alias(REASONS_COL))
+    return flagged.filter(~pl.col("_bad")).drop(ROW_COL, "_bad"), rejects
+
+
+def describe_rejects(rejects: pl.DataFrame, limit: int = 5) -> str:
+    """The first `limit` rejects, one line each."""
+    return "\n".join(
+        f"row {r[ROW_COL]}: {'; '.join(r[REASONS_COL])}"
+        for r in rejects.head(limit).select(ROW_COL, REASONS_COL).iter_rows(named=True)
+    )
@@ -4,6 +4,9 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field, validator
 
+LISTING_TYPES = frozenset({"Auction", "BuyItNow", "BIN", "FixedPrice"})
+CURRENCY_CODE_LEN = 3
+
 
 class ListingRecord(BaseModel):
     item_id: str = Field(..., min_length=1)
@@ -31,16 +34,15 @@ class ListingRecord(BaseModel):
     def _listing_type_ok(cls, v: str | None) -> str | None:
         if v is None:
             return v
-        allowed = {"Auction", "BuyItNow", "BIN", "FixedPrice"}
-        if v not in allowed:
-            raise ValueError(f"listing_type must be one of {allowed}, got {v}")
+        if v not in LISTING_TYPES:
+            raise ValueError(f"listing_type must be one of {set(LISTING_TYPES)}, got {v}")
         return v
 
     @validator("currency")
     def _currency_ok(cls, v: str | None) -> str | None:
         if v is None:
             return v
-        if len(v) != 3:
+        if len(v) != CURRENCY_CODE_LEN:
             raise ValueError("currency must be a 3-letter code")
         return v
 
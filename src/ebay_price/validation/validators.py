@@ -5,6 +5,7 @@ from pathlib import Path
 import polars as pl
 from pydantic import ValidationError
 
+from ebay_price.validation.rules import describe_rejects, listing_record_rules, split_rejects
 from ebay_price.validation.schemas import ListingRecord
 
 REQUIRED_COLUMNS = [
@@ -89,6 +90,11 @@ def sample_pydantic_validation(df: pl.DataFrame, n: int = 50) -> list[tuple[int,
     return errors
 
 
+def reject_rows(df: pl.DataFrame) -> pl.DataFrame:
+    """Every row that `ListingRecord` would refuse, with the reasons, checked column-wise."""
+    return split_rejects(df, listing_record_rules(df.schema))[1]
+
+
 def validate_parquet(parquet_path: str | Path) -> None:
     path = Path(parquet_path)
     if not path.exists():
@@ -102,8 +108,9 @@ def validate_parquet(parquet_path: str | Path) -> None:
         raise AssertionError(f"Negative values: {bad}")
     if check_time_order(df):
         raise AssertionError("end_time earlier than start_time")
-    pedantic = sample_pydantic_validation(df)
-    if pedantic:
-        preview = "\n".join([f"row {i}: {msg.splitlines()[0]}" for i, msg in pedantic[:5]])
-        raise AssertionError(f"Pydantic validation failed:\n{preview}")
+    rejects = reject_rows(df)
+    if rejects.height:
+        raise AssertionError(
+            f"Row validation failed for {rejects.height} rows:\n{describe_rejects(rejects)}"
+        )
     print("Validation passed")
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+
+from ebay_price.features import aggregates as agg
+from ebay_price.features.build_features import build_features
+from ebay_price.features.sql import build_features_sql
+from ebay_price.features.state import fit_feature_state
+from ebay_price.ingest import load
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _listings(n: int) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i:02d}" for i in range(n)],
+            "title": [f"Apple iPhone {i}" for i in range(n)],
+            "brand": [("Apple", "Samsung")[i % 2] for i in range(n)],
+            "model": ["X"] * n,
+            "condition": ["Used"] * n,
+            "seller_username": [f"s{i % 3}" for i in range(n)],
+            "start_time": [f"2025-08-{1 + i:02d}T00:00:00Z" for i in range(n)],
+            "end_time": [f"2025-08-{1 + i:02d}T10:00:00Z" for i in range(n)],
+            "start_price": [float(10 * i) for i in range(n)],
+            "final_price": [100.0 + i for i in range(n)],
+            "sold": [int(i % 4 != 0) for i in range(n)],
+        }
+    )
+
+
+def _raw(df: pl.DataFrame) -> pl.DataFrame:
+    # upsert_raw takes the full raw column set
+    extra = {
+        "category_path": pl.Utf8,
+        "listing_type": pl.Utf8,
+        "shipping_cost": pl.Float64,
+        "seller_feedback_score": pl.Int64,
+        "seller_positive_percent": pl.Float64,
+        "watchers": pl.Int64,
+        "bids": pl.Int64,
+        "currency": pl.Utf8,
+    }
+    return df.drop("final_price", "sold").with_columns(
+        pl.lit(None, dtype=t).alias(c) for c, t in extra.items()
+    )
+
+
+def _tables(con: duckdb.DuckDBPyConnection) -> dict[str, pl.DataFrame]:
+    return {
+        k.table: con.execute(f"SELECT * FROM {k.table} ORDER BY ALL").pl() for k in agg.AGG_KEYS
+    }
+
+
+def test_stats_cover_the_most_recent_window(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(agg, "AGG_WINDOW", 3)
+    df = _listings(12)
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    agg.rebuild_aggregates(con)
+    seller = con.execute("SELECT * FROM agg_seller WHERE seller_username = 's0'").pl()
+    con.close()
+
+    # s0 listed id00, 03, 06, 09; the window keeps the three that ended last
+    recent = df.filter(pl.col("item_id").is_in(["id03", "id06", "id09"]))
+    assert seller["seller_hist_listings"].item() == 3
+    assert seller["seller_hist_sell_through"].item() == pytest.approx(recent["sold"].mean())
+    sold_prices = recent.filter(pl.col("sold") == 1)["final_price"]
+    assert seller["seller_hist_median_price"].item() == pytest.approx(sold_prices.median())
+
+
+def test_stats_leave_out_listings_that_have_not_ended(tmp_path: Path) -> None:
+    df = _listings(9).with_columns(
+        pl.when(pl.col("item_id") == "id00")
+        .then(None)
+        .when(pl.col("item_id") == "id03")
+        .then(pl.lit("2999-01-01T00:00:00Z"))
+        .otherwise(pl.col("end_time"))
+        .alias("end_time")
+    )
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    con.register("df", df)
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    agg.rebuild_aggregates(con)
+    seller = con.execute("SELECT * FROM agg_seller WHERE seller_username = 's0'").pl()
+    con.close()
+
+    # s0 listed id00 (still open), id03 (ends in the future) and id06, the only outcome
+    assert seller["seller_hist_listings"].item() == 1
+    assert seller["seller_hist_sell_through"].item() == 1.0
+    assert seller["seller_hist_median_price"].item() == 106.0
+
+
+def test_upserts_recompute_touched_keys_and_publish(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(load, "WAREHOUSE", tmp_path / "wh.duckdb")
+    monkeypatch.setattr(load, "DDL", ROOT / "warehouse" / "ddl.sql")
+    load.ensure_warehouse()
+    df = _raw(_listings(12))
+    load.upsert_raw(df)
+    # id01 moves from seller s1 to a new seller and id12 is new
+    load.upsert_raw(
+        pl.concat(
+            [
+                df.filter(pl.col("item_id") == "id01").with_columns(seller_username=pl.lit("s9")),
+                _raw(_listings(13)).tail(1),
+            ]
+        )
+    )
+
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    incremental = _tables(con)
+    agg.rebuild_aggregates(con)
+    for table, rebuilt in _tables(con).items():
+        assert incremental[table].equals(rebuilt), table
+    counts = dict(
+        con.execute("SELECT seller_username, seller_hist_listings FROM agg_seller").fetchall()
+    )
+    con.close()
+    assert counts == {"s0": 5, "s1": 3, "s2": 4, "s9": 1}
+
+    lookup = agg.AggregateLookup(agg.aggregates_online_path(tmp_path / "wh.duckdb"))
+    index = lookup.lookup([{"seller_username": "s9"}, {"seller_username": "nobody"}])
+    lookup.close()
+    assert index.frames["seller"]["seller_hist_listings"].to_list() == [1]
+    assert "product" not in index.frames
+
+
+def test_training_history_only_covers_listings_ended_before_the_start(tmp_path: Path) -> None:
+    item = pl.col("item_id")
+    df = _listings(12).with_columns(
+        # s9 has a single listing; id10 moves to s0 and starts an hour before id09 ends
+        seller_username=pl.when(item == "id11")
+        .then(pl.lit("s9"))
+        .when(item == "id10")
+        .then(pl.lit("s0"))
+        .otherwise(pl.col("seller_username")),
+        start_time=pl.when(item == "id10")
+        .then(pl.lit("2025-08-10T09:00:00+00:00"))
+        .otherwise(pl.col("start_time")),
+    )
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    con.register("df", df)
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    asof = agg.AggregateIndex.as_of(con).asof
+    agg.rebuild_aggregates(con)
+    served = agg.AggregateIndex.load(con).frames["seller"]
+    con.close()
+    seller = dict(zip(asof["item_id"], asof["seller_hist_listings"], strict=True))
+    price = dict(zip(asof["item_id"], asof["seller_hist_median_price"], strict=True))
+
+    # a seller's first listing has no history, whatever serving knows of it
+    assert seller["id11"] is None and seller["id00"] is None
+    assert served.filter(pl.col("seller_username") == "s9")["seller_hist_listings"].item() == 1
+    # s0: id00, 03 and 06 ended before either id09 or id10 started
+    assert seller["id09"] == 3 and seller["id10"] == 3
+    # ...so neither sees its own price: id03 and id06 are s0's sold ones before both
+    assert price["id09"] == price["id10"] == pytest.approx(104.5)
+
+
+def test_build_features_joins_aggregates_like_the_sql_engine(tmp_path: Path) -> None:
+    df = _listings(12)
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    agg.rebuild_aggregates(con)
+    index = agg.AggregateIndex.as_of(con)
+    state = fit_feature_state(df)
+
+    unseen = df.tail(1).with_columns(item_id=pl.lit("new_item"))
+    feat = build_features(pl.concat([df, unseen]), state, aggregates=index)
+    assert feat.columns[-len(agg.AGG_FEATURES) :] == agg.AGG_FEATURES
+    assert feat["item_id"].to_list()[:12] == df["item_id"].to_list()
+    assert feat["seller_hist_listings"].to_list()[-1] is None
+    # id11 (Samsung) follows the five other Samsung listings
+    assert feat["product_hist_listings"].to_list()[-2] == 5
+
+    sql = build_features_sql(con, state)
+    con.close()
+    expected = build_features(df, state, aggregates=index)
+    assert sql.columns == expected.columns
+    for c in agg.AGG_FEATURES:
+        assert sql[c].to_list() == pytest.approx(expected[c].to_list()), c
@@ -1,14 +1,65 @@
 from __future__ import annotations
 
+import json
+import os
+from pathlib import Path
+
+import joblib
 import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 
 import api.app as api_app
+from ebay_price.api.cache import PredictionCache
+from ebay_price.api.registry import FEATURE_STATE_FILE, TASKS, ModelRegistry
+from ebay_price.features.state import FeatureState
+from ebay_price.features.text import TitleHasher
+
+
+class DummyRegressor:
+    calls: list[int] = []
+
+    def predict(self, X):  # pragma: no cover - invoked indirectly
+        DummyRegressor.calls.append(X.shape[0])
+        return [355.0] * X.shape[0]
+
+
+class DummyClassifier:
+    calls: list[int] = []
+
+    def predict_proba(self, X):  # pragma: no cover - invoked indirectly
+        DummyClassifier.calls.append(X.shape[0])
+        return np.tile([0.2, 0.8], (X.shape[0], 1))
+
+
+def _save_state(state: FeatureState, art_dir: Path) -> None:
+    # as train_baselines leaves it: one copy per model
+    for task in TASKS:
+        state.save(art_dir / FEATURE_STATE_FILE.format(task=task))
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch: pytest.MonkeyPatch) -> PredictionCache:
+    fresh = PredictionCache(max_entries=100, ttl_s=60.0)
+    monkeypatch.setattr(api_app, "cache", fresh)
+    return fresh
 
 
 @pytest.fixture()
-def client() -> TestClient:
+def registry(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ModelRegistry:
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    joblib.dump(DummyClassifier(), tmp_path / "clf_lightgbm.joblib")
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    reg.add_swap_listener(api_app._on_models_swapped)
+    monkeypatch.setattr(api_app, "registry", reg)
+    DummyRegressor.calls.clear()
+    DummyClassifier.calls.clear()
+    return reg
+
+
+@pytest.fixture()
+def client(registry: ModelRegistry) -> TestClient:
     return TestClient(api_app.app)
 
 
@@ -35,31 +86,404 @@ def sample_listing() -> dict[str, object]:
     }
 
 
-def test_predict_price_endpoint(monkeypatch: pytest.MonkeyPatch, client: TestClient, sample_listing: dict[str, object]) -> None:
-    class DummyRegressor:
-        def predict(self, X):  # pragma: no cover - invoked indirectly
-            assert X.shape[0] == 1
-            return [355.0]
-
-    monkeypatch.setattr(api_app, "_load_model", lambda _: DummyRegressor())
-
+def test_predict_price_endpoint(client: TestClient, sample_listing: dict[str, object]) -> None:
     response = client.post("/predict/price", json=sample_listing)
     assert response.status_code == 200
+    assert DummyRegressor.calls == [1]
     body = response.json()
     assert body["model"].endswith(".joblib")
     assert body["prediction"] == pytest.approx(355.0)
 
 
-def test_predict_sold_endpoint(monkeypatch: pytest.MonkeyPatch, client: TestClient, sample_listing: dict[str, object]) -> None:
-    class DummyClassifier:
-        def predict_proba(self, X):  # pragma: no cover - invoked indirectly
-            assert X.shape[0] == 1
-            return np.array([[0.2, 0.8]])
+def test_predict_price_without_microbatching(
+    monkeypatch: pytest.MonkeyPatch, client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    monkeypatch.setattr(api_app.cfg, "api__batch_window_ms", 0.0)
+    batches_before = api_app.batchers["reg"].stats.batches
+    response = client.post("/predict/price", json=sample_listing)
+    assert response.status_code == 200
+    assert response.json()["prediction"] == pytest.approx(355.0)
+    assert api_app.batchers["reg"].stats.batches == batches_before
+    assert DummyRegressor.calls == [1]
 
-    monkeypatch.setattr(api_app, "_load_model", lambda _: DummyClassifier())
 
+def test_predict_sold_endpoint(client: TestClient, sample_listing: dict[str, object]) -> None:
     response = client.post("/predict/sold", json=sample_listing)
     assert response.status_code == 200
+    assert DummyClassifier.calls == [1]
     body = response.json()
     assert body["probability"] == pytest.approx(0.8)
     assert body["label"] == 1
+
+
+def test_models_reports_active_versions(client: TestClient, registry: ModelRegistry) -> None:
+    response = client.get("/models")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["reg"]["model"] == "reg_lightgbm.joblib"
+    assert body["reg"]["version"] == registry.get("reg").version
+
+
+def test_predict_price_batch_scores_once_and_reports_row_errors(
+    client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    second = {**sample_listing, "item_id": "test456", "brand": "Samsung"}
+    bad = {**sample_listing, "item_id": "", "start_price": "not-a-number"}
+    response = client.post("/predict/price/batch", json=[sample_listing, bad, second, 7])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert DummyRegressor.calls == [2]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["prediction"] == pytest.approx(355.0)
+    assert results[2]["item_id"] == "test456" and "prediction" in results[2]
+    assert "item_id" in results[1]["error"] and "start_price" in results[1]["error"]
+    assert "error" in results[3]
+
+
+def test_predict_sold_batch(client: TestClient, sample_listing: dict[str, object]) -> None:
+    items = [{**sample_listing, "item_id": f"id{i}"} for i in range(3)]
+    response = client.post("/predict/sold/batch", json=items)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert DummyClassifier.calls == [3]
+    assert all(r["label"] == 1 for r in results)
+
+
+def test_predict_price_uses_compiled_plan_when_state_present(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, sample_listing: dict[str, object]
+) -> None:
+    cols = ["start_price", "brand_le", "start_price_win", "duration_hours", "not_a_feature"]
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(cols))
+    state = FeatureState(
+        winsor_bounds={"start_price": (1.0, 200.0)}, vocabularies={"brand": ["Apple"]}
+    )
+    _save_state(state, tmp_path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    seen: list[np.ndarray] = []
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.append(X) or [1.0])
+
+    response = TestClient(api_app.app).post("/predict/price", json=sample_listing)
+    assert response.status_code == 200
+    assert reg.get("reg").plan is not None
+    assert seen[0].dtype == np.float32
+    np.testing.assert_allclose(seen[0][0], [250.0, 0.0, 200.0, 168.0, 0.0])
+
+
+def test_batching_stats(client: TestClient, sample_listing: dict[str, object]) -> None:
+    client.post("/predict/sold", json=sample_listing)
+    body = client.get("/stats/batching").json()
+    assert body["clf"]["batches"] >= 1 and body["clf"]["items"] >= 1
+
+
+def test_combined_predict_returns_both(
+    client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    response = client.post("/predict", json=sample_listing)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["price"]["prediction"] == pytest.approx(355.0)
+    assert body["sold"]["probability"] == pytest.approx(0.8)
+    assert body["sold"]["label"] == 1
+    assert DummyRegressor.calls == [1] and DummyClassifier.calls == [1]
+
+
+def test_combined_predict_projects_one_feature_pass(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, sample_listing: dict[str, object]
+) -> None:
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    joblib.dump(DummyClassifier(), tmp_path / "clf_lightgbm.joblib")
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(["start_price", "bids"]))
+    (tmp_path / "clf_feature_columns.json").write_text(json.dumps(["bids", "watchers", "x"]))
+    _save_state(FeatureState(), tmp_path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    seen: dict[str, np.ndarray] = {}
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.update(reg=X) or [1.0])
+    monkeypatch.setattr(
+        DummyClassifier,
+        "predict_proba",
+        lambda self, X: seen.update(clf=X) or np.array([[0.9, 0.1]]),
+    )
+
+    response = TestClient(api_app.app).post("/predict", json=sample_listing)
+    assert response.status_code == 200
+    assert reg.joint_plan(reg.get_many("reg", "clf")) is not None
+    np.testing.assert_allclose(seen["reg"][0], [250.0, 12.0])
+    np.testing.assert_allclose(seen["clf"][0], [12.0, 15.0, 0.0])
+    assert response.json()["sold"]["label"] == 0
+
+
+def test_repeat_listing_served_from_cache(
+    client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    first = client.post("/predict/price", json=sample_listing)
+    second = client.post("/predict/price", json={**sample_listing, "bids": "12"})
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert DummyRegressor.calls == [1]
+
+    fresh = client.post(
+        "/predict/price", json=sample_listing, headers={"Cache-Control": "no-cache"}
+    )
+    assert fresh.headers["X-Cache"] == "BYPASS"
+    assert DummyRegressor.calls == [1, 1]
+    stats = client.get("/stats/cache").json()
+    assert stats["hits"] == 1 and stats["size"] == 1
+
+
+def test_batch_scores_only_uncached_rows(
+    client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    client.post("/predict/sold", json=sample_listing)
+    other = {**sample_listing, "item_id": "test456"}
+    response = client.post("/predict/sold/batch", json=[sample_listing, other])
+    results = response.json()["results"]
+    assert DummyClassifier.calls == [1, 1]
+    assert [r["probability"] for r in results] == pytest.approx([0.8, 0.8])
+
+
+def test_model_swap_invalidates_cache(
+    client: TestClient, registry: ModelRegistry, sample_listing: dict[str, object]
+) -> None:
+    client.post("/predict", json=sample_listing)
+    assert len(api_app.cache) == 1
+    path = registry.art_dir / "reg_lightgbm.joblib"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert registry.refresh() is True
+    assert len(api_app.cache) == 0
+
+
+def test_health(client: TestClient) -> None:
+    response = client.get("/health")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok" and set(body["models"]) == {"reg", "clf"}
+
+
+def test_metrics_exposes_stages_and_model_counters(
+    client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    served_before = api_app.MODEL_REQUESTS.value(task="reg", model="reg_lightgbm.joblib")
+    client.post("/predict/price", json=sample_listing)
+    client.post("/predict/price", json=sample_listing)
+    assert api_app.MODEL_REQUESTS.value(task="reg", model="reg_lightgbm.joblib") == (
+        served_before + 2
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    for stage in ("registry", "features", "align", "to_numpy", "predict", "cache"):
+        assert f'ebay_price_stage_seconds_count{{stage="{stage}",task="reg"}}' in text
+    assert 'ebay_price_requests_total{route="/predict/price",method="POST",status="200"}' in text
+    assert 'ebay_price_cache_lookups_total{result="hit"} 1' in text
+    assert "ebay_price_requests_in_flight 1" in text  # the scrape itself
+    assert 'ebay_price_model_info{task="reg",model="reg_lightgbm.joblib"' in text
+
+
+def test_profile_features_reports_each_pipeline_stage(
+    client: TestClient, sample_listing: dict[str, object], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(api_app.cfg, "api__profile_features", True)
+    assert client.post("/predict/price", json=sample_listing).status_code == 200
+
+    text = client.get("/metrics").text
+    for stage in ("prepare", "datetime", "label_encode", "target_encode", "numeric", "text"):
+        assert f'ebay_price_stage_seconds_count{{stage="features_{stage}",task="reg"}}' in text
+
+
+def test_price_stream_scores_in_chunks(
+    monkeypatch: pytest.MonkeyPatch, client: TestClient, sample_listing: dict[str, object]
+) -> None:
+    monkeypatch.setattr(api_app.cfg, "api__stream_chunk_size", 2)
+    lines = [json.dumps({**sample_listing, "item_id": f"id{i}"}) for i in range(4)]
+    lines.insert(2, "{not json")
+    lines.insert(3, "")  # blank lines are skipped
+    body = "\n".join(lines).encode()
+
+    response = client.post(
+        "/predict/price/stream", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["X-Model"] == "reg_lightgbm.joblib"
+    out = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in out] == [0, 1, 2, 3, 4]
+    assert [r.get("item_id") for r in out] == ["id0", "id1", None, "id2", "id3"]
+    assert "invalid JSON" in out[2]["error"]
+    assert all(r["prediction"] == pytest.approx(355.0) for i, r in enumerate(out) if i != 2)
+    assert DummyRegressor.calls == [2, 1, 1]
+
+
+def test_hashed_title_block_follows_plan_columns(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, sample_listing: dict[str, object]
+) -> None:
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(["start_price", "title_len"]))
+    _save_state(FeatureState(), tmp_path)
+    TitleHasher(n_features=16).save(tmp_path / "reg_title_hashing.json")
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    seen: list[np.ndarray] = []
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.append(X) or [1.0])
+
+    response = TestClient(api_app.app).post("/predict/price", json=sample_listing)
+    assert response.status_code == 200
+    (X,) = seen
+    assert X.shape == (1, 2 + 16)
+    assert X[0, :2].tolist() == [250.0, 21.0]
+    expected = TitleHasher(n_features=16).transform([sample_listing["title"]]).toarray()[0]
+    np.testing.assert_array_equal(X[0, 2:], expected)
+    # "apple iphone 12 128gb": four tokens plus three bigrams
+    assert X[0, 2:].sum() == 7
+
+
+def test_predict_by_item_id_reads_feature_store(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import polars as pl
+
+    from ebay_price.features.store import FeatureStore, pipeline_version
+
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    joblib.dump(DummyClassifier(), tmp_path / "clf_lightgbm.joblib")
+    cols = ["start_price", "seller_hist_listings", "product_hist_median_price"]
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(cols))
+    state = FeatureState()
+    _save_state(state, tmp_path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    store = FeatureStore(tmp_path / "wh.duckdb")
+    store.write(
+        pl.DataFrame(
+            {
+                "item_id": ["a1"],
+                "title": ["x"],
+                "start_price": [9.0],
+                "seller_hist_listings": [5],
+                "product_hist_median_price": [123.0],
+            }
+        ),
+        pipeline_version(state),
+    )
+    monkeypatch.setattr(api_app, "feature_store", store)
+    monkeypatch.setattr(
+        api_app, "build_inference_features", lambda *a: pytest.fail("features rebuilt")
+    )
+    seen: list[np.ndarray] = []
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.append(X) or [7.0])
+    client = TestClient(api_app.app)
+
+    response = client.get("/predict/a1")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["item_id"] == "a1" and body["feature_version"] == pipeline_version(state)
+    assert body["price"]["prediction"] == pytest.approx(7.0)
+    assert body["sold"]["probability"] == pytest.approx(0.8)
+    # the stored as-of history reaches the model, not a fresh lookup by key
+    np.testing.assert_allclose(seen[0], [[9.0, 5.0, 123.0]])
+    assert client.get("/predict/nope").status_code == 404
+
+
+def test_predict_by_item_id_encodes_with_the_model_state(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import polars as pl
+
+    from ebay_price.features.build_features import build_features
+    from ebay_price.features.state import fit_feature_state
+    from ebay_price.features.store import FeatureStore, pipeline_version
+
+    history = pl.DataFrame(
+        {"brand": ["Apple", "Samsung"] * 3, "final_price": [300.0, 200.0] * 3, "sold": [1, 0] * 3}
+    )
+    state = fit_feature_state(history)
+    # a later refresh saw Nokia: same pipeline version, new code and encodings
+    newer = FeatureState.from_dict(state.to_dict())
+    nokia = pl.DataFrame({"brand": ["Nokia"], "final_price": [50.0], "sold": [1]})
+    newer.vocabularies["brand"].append("Nokia")
+    for enc in newer.target_encodings:
+        enc.update(nokia)
+    assert pipeline_version(newer) == pipeline_version(state)
+
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    joblib.dump(DummyClassifier(), tmp_path / "clf_lightgbm.joblib")
+    cols = ["brand_le", "brand__te_final_price"]
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(cols))
+    _save_state(state, tmp_path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    listing = pl.DataFrame(
+        {
+            "item_id": ["n1"],
+            "title": ["Nokia 3310"],
+            "brand": ["Nokia"],
+            "start_time": ["2025-08-01T10:00:00Z"],
+            "end_time": ["2025-08-08T10:00:00Z"],
+        }
+    )
+    store = FeatureStore(tmp_path / "wh.duckdb")
+    store.write(build_features(listing, newer), pipeline_version(newer), newer.target_encodings)
+    monkeypatch.setattr(api_app, "feature_store", store)
+    seen: list[np.ndarray] = []
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.append(X) or [7.0])
+
+    assert TestClient(api_app.app).get("/predict/n1").status_code == 200
+    # what POST /predict computes for the listing, not the store's newer values
+    expected = build_features(listing, state).select(cols)
+    assert expected.row(0) != store.lookup(["n1"], pipeline_version(state)).select(cols).row(0)
+    np.testing.assert_allclose(seen[0], expected.to_numpy())
+
+
+def test_aggregate_history_is_looked_up_for_model_columns(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, sample_listing: dict[str, object]
+) -> None:
+    import duckdb
+    import polars as pl
+
+    from ebay_price.features import aggregates as agg
+
+    cols = ["start_price", "seller_hist_listings", "product_hist_median_price"]
+    joblib.dump(DummyRegressor(), tmp_path / "reg_lightgbm.joblib")
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps(cols))
+    _save_state(FeatureState(), tmp_path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    monkeypatch.setattr(api_app, "registry", reg)
+    history = pl.DataFrame(
+        {
+            "item_id": ["a", "b", "c"],
+            "seller_username": ["trusted_seller"] * 3,
+            "brand": ["Apple"] * 3,
+            "model": ["iPhone 12"] * 3,
+            "condition": ["Used"] * 3,
+            "final_price": [300.0, 320.0, 999.0],
+            "sold": [1, 1, 0],
+        }
+    )
+    con = duckdb.connect(str(tmp_path / "wh.duckdb"))
+    con.register("history", history)
+    con.execute("CREATE TABLE listings AS SELECT * FROM history")
+    agg.rebuild_aggregates(con)
+    agg.publish_aggregates(con, tmp_path / agg.AGG_ONLINE_FILE)
+    con.close()
+    monkeypatch.setattr(
+        api_app, "aggregate_lookup", agg.AggregateLookup(tmp_path / agg.AGG_ONLINE_FILE)
+    )
+    seen: list[np.ndarray] = []
+    monkeypatch.setattr(DummyRegressor, "predict", lambda self, X: seen.append(X) or [1.0] * len(X))
+    client = TestClient(api_app.app)
+
+    unseen = {**sample_listing, "item_id": "x2", "seller_username": "someone_new"}
+    response = client.post("/predict/price/batch", json=[sample_listing, unseen])
+    assert response.status_code == 200
+    np.testing.assert_allclose(seen[0], [[250.0, 3.0, 310.0], [250.0, 0.0, 310.0]])
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+
+from ebay_price.features import build_features as bf
+from ebay_price.features import incremental
+from ebay_price.features.chunked import fit_winsor_bounds_sql
+from ebay_price.features.numeric import fit_winsor_bounds
+from ebay_price.features.state import FeatureState
+
+
+def _listings(n: int, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    price = np.round(rng.exponential(100, n) - 5, 2)  # a few negatives to clip
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i}" for i in range(n)],
+            "title": [f"phone {i}" for i in range(n)],
+            "brand": rng.choice(["Apple", "Samsung", "Nokia", None], n).tolist(),
+            "category_path": rng.choice(["A > 1", "A > 2", "B > 1"], n).tolist(),
+            "model": rng.choice(["X", "Y"], n).tolist(),
+            "condition": rng.choice(["New", "Used"], n).tolist(),
+            "seller_username": rng.choice([f"s{i}" for i in range(20)], n).tolist(),
+            # staggered, so most listings have an as-of seller / product history
+            "start_time": [f"2025-08-{1 + i % 20:02d}T10:00:00Z" for i in range(n)],
+            "end_time": [f"2025-08-{4 + i % 20:02d}T10:00:00Z" for i in range(n)],
+            "start_price": pl.Series(price).set(pl.Series(rng.random(n) < 0.05), None),
+            "shipping_cost": np.round(rng.exponential(8, n), 2),
+            "final_price": np.round(price * 1.2 + 10, 2),
+            "sold": rng.integers(0, 2, n),
+        }
+    )
+
+
+@pytest.fixture()
+def warehouse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(bf, "PROCESSED_DIR", tmp_path / "processed")
+    bf.PROCESSED_DIR.mkdir()
+    db = str(tmp_path / "wh.duckdb")
+    con = duckdb.connect(db)
+    con.register("df", _listings(503))
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    con.close()
+    return db
+
+
+def test_sql_winsor_bounds_match_polars(warehouse: str) -> None:
+    con = duckdb.connect(warehouse, read_only=True)
+    try:
+        sql = fit_winsor_bounds_sql(con, ["start_price", "final_price", "shipping_cost"])
+        df = con.execute("SELECT * FROM listings").pl()
+    finally:
+        con.close()
+    assert sql == fit_winsor_bounds(df)
+
+
+def test_chunked_build_matches_in_memory_build(warehouse: str, tmp_path: Path) -> None:
+    incremental.full_refresh(warehouse, tmp_path / "mem_state.json")
+    mem = pl.read_parquet(bf.PROCESSED_DIR / "features.parquet")
+    mem_train = pl.read_parquet(bf.PROCESSED_DIR / "train.parquet")
+
+    assert incremental.full_refresh(warehouse, tmp_path / "state.json", batch_rows=50) == 503
+    out = bf.PROCESSED_DIR / "features.parquet"
+    assert pq.ParquetFile(out / "part-000000.parquet").metadata.num_row_groups == 11
+    chunked = pl.read_parquet(out)
+    mem_state = FeatureState.load(tmp_path / "mem_state.json")
+    state = FeatureState.load(tmp_path / "state.json")
+
+    assert state.winsor_bounds == mem_state.winsor_bounds
+    assert state.vocabularies == mem_state.vocabularies
+    for enc, ref in zip(state.target_encodings, mem_state.target_encodings, strict=True):
+        assert enc.table == pytest.approx(ref.table)
+    assert chunked.columns == mem.columns
+    assert chunked["seller_hist_listings"].null_count() < 503
+    te_cols = [e.name for e in state.target_encodings]
+    assert chunked.drop(te_cols).equals(mem.drop(te_cols))
+    for c in te_cols:
+        assert chunked[c].to_list() == pytest.approx(mem[c].to_list(), nan_ok=True)
+    train = pl.read_parquet(bf.PROCESSED_DIR / "train.parquet")
+    assert train.schema == mem_train.schema
+    recorded = json.loads((bf.PROCESSED_DIR / "train_schema.json").read_text())
+    assert recorded == {c: str(t) for c, t in train.schema.items()}
+    assert not list(bf.PROCESSED_DIR.glob("*.tmp"))
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from ebay_price.features.build_features import build_features
+from ebay_price.features.categorical import label_encode
+from ebay_price.features.inference import build_inference_features
+from ebay_price.features.state import FeatureState, fit_feature_state
+
+
+def _train_df() -> pl.DataFrame:
+    n = 6
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i}" for i in range(n)],
+            "title": ["Apple iPhone 12", "Samsung S21", "Apple iPhone 13", "Pixel 6", "x", "y"],
+            "category_path": ["A > B", "A > B", "A > C", "A > C", "A > B", None],
+            "brand": ["Apple", "Samsung", "Apple", "Google", "Apple", None],
+            "model": ["iPhone 12", "S21", "iPhone 13", "Pixel 6", "iPhone 12", None],
+            "condition": ["Used", "New", "Used", "Used", "New", "Used"],
+            "start_time": ["2025-08-01T10:00:00Z"] * n,
+            "end_time": ["2025-08-08T10:00:00Z"] * n,
+            "listing_type": ["Auction", "BuyItNow", "Auction", "Auction", "BuyItNow", "Auction"],
+            "start_price": [250.0, 399.0, 10_000.0, 120.0, 80.0, 1.0],
+            "shipping_cost": [10.0, 0.0, 5.0, 0.0, 2.0, 3.0],
+            "seller_username": ["a", "b", "c", "d", "e", "f"],
+            "seller_feedback_score": [1, 2, 3, 4, 5, 6],
+            "seller_positive_percent": [99.0] * n,
+            "watchers": [1, 2, 3, 4, 5, 6],
+            "bids": [0, 1, 2, 3, 4, 5],
+            "final_price": [300.0, 410.0, 500.0, 150.0, 90.0, 5.0],
+            "sold": [1, 1, 0, 1, 0, 0],
+            "currency": ["USD"] * n,
+        }
+    )
+
+
+def test_state_roundtrip(tmp_path: Path) -> None:
+    state = fit_feature_state(_train_df())
+    loaded = FeatureState.load(state.save(tmp_path / "feature_state.json"))
+    assert loaded == state
+    assert loaded.vocabularies["brand"] == ["Apple", "Google", "Samsung"]
+
+
+def test_single_row_inference_matches_training_features() -> None:
+    train = _train_df()
+    state = fit_feature_state(train)
+    feat_train = build_features(train, state)
+
+    row = train.drop("final_price", "sold").row(2, named=True)
+    feat_one = build_inference_features(pd.DataFrame([row]), state)
+
+    for col in (
+        "brand_le",
+        "model_le",
+        "category_path_le",
+        "brand__te_final_price",
+        "category_path__te_sold",
+        "start_price_win",
+        "log1p_start_price",
+    ):
+        assert feat_one[col][0] == pytest.approx(feat_train[col][2]), col
+
+
+def test_unseen_category_gets_prior() -> None:
+    state = fit_feature_state(_train_df())
+    row = {
+        "item_id": "new",
+        "title": None,
+        "brand": "Nokia",
+        "category_path": "A > B",
+        "start_price": 1e6,
+    }
+    feat = build_inference_features(pd.DataFrame([row]), state)
+    te = next(e for e in state.target_encodings if e.name == "brand__te_final_price")
+    assert feat["brand_le"][0] == -1
+    assert feat["brand__te_final_price"][0] == pytest.approx(te.global_mean)
+    # clipped to the training-time bound rather than to the request row itself
+    assert feat["start_price_win"][0] == pytest.approx(10_000.0)
+
+
+def test_label_codes_come_from_saved_vocabulary(tmp_path: Path) -> None:
+    state = FeatureState.load(fit_feature_state(_train_df()).save(tmp_path / "fs.json"))
+    df = pl.DataFrame({"brand": ["Samsung", None, "Nokia", "Apple"], "condition": ["New"] * 4})
+    out = label_encode(df, state.vocabularies)
+    # list position in the persisted vocabulary; unseen -> -1, null stays null
+    assert out["brand_le"].to_list() == [2, None, -1, 0]
+    assert out["brand_le"].dtype == pl.Int64
+    assert out["condition_le"].to_list() == [0] * 4
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+
+from ebay_price.features.build_features import build_features
+from ebay_price.features.state import FeatureState, fit_feature_state
+from ebay_price.features.store import FeatureStore, pipeline_version
+
+
+def _listings(n: int, price_offset: float = 0.0) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i}" for i in range(n)],
+            "title": [f"Apple iPhone {i}" for i in range(n)],
+            "brand": ["Apple", "Samsung"] * (n // 2),
+            "start_time": ["2025-08-01T10:00:00Z"] * n,
+            "end_time": ["2025-08-08T10:00:00Z"] * n,
+            "start_price": [float(10 * i) for i in range(n)],
+            "final_price": [100.0 + i + price_offset for i in range(n)],
+            "sold": [i % 2 for i in range(n)],
+        }
+    )
+
+
+@pytest.fixture()
+def store(tmp_path: Path) -> FeatureStore:
+    return FeatureStore(tmp_path / "wh.duckdb")
+
+
+def test_pipeline_version_tracks_config_not_running_stats() -> None:
+    df = _listings(10)
+    a, b = fit_feature_state(df), fit_feature_state(df)
+    assert pipeline_version(a) == pipeline_version(b)
+    # what an incremental refresh moves: appended categories and encoding statistics
+    b.vocabularies["brand"].append("Nokia")
+    b.target_encodings[0].update(_listings(4, price_offset=50.0))
+    assert pipeline_version(a) == pipeline_version(b)
+    b.winsor_bounds["start_price"] = (1.0, 50.0)
+    assert pipeline_version(a) != pipeline_version(b)
+
+
+def test_bulk_read_and_point_lookup_return_built_rows(store: FeatureStore) -> None:
+    assert store.read().is_empty() and store.lookup(["id1"], "v").is_empty()
+    df = _listings(20)
+    feat = build_features(df, fit_feature_state(df))
+    assert store.write(feat, "v1") == 20
+
+    bulk = store.read()
+    assert bulk.sort("item_id").equals(feat.sort("item_id"))
+    rows = store.lookup(["id7", "missing", "id3"], "v1")
+    assert rows["item_id"].to_list() == ["id7", "id3"]
+    assert rows.row(0, named=True) == feat.filter(pl.col("item_id") == "id7").row(0, named=True)
+    assert store.lookup(["id7"], "v2").is_empty()
+
+
+def test_encodings_are_stored_beside_the_rows(store: FeatureStore) -> None:
+    df = _listings(20)
+    state = fit_feature_state(df)
+    feat = build_features(df, state)
+    store.write(feat, "v1", state.target_encodings)
+    names = [e.name for e in state.target_encodings]
+    con = duckdb.connect(store.db_path, read_only=True)
+    stored = con.execute(f"SELECT {', '.join(names)} FROM feature_store").pl()
+    con.close()
+    assert all(stored[c].null_count() == 20 for c in names)
+    assert store.read("v1").sort("item_id").equals(feat.sort("item_id"))
+
+    # new encodings with only the changed rows: every row reads the new values
+    state.target_encodings[0].update(_listings(4, price_offset=50.0))
+    store.write(feat.head(2), "v1", state.target_encodings)
+    expected = build_features(df, state)
+    assert store.read("v1").sort("item_id").equals(expected.sort("item_id"))
+    row = store.lookup(["id7"], "v1").row(0, named=True)
+    assert row == expected.filter(pl.col("item_id") == "id7").row(0, named=True)
+
+
+def test_upsert_new_columns_and_version_pruning(store: FeatureStore) -> None:
+    feat = build_features(_listings(10), FeatureState())
+    store.write(feat, "v1")
+    store.write(feat.head(2).with_columns(pl.lit(99.0).alias("start_price")), "v1")
+    v1 = store.read("v1")
+    assert v1.height == 10
+    assert v1.filter(pl.col("item_id") == "id1")["start_price"].item() == 99.0
+
+    store.write(feat.with_columns(pl.lit(1).alias("new_feature")), "v2")
+    assert store.read("v2")["new_feature"].to_list() == [1] * 10
+    assert store.read("v1")["new_feature"].null_count() == 10
+    store.write(feat, "v3")
+    assert store.versions() == ["v3", "v2"]
+
+
+def test_small_upserts_keep_the_online_copy_in_step(store: FeatureStore) -> None:
+    feat = build_features(_listings(40), FeatureState())
+    store.write(feat, "v1")
+    store.write(feat, "v2")
+    store.write(feat.head(2).with_columns(pl.lit(99.0).alias("start_price")), "v2")
+    assert store.lookup(["id1"], "v2")["start_price"].item() == 99.0
+    assert store.lookup(["id1"], "v1")["start_price"].item() == feat["start_price"][1]
+
+    # pruned versions leave the online copy too; a new column falls back to a rebuild
+    store.write(feat.head(2), "v3")
+    assert store.lookup(["id1"], "v1").is_empty()
+    store.write(feat.head(2).with_columns(pl.lit(1).alias("new_feature")), "v3")
+    assert store.lookup(["id0", "id1"], "v3")["new_feature"].to_list() == [1, 1]
+    assert store.lookup(["id5"], "v2").height == 1
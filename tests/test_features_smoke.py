@@ -1,8 +1,23 @@
 from __future__ import annotations
 
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 import polars as pl
+from polars.testing import assert_frame_equal
 
-from ebay_price.features.build_features import build_features
+from ebay_price.features.build_features import (
+    STAGES,
+    build_features,
+    build_features_eager,
+    training_frame,
+)
+from ebay_price.features.dtypes import to_float32
+from ebay_price.features.inference import build_inference_features
+from ebay_price.features.profiling import PipelineProfiler
+from ebay_price.features.state import fit_feature_state
 
 
 def test_build_features_smoke():
@@ -47,3 +62,109 @@ def test_build_features_smoke():
         "title_wc",
     ]:
         assert must in feat.columns
+
+
+def test_lazy_plan_matches_eager_stages():
+    df = pl.DataFrame(
+        {
+            "item_id": ["a", "b", "c", "d", "e"],
+            "title": ["Apple iPhone 12", "Galaxy S21 (256GB)", None, "", "Pixel 7 Pro"],
+            "category_path": ["A > B", "A > B", None, "A > C", "A > C"],
+            "brand": ["Apple", "Samsung", None, "Apple", "Goo(gle"],
+            "model": ["iPhone 12", "S21", "x", None, "Pixel 7"],
+            "condition": ["Used", "New", "Used", None, "Used"],
+            "start_time": [
+                "2025-08-01T10:00:00Z",
+                "2025-08-02T11:30:00+02:00",
+                None,
+                "not a date",
+                "2025-12-31T23:59:59Z",
+            ],
+            "end_time": [
+                "2025-08-08T10:00:00Z",
+                "2025-08-03T11:00:00Z",
+                "2025-08-03T11:00:00Z",
+                None,
+                "2026-01-02T00:00:00Z",
+            ],
+            "listing_type": ["Auction", "BuyItNow", "Auction", "Auction", None],
+            "start_price": [250.0, -5.0, None, 10_000.0, 1.0],
+            "shipping_cost": [10.0, 0.0, None, 3.5, -1.0],
+            "watchers": [15, None, 0, 3, 2],
+            "bids": [12, 0, None, 1, 4],
+            "final_price": [355.0, 399.0, 12.0, None, 5_000.0],
+            "sold": [1, 1, 0, 0, 1],
+        }
+    )
+    assert_frame_equal(build_features(df), build_features_eager(df))
+
+    # applying state fitted elsewhere (the inference path) must agree as well
+    state = fit_feature_state(df.head(2))
+    assert_frame_equal(build_features(df, state), build_features_eager(df, state))
+
+
+def test_profiled_build_matches_and_records_each_stage(tmp_path: Path):
+    df = pl.DataFrame(
+        {
+            "item_id": ["a", "b", "c"],
+            "title": ["Apple iPhone 12", "Galaxy S21", None],
+            "brand": ["Apple", "Samsung", None],
+            "start_time": ["2025-08-01T10:00:00Z", "2025-08-02T11:00:00Z", None],
+            "end_time": ["2025-08-08T10:00:00Z", "2025-08-03T11:00:00Z", None],
+            "start_price": [250.0, 399.0, None],
+            "final_price": [355.0, 399.0, 12.0],
+        }
+    )
+    profiler = PipelineProfiler()
+    feat = build_features(df, profiler=profiler)
+    assert_frame_equal(feat, build_features(df))
+
+    stages = profiler.stages
+    assert list(stages) == ["fit_state", *(name for name, _ in STAGES)]
+    assert stages["datetime"].rows_in == 3 and stages["datetime"].cols_in == df.width
+    assert stages["text"].rows_out == 3 and stages["text"].cols_out == feat.width
+    assert all(p.calls == 1 and p.wall_s >= 0 and p.cpu_s >= 0 for p in stages.values())
+    assert "label_encode" in profiler.summary()
+    saved = json.loads(profiler.save(tmp_path / "profile.json").read_text())
+    assert [s["stage"] for s in saved["stages"]] == list(stages)
+
+    # the inference path takes the same hooks, plus payload normalization
+    seen: list[str] = []
+    state = fit_feature_state(df)
+    inference = PipelineProfiler(track_memory=False, on_stage=lambda name, _: seen.append(name))
+    X = build_inference_features(pd.DataFrame({"title": ["Pixel 7"]}), state, inference)
+    assert X.height == 1
+    assert seen == ["prepare", *(name for name, _ in STAGES)]
+    assert inference.stages["prepare"].peak_rss_delta_mb is None
+
+
+def test_training_frame_is_compact_and_matrices_are_float32():
+    df = pl.DataFrame(
+        {
+            "item_id": ["a", "b", "c"],
+            "title": ["Apple iPhone 12", "Galaxy S21", None],
+            "brand": ["Apple", "Samsung", None],
+            "start_time": ["2025-08-01T10:00:00Z", "2025-08-02T11:00:00Z", None],
+            "end_time": ["2025-08-08T10:00:00Z", "2025-08-03T11:00:00Z", None],
+            "start_price": [250.0, 399.0, None],
+            "watchers": [15, 7, None],
+            "final_price": [355.0, 399.0, 12.0],
+            "sold": [True, True, False],
+        }
+    )
+    feat = build_features(df)
+    train = training_frame(feat)
+    schema = train.schema
+    # targets untouched; features narrowed
+    assert schema["final_price"] == pl.Float64 and schema["sold"] == pl.Boolean
+    assert schema["start_price_win"] == pl.Float32
+    assert schema["watchers"] == pl.Int32 and schema["brand_le"] == pl.Int32
+    assert schema["start_hour"] == pl.Int8 and schema["title_has_brand"] == pl.Int8
+    assert train.estimated_size() < feat.select(train.columns).estimated_size()
+    # the lazy path (features.parquet scan) lands on the same schema
+    assert training_frame(feat.lazy()).collect_schema() == schema
+
+    X = to_float32(train.select("start_price_win", "brand_le", "duration_hours"))
+    assert X.dtype == np.float32
+    expected = feat.select("start_price_win", "brand_le", "duration_hours").fill_null(0)
+    np.testing.assert_allclose(X, expected.to_numpy(), rtol=1e-6)
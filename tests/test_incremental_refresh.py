@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+
+from ebay_price.features import build_features as bf
+from ebay_price.features import incremental
+from ebay_price.features.parts import part_paths, scan_parts
+from ebay_price.features.state import FeatureState
+from ebay_price.features.store import FeatureStore
+from ebay_price.modeling.datasets import load_train
+
+
+def _listings(ids: range, brand_cycle: list[str], price_offset: float = 0.0) -> pl.DataFrame:
+    n = len(ids)
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i}" for i in ids],
+            "title": [f"{brand_cycle[i % len(brand_cycle)]} phone {i}" for i in ids],
+            "category_path": [f"A > {i % 3}" for i in ids],
+            "brand": [brand_cycle[i % len(brand_cycle)] for i in ids],
+            "model": [f"M{i % 4}" for i in ids],
+            "condition": ["Used"] * n,
+            "start_time": ["2025-08-01T10:00:00Z"] * n,
+            "end_time": ["2025-08-08T10:00:00Z"] * n,
+            "listing_type": ["Auction"] * n,
+            "start_price": [float(10 * i) for i in ids],
+            "shipping_cost": [5.0] * n,
+            "watchers": [i % 7 for i in ids],
+            "bids": [i % 5 for i in ids],
+            "final_price": [100.0 + i + price_offset for i in ids],
+            "sold": [i % 2 for i in ids],
+        }
+    )
+
+
+def _upsert(db: str, df: pl.DataFrame, at: str) -> None:
+    con = duckdb.connect(db)
+    try:
+        con.register(
+            "incoming", df.with_columns(pl.lit(at).str.to_datetime().alias("_ingested_at"))
+        )
+        con.execute("CREATE TABLE IF NOT EXISTS listings AS SELECT * FROM incoming WHERE 1=0")
+        con.execute("DELETE FROM listings WHERE item_id IN (SELECT item_id FROM incoming)")
+        con.execute("INSERT INTO listings SELECT * FROM incoming")
+    finally:
+        con.close()
+
+
+@pytest.fixture()
+def warehouse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(bf, "PROCESSED_DIR", tmp_path / "processed")
+    bf.PROCESSED_DIR.mkdir()
+    return str(tmp_path / "wh.duckdb")
+
+
+def test_incremental_matches_full_rebuild(warehouse: str, tmp_path: Path) -> None:
+    state_path = tmp_path / "feature_state.json"
+    _upsert(warehouse, _listings(range(40), ["Apple", "Samsung"]), "2025-09-01 00:00:00")
+    assert incremental.incremental_refresh(warehouse, state_path) == 40  # no baseline: full
+
+    # 10 new listings (one new brand) and 5 updated prices, a day later
+    _upsert(warehouse, _listings(range(40, 50), ["Apple", "Nokia"]), "2025-09-02 00:00:00")
+    _upsert(warehouse, _listings(range(0, 5), ["Apple", "Samsung"], 50.0), "2025-09-02 00:00:00")
+    assert incremental.incremental_refresh(warehouse, state_path) == 15
+    assert incremental.incremental_refresh(warehouse, state_path) == 0
+    inc_state = FeatureState.load(state_path)
+    assert inc_state.vocabularies["brand"] == ["Apple", "Samsung", "Nokia"]
+    features = bf.PROCESSED_DIR / "features.parquet"
+    # the delta went in as a part of its own and only its rows were restamped in the store
+    assert [pl.read_parquet(p).height for p in part_paths(features)] == [40, 15]
+    merged = scan_parts(features, inc_state.target_encodings).collect().sort("item_id")
+    assert FeatureStore(warehouse).read().sort("item_id").equals(merged)
+    con = duckdb.connect(warehouse, read_only=True)
+    restamped = con.execute(
+        "SELECT count(*) FROM feature_store WHERE _materialized_at = "
+        "(SELECT max(_materialized_at) FROM feature_store)"
+    ).fetchone()[0]
+    con.close()
+    assert restamped == 15
+    train_path = str(bf.PROCESSED_DIR / "train.parquet")
+    inc_train = load_train(train_path, inc_state.target_encodings).sort("item_id")
+
+    incremental.full_refresh(warehouse, tmp_path / "full_state.json")
+    assert len(part_paths(features)) == 1
+    full = pl.read_parquet(features).sort("item_id")
+    full_state = FeatureState.load(tmp_path / "full_state.json")
+    full_train = load_train(train_path).sort("item_id")
+
+    assert merged["item_id"].to_list() == full["item_id"].to_list()
+    assert merged["final_price"].to_list() == full["final_price"].to_list()
+    for inc_enc, full_enc in zip(
+        inc_state.target_encodings, full_state.target_encodings, strict=True
+    ):
+        assert inc_enc.global_mean == pytest.approx(full_enc.global_mean)
+        assert inc_enc.table == pytest.approx(full_enc.table)
+        assert merged[inc_enc.name].to_list() == pytest.approx(full[full_enc.name].to_list())
+        assert inc_train[inc_enc.name].to_list() == pytest.approx(
+            full_train[inc_enc.name].to_list()
+        )
+    assert "title" in pl.read_parquet(bf.PROCESSED_DIR / "train.parquet").columns
+
+
+def test_nothing_new_leaves_outputs_alone(warehouse: str, tmp_path: Path) -> None:
+    state_path = tmp_path / "feature_state.json"
+    _upsert(warehouse, _listings(range(10), ["Apple"]), "2025-09-01 00:00:00")
+    incremental.full_refresh(warehouse, state_path)
+    before = (bf.PROCESSED_DIR / "features.parquet").stat().st_mtime_ns
+    assert incremental.incremental_refresh(warehouse, state_path) == 0
+    assert (bf.PROCESSED_DIR / "features.parquet").stat().st_mtime_ns == before
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from ebay_price.api.schemas import ListingIn
+from ebay_price.features.align import align_to_columns
+from ebay_price.features.build_features import build_features
+from ebay_price.features.fastpath import InferencePlan
+from ebay_price.features.inference import build_inference_features
+from ebay_price.features.state import FeatureState, fit_feature_state
+from ebay_price.modeling.datasets import feature_target_split
+
+
+def _train_df(n: int = 40) -> pl.DataFrame:
+    rng = np.random.default_rng(0)
+    brands = ["Apple", "Samsung", "Google", None]
+    return pl.DataFrame(
+        {
+            "item_id": [f"id{i}" for i in range(n)],
+            "title": [f"{brands[i % 3]} phone {i} 128GB" for i in range(n)],
+            "category_path": [["A > B", "A > C", None][i % 3] for i in range(n)],
+            "brand": [brands[i % 4] for i in range(n)],
+            "model": [f"m{i % 5}" for i in range(n)],
+            "condition": [["Used", "New"][i % 2] for i in range(n)],
+            "start_time": ["2025-08-01T10:00:00Z"] * n,
+            "end_time": ["2025-08-08T10:00:00Z"] * n,
+            "listing_type": [["Auction", "BuyItNow"][i % 2] for i in range(n)],
+            "start_price": rng.gamma(2.0, 100.0, n).tolist(),
+            "shipping_cost": rng.gamma(1.0, 5.0, n).tolist(),
+            "seller_username": [f"s{i}" for i in range(n)],
+            "seller_feedback_score": rng.integers(0, 5000, n).tolist(),
+            "seller_positive_percent": rng.uniform(90, 100, n).tolist(),
+            "watchers": rng.integers(0, 30, n).tolist(),
+            "bids": rng.integers(0, 20, n).tolist(),
+            "final_price": rng.gamma(2.0, 120.0, n).tolist(),
+            "sold": rng.integers(0, 2, n).tolist(),
+            "currency": ["USD"] * n,
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def fitted() -> tuple[FeatureState, list[str]]:
+    train = _train_df()
+    state = fit_feature_state(train)
+    X, _ = feature_target_split(build_features(train, state), "final_price")
+    return state, X.columns
+
+
+BASE = {
+    "item_id": "x1",
+    "title": "Apple iPhone 12 128GB",
+    "category_path": "A > B",
+    "brand": "Apple",
+    "model": "m1",
+    "condition": "Used",
+    "start_time": "2025-08-01T10:00:00Z",
+    "end_time": "2025-08-08T10:00:00Z",
+    "listing_type": "Auction",
+    "start_price": 250.0,
+    "shipping_cost": 10.0,
+    "seller_username": "trusted",
+    "seller_feedback_score": 1200,
+    "seller_positive_percent": 99.2,
+    "watchers": 15,
+    "bids": 12,
+    "currency": "USD",
+}
+
+CASES = [
+    BASE,
+    {**BASE, "brand": "Nokia", "model": "unseen", "category_path": "Z > Z"},
+    {**BASE, "brand": None, "model": None, "condition": None, "category_path": None},
+    {**BASE, "title": None},
+    {**BASE, "title": "", "brand": "Samsung"},
+    {**BASE, "title": "no digits here", "brand": "("},
+    {**BASE, "start_price": 1e7, "shipping_cost": -4.0, "watchers": -1},
+    {**BASE, "start_price": None, "seller_positive_percent": None, "bids": None},
+    {**BASE, "start_time": "2025-12-31T23:30:00+02:00", "end_time": "2026-01-02 01:00:00.75Z"},
+    {**BASE, "start_time": "2025-08-01T10:00:00.7Z", "end_time": "2025-08-01T09:59:58.9Z"},
+    {**BASE, "start_time": "not a date", "end_time": None},
+    {**BASE, "start_time": None},
+]
+
+
+def _reference(listing: dict, state: FeatureState, cols: list[str]) -> np.ndarray:
+    feats = build_inference_features(pd.DataFrame([listing]), state)
+    return align_to_columns(feats, cols).to_pandas().fillna(0).values[0]
+
+
+@pytest.mark.parametrize("case", range(len(CASES)))
+def test_plan_matches_pipeline_per_column(fitted, case: int) -> None:
+    state, cols = fitted
+    listing = ListingIn(**CASES[case]).model_dump()
+    expected = _reference(listing, state, cols)
+    got = InferencePlan(cols, state).transform(listing)
+    assert got.dtype == np.float32 and got.shape == (len(cols),)
+    for name, e, g in zip(cols, expected, got, strict=True):
+        assert g == pytest.approx(float(e), rel=1e-6, abs=1e-6), name
+
+
+def test_plan_fills_defaults_for_missing_keys(fitted) -> None:
+    state, cols = fitted
+    listing = {k: v for k, v in BASE.items() if k not in ("start_time", "end_time", "watchers")}
+    expected = _reference(listing, state, cols)
+    got = InferencePlan(cols, state).transform(listing)
+    np.testing.assert_allclose(got, expected.astype(np.float64), rtol=1e-6, atol=1e-6)
+
+
+def test_transform_many_stacks_rows(fitted) -> None:
+    state, cols = fitted
+    plan = InferencePlan(cols, state)
+    listings = [ListingIn(**c).model_dump() for c in CASES]
+    X = plan.transform_many(listings)
+    assert X.shape == (len(CASES), len(cols))
+    np.testing.assert_array_equal(X[1], plan.transform(listings[1]))
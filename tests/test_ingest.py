@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+from pydantic import ValidationError
+
+from ebay_price.ingest import ingest_cli, load
+from ebay_price.ingest.cli import ingest_file
+from ebay_price.ingest.normalize import to_polars, validate_rows
+from ebay_price.ingest.shards import MANIFEST_TABLE, ingest_shards, resolve_shards
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _rows(n: int) -> list[dict[str, object]]:
+    return [
+        {
+            "item_id": f"id{i}",
+            "title": f"Apple iPhone {i}",
+            "brand": "Apple",
+            "model": "iPhone 12",
+            "condition": "Used",
+            "start_time": "2025-08-01T10:00:00Z",
+            "end_time": "2025-08-08T10:00:00Z",
+            "start_price": float(i),
+            "seller_username": f"s{i % 4}",
+            "bids": i,
+        }
+        for i in range(n)
+    ]
+
+
+def _write_jsonl(path: Path, rows: list[dict[str, object]]) -> Path:
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    return path
+
+
+def _warehouse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, name: str) -> Path:
+    db = tmp_path / name / "wh.duckdb"
+    monkeypatch.setattr(load, "WAREHOUSE", db)
+    monkeypatch.setattr(load, "DDL", ROOT / "warehouse" / "ddl.sql")
+    return db
+
+
+def _table(db: Path, table: str) -> pl.DataFrame:
+    con = duckdb.connect(str(db), read_only=True)
+    try:
+        df = con.execute(f"SELECT * FROM {table} ORDER BY ALL").pl()
+    finally:
+        con.close()
+    # upsert time, which differs between the two runs
+    return df.drop("_ingested_at", strict=False)
+
+
+def test_chunked_ingest_matches_one_shot(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # id3 appears twice, in different chunks: the later row wins, as within one batch
+    rows = _rows(10) + [{**_rows(4)[3], "start_price": 99.0}]
+    src = _write_jsonl(tmp_path / "listings.jsonl", rows)
+
+    one_shot = _warehouse(tmp_path, monkeypatch, "a")
+    assert ingest_file(src) == 10
+
+    chunked = _warehouse(tmp_path, monkeypatch, "b")
+    seen: list[int] = []
+    assert ingest_file(src, batch_rows=4, progress=seen.append) == 11
+    assert seen == [4, 8, 11]
+
+    for table in ("raw_listings", "listings", "agg_seller", "agg_product"):
+        assert _table(chunked, table).equals(_table(one_shot, table)), table
+    assert (
+        _table(chunked, "listings").filter(pl.col("item_id") == "id3")["start_price"].item() == 99
+    )
+
+
+def test_chunked_ingest_is_one_transaction(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db = _warehouse(tmp_path, monkeypatch, "wh")
+    ingest_file(_write_jsonl(tmp_path / "first.jsonl", _rows(3)))
+    before = _table(db, "listings")
+
+    # the bad row is only read once the first chunks are already in the warehouse
+    bad = _rows(9) + [{"item_id": ""}]
+    with pytest.raises(ValidationError):
+        ingest_file(_write_jsonl(tmp_path / "bad.jsonl", bad), batch_rows=4)
+    assert _table(db, "listings").equals(before)
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_columnar_reader_matches_rows(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, suffix: str
+) -> None:
+    rows = _rows(10)
+    # numeric-looking ids stay text, extra fields are dropped and missing ones filled in
+    # (csv.DictReader reads an empty cell as "", which is not a valid number)
+    missing = ("bids", "title") if suffix == ".jsonl" else ()
+    rows[1] = {**rows[1], "item_id": "0042", "sold": True}
+    rows[2] = {k: v for k, v in rows[2].items() if k not in missing}
+    src = tmp_path / f"listings{suffix}"
+    if suffix == ".jsonl":
+        _write_jsonl(src, rows)
+    else:
+        pl.DataFrame(rows).write_csv(src)
+
+    by_rows = _warehouse(tmp_path, monkeypatch, "rows")
+    ingest_file(src)
+    columnar = _warehouse(tmp_path, monkeypatch, "columnar")
+    seen: list[int] = []
+    assert ingest_file(src, batch_rows=4, progress=seen.append, reader="columnar") == 10
+    assert seen == [4, 8, 10]
+
+    for table in ("raw_listings", "listings"):
+        assert _table(columnar, table).equals(_table(by_rows, table)), table
+    assert "0042" in _table(columnar, "listings")["item_id"].to_list()
+
+
+def test_columnar_reader_requires_item_ids(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _warehouse(tmp_path, monkeypatch, "wh")
+    src = _write_jsonl(tmp_path / "bad.jsonl", _rows(3) + [{"title": "no id"}])
+    with pytest.raises(ValueError, match="row 3: item_id is required"):
+        ingest_file(src, reader="columnar")
+
+
+# values pydantic converts, and ones it refuses, per reader: CSV only has text
+LENIENT = {
+    ".jsonl": {"watchers": 3.0, "bids": " 4 ", "start_price": "1e3", "seller_feedback_score": True},
+    ".csv": {"watchers": "3.0", "bids": " 4 ", "start_price": "1e3"},
+}
+REFUSED = {
+    ".jsonl": [
+        ("watchers", 3.7, "watchers is not an integer"),
+        ("bids", "2.6", "bids is not an integer"),
+        ("title", 123, "title is not a string"),
+        ("start_price", "abc", "start_price is not a number"),
+    ],
+    ".csv": [
+        ("watchers", "3.7", "watchers is not an integer"),
+        ("bids", "2.6", "bids is not an integer"),
+        ("start_price", "abc", "start_price is not a number"),
+    ],
+}
+
+
+def _write(path: Path, rows: list[dict[str, object]]) -> Path:
+    if path.suffix == ".jsonl":
+        return _write_jsonl(path, rows)
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_columnar_reader_converts_values_like_pydantic(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, suffix: str
+) -> None:
+    # every CSV row needs every column: an empty cell is not a number to pydantic
+    base = [{**r, "watchers": 0} for r in _rows(4)]
+    rows = [*base[:2], {**base[2], **LENIENT[suffix]}, base[3]]
+    src = _write(tmp_path / f"lenient{suffix}", rows)
+    by_rows = _warehouse(tmp_path, monkeypatch, "rows")
+    ingest_file(src)
+    columnar = _warehouse(tmp_path, monkeypatch, "columnar")
+    ingest_file(src, reader="columnar")
+    for table in ("raw_listings", "listings"):
+        assert _table(columnar, table).equals(_table(by_rows, table)), table
+
+    for col, value, reason in REFUSED[suffix]:
+        rows = [*base[:2], {**base[2], col: value}, base[3]]
+        src = _write(tmp_path / f"{col}{suffix}", rows)
+        with pytest.raises(ValidationError):
+            ingest_file(src)
+        # not rounded or turned into text: the file fails, naming the row and value
+        with pytest.raises(ValueError, match=f"1 rows failed validation:\nrow 2: {reason}"):
+            ingest_file(src, reader="columnar")
+        with pytest.raises(ValueError, match=reason):
+            ingest_file(src, batch_rows=2, reader="columnar")
+    assert _table(columnar, "listings").equals(_table(by_rows, "listings"))
+
+
+def test_upsert_keeps_columns_it_does_not_write(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db = _warehouse(tmp_path, monkeypatch, "wh")
+    ingest_file(_write_jsonl(tmp_path / "first.jsonl", _rows(3)))
+    con = duckdb.connect(str(db))
+    con.execute("ALTER TABLE listings ADD COLUMN final_price DOUBLE")
+    con.execute("UPDATE listings SET final_price = 5.0")
+    rows = [{**r, "watchers": 7} for r in _rows(4)]
+    upserted = load.upsert_raw(to_polars(validate_rows(rows)), con=con)
+    con.close()
+
+    assert upserted == 4
+    listings = _table(db, "listings")
+    assert listings["watchers"].to_list() == [7] * 4
+    assert listings["final_price"].to_list() == [5.0, 5.0, 5.0, None]
+
+
+def test_ingest_cli_local_mode_streams_in_chunks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    default = _warehouse(tmp_path, monkeypatch, "wh")
+    # the configured warehouse, not the module default
+    db = tmp_path / "configured" / "wh.duckdb"
+    monkeypatch.setenv("STORAGE__DUCKDB_PATH", str(db))
+    src = _write_jsonl(tmp_path / "listings.jsonl", _rows(10))
+    # a quote in the snapshot path must not break the COPY statement
+    raw = tmp_path / "o'raw"
+    monkeypatch.setenv("STORAGE__PARQUET_BUCKET", str(raw))
+    monkeypatch.setattr(ingest_cli.EbayClient, "load_local_jsonl", pytest.fail)
+    argv = ["ingest_cli", "--mode", "local", "--input", str(src), "--batch-rows", "4"]
+    monkeypatch.setattr("sys.argv", argv)
+    ingest_cli.main()
+
+    out = capsys.readouterr().out
+    assert [line.split(": ")[1].split(" rows")[0] for line in out.splitlines()[:3]] == [
+        "4",
+        "8",
+        "10",
+    ]
+    assert "Ingested 10 records." in out
+    assert f"DuckDB:  {db}" in out
+    assert _table(db, "listings").height == 10
+    assert not default.exists()
+    snapshot = pl.read_parquet(raw / "listings_snapshot.parquet")
+    assert sorted(snapshot["item_id"]) == sorted(r["item_id"] for r in _rows(10))
+
+    # a second run snapshots only its own rows
+    more = _write_jsonl(tmp_path / "more.jsonl", _rows(12)[10:])
+    monkeypatch.setattr("sys.argv", [*argv[:4], str(more)])
+    ingest_cli.main()
+    snapshot = pl.read_parquet(raw / "listings_snapshot.parquet")
+    assert sorted(snapshot["item_id"]) == ["id10", "id11"]
+    assert _table(db, "listings").height == 12
+
+
+def _shards(tmp_path: Path) -> Path:
+    src = tmp_path / "shards"
+    (src / "2025-08").mkdir(parents=True)
+    rows = _rows(12)
+    _write_jsonl(src / "a.jsonl", rows[:4])
+    pl.DataFrame(rows[4:8]).write_csv(src / "2025-08" / "b.csv")
+    # id0 again: the later shard wins
+    _write_jsonl(src / "c.jsonl", rows[8:] + [{**rows[0], "start_price": 99.0}])
+    (src / "notes.txt").write_text("not a shard")
+    return src
+
+
+def test_resolve_shards(tmp_path: Path) -> None:
+    src = _shards(tmp_path)
+    expected = [src / "2025-08" / "b.csv", src / "a.jsonl", src / "c.jsonl"]
+    assert resolve_shards(src) == expected
+    assert resolve_shards(src / "**" / "*") == expected
+    assert resolve_shards(src / "*.jsonl") == expected[1:]
+    assert resolve_shards(src / "a.jsonl") == [src / "a.jsonl"]
+
+
+def test_shards_resume_after_a_failure(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    src = _shards(tmp_path)
+    db = _warehouse(tmp_path, monkeypatch, "wh")
+    good = (src / "c.jsonl").read_text()
+    (src / "c.jsonl").write_text(good + json.dumps({"item_id": ""}) + "\n")
+
+    with pytest.raises(ValidationError):
+        ingest_shards(resolve_shards(src), workers=1)
+    # the shards before the bad one are in, each recorded with its rows
+    manifest = _table(db, MANIFEST_TABLE)
+    assert [Path(p).name for p in manifest.sort("path")["path"]] == ["b.csv", "a.jsonl"]
+    assert manifest["rows"].to_list() == [4, 4]
+    assert _table(db, "listings").height == 8
+
+    (src / "c.jsonl").write_text(good)
+    report = ingest_shards(resolve_shards(src), workers=1)
+    assert (report.shards, report.skipped, report.rows) == (1, 2, 5)
+    listings = _table(db, "listings")
+    assert listings.height == 12
+    assert listings.filter(pl.col("item_id") == "id0")["start_price"].to_list() == [99.0]
+
+    report = ingest_shards(resolve_shards(src), workers=1)
+    assert (report.shards, report.skipped, report.rows) == (0, 3, 0)
+
+
+def test_shards_in_worker_processes_match_one_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src = _shards(tmp_path)
+    rows = _rows(12)
+    one_file = _warehouse(tmp_path, monkeypatch, "one_file")
+    ingest_file(_write_jsonl(tmp_path / "all.jsonl", rows + [{**rows[0], "start_price": 99.0}]))
+    sharded = _warehouse(tmp_path, monkeypatch, "sharded")
+    seen = []
+    report = ingest_shards(
+        resolve_shards(src), reader="columnar", workers=2, progress=lambda s, n: seen.append(n)
+    )
+
+    assert (report.shards, report.rows) == (3, 13)
+    assert seen == [4, 4, 5]
+    # the CSV shard reads back the same typed values as the JSONL
+    for table in ("raw_listings", "listings"):
+        assert _table(sharded, table).equals(_table(one_file, table)), table
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+
+from ebay_price.api.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    reg = MetricsRegistry()
+    h = reg.histogram("lat_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, stage="predict")
+    lines = reg.render().splitlines()
+    assert lines[:2] == ["# HELP lat_seconds Latency.", "# TYPE lat_seconds histogram"]
+    assert 'lat_seconds_bucket{stage="predict",le="0.1"} 1' in lines
+    assert 'lat_seconds_bucket{stage="predict",le="1.0"} 3' in lines
+    assert 'lat_seconds_bucket{stage="predict",le="+Inf"} 4' in lines
+    assert 'lat_seconds_sum{stage="predict"} 4.05' in lines
+    assert 'lat_seconds_count{stage="predict"} 4' in lines
+
+
+def test_counter_gauge_and_label_escaping() -> None:
+    reg = MetricsRegistry()
+    c = reg.counter("req_total", "Requests.", ("model",))
+    g = reg.gauge("in_flight", "In flight.")
+    c.inc(model='a"b')
+    c.inc(2, model='a"b')
+    with g.track_inprogress():
+        assert "in_flight 1" in reg.render()
+    text = reg.render()
+    assert 'req_total{model="a\\"b"} 3' in text
+    assert "in_flight 0" in text
+
+
+def test_labels_must_match_declaration() -> None:
+    c = MetricsRegistry().counter("x_total", "X.", ("task",))
+    with pytest.raises(ValueError):
+        c.inc(model="m")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+from ebay_price.api.batching import MicroBatcher
+
+
+def _run(batcher: MicroBatcher, items: list[int]) -> list[object]:
+    async def go() -> list[object]:
+        return await asyncio.gather(*(batcher.submit(i) for i in items), return_exceptions=True)
+
+    return asyncio.run(go())
+
+
+def test_concurrent_submits_share_one_call() -> None:
+    sizes: list[int] = []
+
+    def fn(items: list[int]) -> list[int]:
+        sizes.append(len(items))
+        return [i * 10 for i in items]
+
+    batcher = MicroBatcher(fn, window_ms=50, max_batch=64)
+    assert _run(batcher, list(range(10))) == [i * 10 for i in range(10)]
+    assert sizes == [10]
+    assert batcher.stats.to_dict()["mean_size"] == 10
+
+
+def test_max_batch_caps_realized_size() -> None:
+    sizes: list[int] = []
+
+    def fn(items: list[int]) -> list[int]:
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(fn, window_ms=50, max_batch=4)
+    assert _run(batcher, list(range(10))) == list(range(10))
+    assert sizes == [4, 4, 2]
+    stats = batcher.stats.to_dict()
+    assert stats["batches"] == 3 and stats["max_size"] == 4
+    assert stats["size_le"]["2"] == 1 and stats["size_le"]["4"] == 3
+
+
+def test_failing_item_only_fails_its_caller() -> None:
+    def fn(items: list[int]) -> list[int]:
+        if 3 in items:
+            raise ValueError("bad row")
+        return items
+
+    results = _run(MicroBatcher(fn, window_ms=50), [1, 2, 3, 4])
+    assert results[:2] == [1, 2] and results[3] == 4
+    assert isinstance(results[2], ValueError)
+
+
+def test_batcher_survives_event_loop_change() -> None:
+    batcher = MicroBatcher(lambda items: items, window_ms=1)
+    assert _run(batcher, [1]) == [1]
+    assert _run(batcher, [2, 3]) == [2, 3]
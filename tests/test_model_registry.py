@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import joblib
+import pytest
+
+from ebay_price.api.registry import FEATURE_STATE_FILE, TASKS, ModelNotLoadedError, ModelRegistry
+from ebay_price.features.state import FeatureState
+
+
+class ConstModel:
+    def __init__(self, value: float):
+        self.value = value
+
+    def predict(self, X):  # pragma: no cover - not used here
+        return [self.value] * len(X)
+
+
+def test_load_fails_without_models(tmp_path: Path) -> None:
+    with pytest.raises(ModelNotLoadedError):
+        ModelRegistry(tmp_path).load()
+
+
+def test_refresh_swaps_on_artifact_change(tmp_path: Path) -> None:
+    path = tmp_path / "reg_linear.joblib"
+    joblib.dump(ConstModel(1.0), path)
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    first = reg.get("reg")
+    assert first.model.value == 1.0
+    assert reg.refresh() is False
+
+    joblib.dump(ConstModel(2.0), path)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert reg.refresh() is True
+    second = reg.get("reg")
+    assert second.model.value == 2.0
+    assert second.version != first.version
+    # snapshot held by an in-flight request is untouched
+    assert first.model.value == 1.0
+
+    with pytest.raises(ModelNotLoadedError):
+        reg.get("clf")
+
+
+def test_feature_state_is_only_loaded_with_its_model(tmp_path: Path) -> None:
+    joblib.dump(ConstModel(1.0), tmp_path / "reg_linear.joblib")
+    joblib.dump(ConstModel(0.5), tmp_path / "clf_logit.joblib")
+    state = FeatureState(vocabularies={"brand": ["Apple"]})
+    # where feature builds used to write it; no model was trained with it
+    state.save(tmp_path / "feature_state.json")
+    reg = ModelRegistry(tmp_path)
+    reg.load()
+    assert reg.get("reg").state is None
+
+    for task in TASKS:
+        state.save(tmp_path / FEATURE_STATE_FILE.format(task=task))
+    assert reg.refresh() is True
+    reg_model, clf_model = reg.get_many("reg", "clf")
+    assert reg_model.state == state
+    # equal states from one build are shared, as the joint plan requires
+    assert clf_model.state is reg_model.state
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import polars as pl
+import pytest
 
 from ebay_price.features.build_features import build_features
+from ebay_price.features.state import fit_feature_state
+from ebay_price.modeling import datasets, train_baselines
 from ebay_price.modeling.datasets import feature_target_split, train_val_split
 from ebay_price.modeling.metrics import classification_metrics, regression_metrics
 
@@ -47,3 +52,18 @@ def test_cls_metrics_smoke():
     y_prob = [0.2, 0.8, 0.6, 0.4]
     m = classification_metrics(y_true, y_prob)
     assert "roc_auc" in m and "avg_precision" in m
+
+
+def test_training_bundles_the_feature_state_of_its_training_set(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    state = fit_feature_state(_mini_df())
+    build_features(_mini_df(), state).write_parquet(tmp_path / "train.parquet")
+    state_path = state.save(tmp_path / "feature_state.json")
+    monkeypatch.setattr(datasets, "PROCESSED_DIR", tmp_path)
+    monkeypatch.setattr(train_baselines, "FEATURE_STATE_PATH", state_path)
+    monkeypatch.setattr(train_baselines, "ARTIFACTS_DIR", tmp_path / "models")
+    (tmp_path / "models").mkdir()
+
+    train_baselines.train_regression()
+    assert (tmp_path / "models" / "reg_feature_state.json").read_text() == state_path.read_text()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+from lightgbm import LGBMClassifier, LGBMRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from ebay_price.api.registry import ModelRegistry
+from ebay_price.modeling.onnx_export import export_onnx, onnx_path
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnxmltools")
+pytest.importorskip("skl2onnx")
+
+
+def _data(n: int = 400) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n, 6))
+    y = 300 + 40 * X[:, 0] - 25 * X[:, 1] + rng.normal(scale=5, size=n)
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        LinearRegression(),
+        LGBMRegressor(n_estimators=50, verbosity=-1),
+        LogisticRegression(),
+        LGBMClassifier(n_estimators=50, verbosity=-1),
+    ],
+    ids=["linear", "lgbm_reg", "logit", "lgbm_clf"],
+)
+def test_export_matches_joblib_model(tmp_path: Path, model: object) -> None:
+    X, y = _data()
+    if hasattr(model, "predict_proba"):
+        y = (y > 300).astype(int)
+    model.fit(X[:300], y[:300])
+    path = tmp_path / "model.joblib"
+
+    report = export_onnx(model, path, X[300:])
+
+    assert report["ok"], report
+    assert report["rows"] == 100
+    assert onnx_path(path).exists()
+
+
+def test_registry_prefers_onnx_and_respects_joblib_backend(tmp_path: Path) -> None:
+    X, y = _data()
+    lgbm = LGBMRegressor(n_estimators=50, verbosity=-1).fit(X, y)
+    path = tmp_path / "reg_lightgbm.joblib"
+    joblib.dump(lgbm, path)
+    (tmp_path / "reg_feature_columns.json").write_text(json.dumps([f"f{i}" for i in range(6)]))
+    export_onnx(lgbm, path, X)
+
+    auto = ModelRegistry(tmp_path)
+    auto.load()
+    lm = auto.get("reg")
+    assert lm.backend == "onnx"
+    assert auto.versions()["reg"]["backend"] == "onnx"
+    np.testing.assert_allclose(lm.model.predict(X[:5]), lgbm.predict(X[:5]), rtol=1e-3)
+    # one row in, one value out, same as the joblib model
+    assert lm.model.predict(X[:1].astype(np.float32)).shape == (1,)
+
+    pinned = ModelRegistry(tmp_path, backend="joblib")
+    pinned.load()
+    assert pinned.get("reg").backend == "joblib"
+    assert pinned.get("reg").version != lm.version
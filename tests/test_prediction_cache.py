@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from ebay_price.api.cache import PredictionCache, cache_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_key_depends_on_payload_task_and_version() -> None:
+    row = {"item_id": "a", "bids": 3, "brand": None}
+    assert cache_key("reg", "v1", row) == cache_key("reg", "v1", dict(reversed(row.items())))
+    assert cache_key("reg", "v1", row) != cache_key("reg", "v2", row)
+    assert cache_key("reg", "v1", row) != cache_key("clf", "v1", row)
+    assert cache_key("reg", "v1", row) != cache_key("reg", "v1", {**row, "bids": 4})
+
+
+def test_lru_eviction() -> None:
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry_counts_as_miss() -> None:
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=10, ttl_s=5.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_zero_capacity_disables_storage() -> None:
+    cache = PredictionCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
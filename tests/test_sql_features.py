@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from ebay_price.features import build_features as bf
+from ebay_price.features import incremental
+from ebay_price.features.build_features import build_features
+from ebay_price.features.sql import build_features_sql, fit_feature_state_sql
+from ebay_price.features.state import FeatureState, fit_feature_state
+
+LISTINGS = pl.DataFrame(
+    {
+        "item_id": ["a", "b", "c", "d", "e", "f"],
+        "title": ["Apple iPhone 12", "Galaxy S21 (256GB)", None, "", "Pixel Goo(gle", "Nokia 3310"],
+        "category_path": ["A > B", "A > B", None, "A > C", "A > C", "A > B"],
+        "brand": ["Apple", "Samsung", None, "Apple", "Goo(gle", "N.kia"],  # patterns
+        "model": ["iPhone 12", "S21", "x", None, "Pixel 7", "3310"],
+        "condition": ["Used", "New", "Used", None, "Used", "New"],
+        "start_time": [
+            "2025-08-01T10:00:00Z",
+            "2025-08-02T11:30:00+02:00",
+            None,
+            "not a date",
+            "2025-12-31T23:59:59Z",
+            "2025-08-01T10:00:00",  # no offset: not parsed by either engine
+        ],
+        "end_time": [
+            "2025-08-08T10:00:00Z",
+            "2025-08-03T11:00:00Z",
+            "2025-08-03T11:00:00Z",
+            None,
+            "2026-01-02T00:00:00.5Z",
+            "2025-08-02T10:00:00Z",
+        ],
+        "listing_type": ["Auction", "BuyItNow", "Auction", "Auction", None, "Auction"],
+        "start_price": [250.0, -5.0, None, 10_000.0, 1.0, 20.0],
+        "shipping_cost": [10.0, 0.0, None, 3.5, -1.0, 4.0],
+        "watchers": [15, None, 0, 3, 2, 1],
+        "bids": [12, 0, None, 1, 4, 0],
+        "final_price": [355.0, 399.0, 12.0, None, 5_000.0, 25.0],
+        "sold": [1, 1, 0, 0, 1, None],
+    }
+)
+
+
+@pytest.fixture()
+def con() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.register("df", LISTINGS)
+    con.execute("CREATE TABLE listings AS SELECT * FROM df")
+    con.unregister("df")
+    yield con
+    con.close()
+
+
+def test_sql_state_and_features_match_polars(con: duckdb.DuckDBPyConnection) -> None:
+    state = fit_feature_state_sql(con)
+    assert state == fit_feature_state(LISTINGS)
+    assert_frame_equal(build_features_sql(con, state), build_features(LISTINGS))
+
+    # state fitted elsewhere: unseen categories, out-of-range prices
+    other = fit_feature_state(LISTINGS.head(2))
+    assert_frame_equal(build_features_sql(con, other), build_features(LISTINGS, other))
+
+
+def test_duckdb_refresh_matches_polars_refresh(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(bf, "PROCESSED_DIR", tmp_path / "processed")
+    bf.PROCESSED_DIR.mkdir()
+    db = str(tmp_path / "wh.duckdb")
+    with duckdb.connect(db) as wh:
+        wh.register("df", LISTINGS)
+        wh.execute("CREATE TABLE listings AS SELECT *, now()::TIMESTAMP AS _ingested_at FROM df")
+
+    incremental.full_refresh(db, tmp_path / "mem_state.json")
+    mem = pl.read_parquet(bf.PROCESSED_DIR / "features.parquet")
+    mem_train = pl.read_parquet(bf.PROCESSED_DIR / "train.parquet")
+    mem_watermark = incremental.read_watermark()
+
+    assert incremental.full_refresh(db, tmp_path / "state.json", engine="duckdb") == 6
+    assert_frame_equal(pl.read_parquet(bf.PROCESSED_DIR / "features.parquet"), mem)
+    assert_frame_equal(pl.read_parquet(bf.PROCESSED_DIR / "train.parquet"), mem_train)
+    assert FeatureState.load(tmp_path / "state.json") == FeatureState.load(
+        tmp_path / "mem_state.json"
+    )
+    assert incremental.read_watermark() == mem_watermark
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from ebay_price.features import text
+from ebay_price.features.text import TitleHasher, hash_titles, text_features
+
+
+def test_word_count_matches_python_regex() -> None:
+    titles = ["Apple iPhone 12 (128GB)", "", None, "--", "Pixel_7 Pro/5G  ", "café crème"]
+    out = text_features(pl.DataFrame({"title": titles}, schema={"title": pl.Utf8}))
+    assert out["title_wc"].dtype == pl.Int64
+    expected = [None if t is None else text._word_count(t) for t in titles]
+    assert out["title_wc"].to_list() == expected
+
+
+def test_hasher_counts_tokens_and_bigrams() -> None:
+    X = TitleHasher(n_features=64).transform(["Apple iPhone apple", None])
+    assert X.shape == (2, 64) and X.dtype == np.float32
+    # apple x2, iphone, "apple iphone", "iphone apple"
+    assert X[0].sum() == 5
+    assert X[1].nnz == 0
+
+
+def test_parallel_chunks_match_single_pass(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(text, "HASH_CHUNK_ROWS", 7)
+    titles = pl.Series([f"Galaxy S{i % 13} {i}GB unlocked" if i % 5 else None for i in range(50)])
+    hasher = TitleHasher.load(TitleHasher(n_features=256).save(tmp_path / "h.json"))
+
+    single = hasher.transform(titles.to_list())
+    parallel = hash_titles(titles, hasher, n_jobs=2)
+    assert (single != parallel).nnz == 0
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import polars as pl
+import pytest
+from pydantic import ValidationError
+
+from ebay_price.ingest.schema import ListingRaw
+from ebay_price.validation.rules import (
+    REASONS_COL,
+    ROW_COL,
+    listing_record_rules,
+    model_rules,
+    split_rejects,
+)
+from ebay_price.validation.schemas import ListingRecord
+from ebay_price.validation.validators import validate_parquet
+
+GOOD = {
+    "item_id": "a",
+    "title": "Apple iPhone 12",
+    "category_path": "Phones",
+    "condition": "Used",
+    "start_time": "2025-08-01T10:00:00Z",
+    "end_time": "2025-08-08T10:00:00Z",
+    "listing_type": "Auction",
+    "start_price": 10.0,
+    "seller_positive_percent": 99.5,
+    "bids": 3,
+    "sold": 1,
+    "currency": "USD",
+}
+BAD = {
+    "item_id": "",
+    "start_price": -1.0,
+    "seller_positive_percent": 100.5,
+    "listing_type": "Raffle",
+    "currency": "US",
+    "end_time": "2025-07-01T10:00:00Z",
+    "start_time": "2025-09-01 10:00:00.5+00:00",
+    "sold": 2,
+}
+
+
+def _frame() -> pl.DataFrame:
+    rows = [
+        GOOD,
+        # ListingRecord cannot order a naive time against an aware one, so both are naive
+        {
+            **GOOD,
+            "start_time": "2025-08-01T10:00:00",
+            "end_time": "2025-08-08T10:00:00",
+            "listing_type": None,
+            "currency": None,
+        },
+        *({**GOOD, k: v} for k, v in BAD.items()),
+        {**GOOD, "start_time": "last tuesday"},
+        {**GOOD, "item_id": None},
+    ]
+    return pl.DataFrame(rows)
+
+
+def test_rules_reject_exactly_what_pydantic_does() -> None:
+    df = _frame()
+    valid, rejects = split_rejects(df, listing_record_rules(df.schema))
+
+    refused = set()
+    for i, row in enumerate(df.iter_rows(named=True)):
+        try:
+            ListingRecord(**row)
+        except ValidationError:
+            refused.add(i)
+    assert set(rejects[ROW_COL]) == refused
+    assert valid.height == df.height - len(refused)
+    assert valid.columns == df.columns
+    reasons = dict(zip(rejects[ROW_COL], rejects[REASONS_COL].to_list(), strict=True))
+    assert reasons[2] == ["item_id is shorter than 1"]
+    assert reasons[4] == ["seller_positive_percent > 100"]
+    assert reasons[7] == ["end_time before start_time"]
+    assert reasons[8] == ["end_time before start_time"]
+    assert reasons[10] == ["start_time is not a datetime"]
+
+
+def test_raw_rules_only_require_an_item_id() -> None:
+    df = _frame()
+    _, rejects = split_rejects(df, model_rules(ListingRaw, df.schema))
+    assert rejects[REASONS_COL].to_list() == [
+        ["item_id is shorter than 1"],
+        ["item_id is required"],
+    ]
+    no_ids = df.drop("item_id")
+    _, rejects = split_rejects(no_ids, model_rules(ListingRaw, no_ids.schema))
+    assert rejects.height == df.height
+
+
+def test_validate_parquet_checks_every_row(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.parquet"
+    # the offending row sits well past the 50 rows pydantic used to sample
+    rows = [{**GOOD, "item_id": f"id{i}"} for i in range(200)]
+    rows[150]["currency"] = "DOLLARS"
+    pl.DataFrame(rows).write_parquet(path)
+    with pytest.raises(AssertionError, match="row 150: currency is not a 3-letter code"):
+        validate_parquet(path)
@@ -25,6 +25,16 @@ CREATE TABLE IF NOT EXISTS listings AS
 SELECT * FROM raw_listings
 WHERE 1=0;
 
+-- Files ingested by ingest.cli, committed with their rows: re-runs skip what is here
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    path TEXT,
+    size BIGINT,
+    sha256 TEXT,
+    rows BIGINT,
+    ingested_at TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (path, sha256)
+);
+
 -- Upsert raw → raw_listings
 -- We do merges from staging temp tables created by the loader.
 